@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import numpy as np
+from loader import parse_obj_chunk
+
+# keyframe + delta vertex animation format, GL free.
+#
+# topology is stored once, every `interval` frames a keyframe keeps full float32 positions and every frame
+# keeps int16 deltas against the keyframe before it, quantized per frame and axis (keyframes have zero deltas).
+#
+# layout, little endian, every section 4 byte aligned:
+#   header   HEADER
+#   indices  uint32 (index_count,)
+#   keys     float32 (key_count, vertex_count, 3)
+#   scales   float32 (frame_count, 3) quantization step per frame and axis
+#   deltas   int16 (frame_count, vertex_count, 3)
+
+MAGIC = b'VANM'
+VERSION = 1
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u2'), ('reserved', '<u2'), ('vertex_count', '<u4'),
+                   ('index_count', '<u4'), ('frame_count', '<u4'), ('interval', '<u4'), ('fps', '<f4')])
+
+
+class Animation:
+    """A decoded-on-demand vertex animation, arrays are views into the (memory mapped) file"""
+
+    def __init__(self, indices:np.ndarray, keys:np.ndarray, scales:np.ndarray, deltas:np.ndarray, interval:int, fps:float=24.0):
+        self.indices = indices
+        self.keys = keys
+        self.scales = scales
+        self.deltas = deltas
+        self.interval = interval
+        self.fps = fps
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.deltas)
+
+    @property
+    def vertex_count(self) -> int:
+        return self.keys.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.fps
+
+    def key_of(self, frame:int) -> int:
+        return frame // self.interval
+
+    def decode(self, frame:int, out:np.ndarray=None) -> np.ndarray:
+        """positions (N, 3) float32 of one frame"""
+        out = np.empty((self.vertex_count, 3), dtype=np.float32) if out is None else out
+        np.multiply(self.deltas[frame], self.scales[frame], out=out, casting='unsafe')
+        out += self.keys[self.key_of(frame)]
+        return out
+
+    def decode_frames(self, frames:np.ndarray=None) -> np.ndarray:
+        """positions (F, N, 3) float32 of many frames in one vectorized pass"""
+        frames = np.arange(self.frame_count) if frames is None else np.asarray(frames)
+        positions = self.deltas[frames].astype(np.float32)
+        positions *= self.scales[frames][:, None, :]
+        positions += self.keys[frames // self.interval]
+        return positions
+
+    def sample(self, seconds:float, loop:bool=True) -> tuple[int, int, float]:
+        """frames around a time and the blend between them, (frame a, frame b, t)"""
+        position = seconds * self.fps
+        if loop:
+            position %= self.frame_count
+        else:
+            position = min(max(position, 0), self.frame_count - 1)
+        a = int(position)
+        b = (a + 1) % self.frame_count if loop else min(a + 1, self.frame_count - 1)
+        return a, b, position - a
+
+    def save(self, path:str):
+        header = np.zeros(1, dtype=HEADER)
+        header[0] = (MAGIC, VERSION, 0, self.vertex_count, len(self.indices), self.frame_count, self.interval, self.fps)
+        with open(path, 'wb') as f:
+            for array in (header, self.indices.astype('<u4'), self.keys.astype('<f4'), self.scales.astype('<f4'), self.deltas.astype('<i2')):
+                f.write(np.ascontiguousarray(array).tobytes())
+
+
+def encode(frames:list[np.ndarray], indices:np.ndarray, interval:int=8, fps:float=24.0) -> Animation:
+    """build an Animation from per frame positions (N, 3) sharing the same indices"""
+    positions = np.asarray(frames, dtype=np.float64)
+    frame_count = len(positions)
+    keys = positions[::interval].astype(np.float32)
+
+    # deltas against the stored (float32) keyframe so the error does not include the key rounding
+    delta = positions - keys[np.arange(frame_count) // interval]
+    peak = np.abs(delta).max(axis=1) # (F, 3)
+    scales = (peak / 32767).astype(np.float32)
+    step = np.where(scales > 0, scales, 1).astype(np.float64)
+    deltas = np.clip(np.rint(delta / step[:, None, :]), -32767, 32767).astype(np.int16)
+    return Animation(np.asarray(indices, dtype=np.uint32), keys, scales, deltas, interval, fps)
+
+
+def load(path:str) -> Animation:
+    """memory map an animation file, nothing is decoded until asked for"""
+    raw = np.memmap(path, dtype=np.uint8, mode='r')
+    header = raw[:HEADER.itemsize].view(HEADER)[0]
+    if header['magic'] != MAGIC or header['version'] != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} animation file")
+
+    vertex_count, frame_count, interval = int(header['vertex_count']), int(header['frame_count']), int(header['interval'])
+    key_count = -(-frame_count // interval)
+    sections = (('<u4', (int(header['index_count']),)), ('<f4', (key_count, vertex_count, 3)),
+                ('<f4', (frame_count, 3)), ('<i2', (frame_count, vertex_count, 3)))
+    arrays, offset = [], HEADER.itemsize
+    for dtype, shape in sections:
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        arrays.append(raw[offset:offset + nbytes].view(dtype).reshape(shape))
+        offset += nbytes
+    indices, keys, scales, deltas = arrays
+    return Animation(indices, keys, scales, deltas, interval, float(header['fps']))
+
+
+def read_obj_sequence(paths:list[str]) -> tuple[list[np.ndarray], np.ndarray]:
+    """positions of every OBJ frame and the shared indices, frames must have the same topology"""
+    frames, indices = [], None
+    for path in paths:
+        with open(path, 'rb') as f:
+            positions, triangles = parse_obj_chunk(f.read())
+        triangles = triangles.astype(np.uint32).reshape(-1)
+        if indices is None:
+            indices = triangles
+        elif len(positions) != len(frames[0]) or not np.array_equal(indices, triangles):
+            raise ValueError(f"{path} does not share the topology of {paths[0]}")
+        frames.append(positions)
+    return frames, indices
+
+
+def convert(paths:list[str], output:str, interval:int=8, fps:float=24.0) -> Animation:
+    frames, indices = read_obj_sequence(paths)
+    animation = encode(frames, indices, interval, fps)
+    animation.save(output)
+    return animation
+
+
+def report(paths:list[str], output:str) -> dict:
+    """compression ratio, decode speed and error of an animation file against its OBJ sequence"""
+    start = time.perf_counter()
+    frames, _ = read_obj_sequence(paths)
+    obj_seconds = time.perf_counter() - start
+    obj_bytes = sum(os.path.getsize(path) for path in paths)
+    raw_bytes = sum(frame.nbytes for frame in frames) # float32 positions in memory
+
+    animation = load(output)
+    start = time.perf_counter()
+    decoded = animation.decode_frames()
+    decode_seconds = time.perf_counter() - start
+
+    result = {
+        "frames": animation.frame_count,
+        "vertices": animation.vertex_count,
+        "obj_bytes": obj_bytes,
+        "animation_bytes": os.path.getsize(output),
+        "ratio_vs_obj": obj_bytes / os.path.getsize(output),
+        "ratio_vs_float32": raw_bytes / os.path.getsize(output),
+        "obj_frames_per_second": len(paths) / obj_seconds,
+        "decode_frames_per_second": animation.frame_count / max(decode_seconds, 1e-9),
+        "max_error": float(np.abs(decoded - np.asarray(frames)).max()),
+    }
+    return result
+
+
+if __name__ == "__main__":
+    import glob
+    import argparse
+    parser = argparse.ArgumentParser(description="convert an OBJ frame sequence to the keyframe + delta animation format")
+    parser.add_argument("output", help="animation file to write")
+    parser.add_argument("frames", nargs="+", help="OBJ files (or glob patterns) in frame order")
+    parser.add_argument("--interval", type=int, default=8, help="frames between keyframes")
+    parser.add_argument("--fps", type=float, default=24.0)
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.frames for path in glob.glob(pattern))
+    if not paths:
+        sys.exit("no OBJ frames found")
+    convert(paths, args.output, args.interval, args.fps)
+    for name, value in report(paths, args.output).items():
+        print(f"{name}: {value:.4g}" if isinstance(value, float) else f"{name}: {value}")
@@ -1,23 +1,44 @@
+import time
 import pygame as pg
 import numpy as np
 import pyrr
-import pygame as pg
-import pygame_gui as pg_gui
+from gl import *
 from mesh import *
-from OpenGL.GL import *
 from camera import Camera
-from OpenGL.GL.shaders import compileProgram, compileShader
-from gui_test import UIInputStepper
+from shader import ProgramManager
+from assets import AssetLoader
+from selection import Selection, box_select, screen_rect_to_ndc, frustum_planes, boxes_in_frustum
+from vertex_query import VertexQuery
+from recorder import EventRecorder, load_recording
+from resources import tracker
+from render_queue import RenderQueue, DrawPacket, PASS_MESH
+from resolution import DynamicResolution
+from occlusion import OcclusionCuller
+from gpu_culling import GpuCuller
+from frame_pipeline import FramePipeline, FramePacket
 
 
 class Renderer:
     
-    def __init__(self, width:int=800, height:int=700):
+    def __init__(self, width:int=800, height:int=700, picking:str='ray', gui:bool=True, hidden:bool=False, frame_budget:float=None, occlusion:bool=False, gpu_culling:bool=False, pipelined:bool=False):
+        if pipelined and (occlusion or gpu_culling or picking == 'id'):
+            # these read back from or dispatch on the gpu while preparing a frame, which needs the context thread
+            raise ValueError("the pipelined loop works with ray picking and without occlusion or gpu culling")
         self.scr_width, self.scr_height = width, height
+        self.picking = picking
+        self.frames = 0
+        self.first_frame = None # perf_counter() timestamp of the first presented frame
         self.render_distance = 20
         self.fov = 45
         self.mesh_mouse_hover = None
         self.mesh_focus = None
+        self.box_start = None # window position where a right button box selection started
+        self.selection = Selection()
+        self.vertex_query = VertexQuery()
+        self.vertex_hover = None # (mesh, vertex index, pixel distance) under the mouse in wireframe mode
+        self.overlapping = [] # meshes the shift-moved mesh interpenetrates, shown highlighted
+        self.pick_position = None # last mouse position, picked by the frame pipeline's worker
+        self.recorder = None
         self.ray = Ray(self, 0)
         self.gui_surface = pg.Surface((width, height), pg.SRCALPHA)
         
@@ -27,108 +48,279 @@ class Renderer:
 
         # initialize pygame and create window
         pg.init()
-        self.win_surface = pg.display.set_mode((width, height), pg.OPENGL | pg.DOUBLEBUF | pg.RESIZABLE)
+        # hidden windows still get a GL context, used to replay recordings offscreen
+        flags = pg.OPENGL | pg.DOUBLEBUF | pg.RESIZABLE | (pg.HIDDEN if hidden else 0)
+        if gpu_culling:
+            # compute shaders and indirect multi draw, the compatibility profile keeps wide lines and points
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 4)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
+            pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_COMPATIBILITY)
+        if frame_budget != None:
+            # the scaled depth is blitted to the window, the formats have to match DynamicResolution's
+            pg.display.gl_set_attribute(pg.GL_DEPTH_SIZE, 24)
+            pg.display.gl_set_attribute(pg.GL_STENCIL_SIZE, 8)
+        self.win_surface = pg.display.set_mode((width, height), flags)
         self.clock = pg.time.Clock()
-        self.pg_gui_manager = pg_gui.UIManager((self.scr_width, self.scr_height))
         self.time_delta = 0
-        self.gui_surface = pg.Surface((width, height), pg.SRCALPHA)
-        UIInputStepper(relative_rect=pg.Rect(50, 50, 200, 40), manager=self.pg_gui_manager, value=0)
+        self.pg_gui_manager = None
+        if gui:
+            self.__init_gui()
 
       
         # initialize OpenGL
         glEnable(GL_DEPTH_TEST)
         glClearColor(0.051, 0.067, 0.09, 1)
+        self.programs = ProgramManager()
         self.shader = self.createShader("shaders/vertex.txt", "shaders/fragment.txt")
         glUseProgram(self.shader)
 
-        # initailize Camera and create view matrix
+        # initailize Camera and create view matrix (shared by all programs through the Camera uniform block)
         self.camera = Camera()
-        self.viewMatrixLocation = glGetUniformLocation(self.shader, 'view') # get view mat4 location in gpu mem
         self.__update_camera()
 
         # initialize and create projection matrix
-        self.ProjectionMatrixLocation = glGetUniformLocation(self.shader, "projection")
         self.__update_projection()
 
         #initialize model and create model matrix 
-        self.mesh_manager = MeshManager(self)
-        self.modelMatrixLocation = glGetUniformLocation(self.shader, "model")
+        self.mesh_manager = MeshManager(self, picking=self.picking)
+        # meshes loaded while the loop runs go through here, see AssetLoader.load_mesh
+        self.assets = AssetLoader(self.mesh_manager)
+        self.modelMatrixLocation = self.programs.uniform_location(self.shader, "model")
+        # draws are sorted by state and redundant changes skipped, render_queue.stats has the counts per frame
+        self.render_queue = RenderQueue()
+        # frame_budget (ms) renders the scene at a scale that holds the budget, overlays stay at native resolution
+        self.resolution = DynamicResolution(frame_budget) if frame_budget != None else None
+        # occlusion skips meshes hidden behind others, occlusion.stats has the culled count per frame
+        self.occlusion = OcclusionCuller(self.programs) if occlusion else None
+        # gpu_culling culls and draws the static meshes on the gpu, the cpu cost no longer grows with them
+        self.gpu_culling = GpuCuller(self.programs) if gpu_culling else None
+        # pipelined prepares the next frame on a worker thread while this one draws, pipeline.stats has the overlap
+        self.pipeline = FramePipeline(self.__prepare_frame) if pipelined else None
         
     def renderLoop(self):
         running = True
-        # self.mesh_manager.add_mesh(Sphere())
-        self.mesh_manager.load_mesh("models/teapot.obj")
-        mesh = self.mesh_manager.get_mesh(0) 
-        mesh.transform.position.move(dx=0.0, dy=0.0, dz=-3)
-        mesh.transform.rotation.move(dy=180, dx=90)
-        
-        # mesh.change_color(0.024, 0.969, 0.953)
-        # (0.969, 0.573, 0.024) orange
-        # mesh_2 = self.mesh_manager.get_mesh(1)
-        # mesh_2.transform.position.move(dx=-0.34,dy=0.0, dz=-3)
-        # mesh_2.change_color(0.549, 0.024, 0.969)
-        
-        self.__update_model()
+        self.__setup_scene()
+        pipeline = self.pipeline
+        if pipeline != None:
+            # every iteration draws the frame prepared during the previous one
+            pipeline.kick()
 
+        delta = 0
         while running:
+            if pipeline != None:
+                # the worker is done, events and loading may change the scene until the next kick
+                packet = pipeline.wait()
+            # the worker reads it while preparing a frame
+            self.time_delta = delta
             #check pygame events
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     running = False
-                self.__camera_ctl(event)
-                self.__adjust_ratio(event)
-                self.__mouse_picking(event)
-                self.__object_ctl(event)
-                self.pg_gui_manager.process_events(event)
-            
-            # refresh screen
-            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-            # Rendering code would go here
-            glUseProgram(self.shader)
-
-            #rotate cube
-            # self.obj.transform.rotation.move(dz=1)
-            # self.obj.transform.position.bounce(dy=0.01)
-            # self.obj.transform.scale.bounce(dx=0.001)
+                if self.recorder != None:
+                    self.recorder.record(event, self.frames)
+                self.__handle_event(event)
+                if self.pg_gui_manager != None:
+                    self.pg_gui_manager.process_events(event)
             
-            #update model matrices and draw meshes
-            self.__update_model()
-
-            self.pg_gui_manager.update(self.time_delta)
-            self.win_surface.blit(self.gui_surface, (0, 0))
-
-            self.pg_gui_manager.draw_ui(self.win_surface)
+            if pipeline != None:
+                self.__load_pending()
+                pipeline.kick()
+                self.__draw_packet(packet)
+            else:
+                self.__render_frame()
+
+            if self.pg_gui_manager != None:
+                self.pg_gui_manager.update(self.time_delta)
+                self.win_surface.blit(self.gui_surface, (0, 0))
+
+                self.pg_gui_manager.draw_ui(self.win_surface)
             # self.gui_surface.fill((0, 0, 0, 0)) 
             # self.pg_gui_manager.draw_ui(self.gui_surface)
             # flip the buffers
             pg.display.flip()
+            if pipeline != None:
+                pipeline.end_draw()
+            if self.first_frame == None:
+                self.first_frame = time.perf_counter()
+            self.frames += 1
         
             # frame rate limit
-            self.time_delta = self.clock.tick(60)/1000
+            delta = self.clock.tick(60)/1000
 
             
         #exit program
+        if pipeline != None:
+            print(f'Pipeline: {pipeline.report()}')
         self.quit() 
+
+    def record(self, path:str):
+        """record the events handled by renderLoop to path, see replay"""
+        self.recorder = EventRecorder(path)
+
+    def replay(self, path:str, render:bool=True, timings:str=None) -> list[tuple]:
+        """feed a recorded session through the event handlers as fast as possible, frame by frame as recorded.
+        render=False skips drawing and only updates the scene matrices. returns per frame
+        (frame, events, event_ms, render_ms, total_ms) and writes them to the timings csv when given"""
+        self.__setup_scene()
+        rows = []
+        pipeline = self.pipeline if render else None
+        if pipeline != None:
+            pipeline.kick()
+        for frame, recorded in enumerate(load_recording(path)):
+            start = time.perf_counter()
+            if pipeline != None:
+                packet = pipeline.wait()
+            for item in recorded:
+                # handlers read the modifier keys from pygame's keyboard state
+                pg.key.set_mods(item.mods)
+                self.__handle_event(item.event)
+            events_done = time.perf_counter()
+
+            if pipeline != None:
+                self.__load_pending()
+                pipeline.kick()
+                self.__draw_packet(packet)
+                glFinish()
+                pipeline.end_draw()
+            elif render:
+                self.__render_frame()
+                # wait for the gpu so the frame time includes the draw
+                glFinish()
+            else:
+                self.mesh_manager.scene.update()
+            end = time.perf_counter()
+
+            self.frames += 1
+            rows.append((frame, len(recorded), (events_done - start) * 1000, (end - events_done) * 1000, (end - start) * 1000))
+
+        if timings != None:
+            with open(timings, 'w') as f:
+                f.write("frame,events,event_ms,render_ms,total_ms\n")
+                for row in rows:
+                    f.write("%d,%d,%.4f,%.4f,%.4f\n" % row)
+
+        total = sum(row[4] for row in rows)
+        print(f'Replayed {len(rows)} frames in {total:.1f} ms ({total / max(len(rows), 1):.3f} ms per frame)')
+        if pipeline != None:
+            print(f'Pipeline: {pipeline.report()}')
+        return rows
+
+    def __setup_scene(self):
+        # self.mesh_manager.add_mesh(Sphere())
+        self.mesh_manager.load_mesh("models/teapot.obj")
+        mesh = self.mesh_manager.get_mesh(0) 
+        mesh.transform.position.move(dx=0.0, dy=0.0, dz=-3)
+        mesh.transform.rotation.move(dy=180, dx=90)
         
-    def createShader(self, vertexFilepath, fragmentFilepath):
-        with open(vertexFilepath, 'r') as f:
-            vertex_src = f.readlines()
+        # mesh.change_color(0.024, 0.969, 0.953)
+        # (0.969, 0.573, 0.024) orange
+        # mesh_2 = self.mesh_manager.get_mesh(1)
+        # mesh_2.transform.position.move(dx=-0.34,dy=0.0, dz=-3)
+        # mesh_2.change_color(0.549, 0.024, 0.969)
         
-        with open(fragmentFilepath, 'r') as f:
-            fragment_src = f.readlines()
+        self.__update_model()
+
+    def __handle_event(self, event):
+        self.__camera_ctl(event)
+        self.__adjust_ratio(event)
+        self.__mouse_picking(event)
+        self.__vertex_hover(event)
+        self.__object_ctl(event)
+        self.__box_select(event)
+
+    def __load_pending(self):
+        # upload chunks of meshes that are still loading
+        self.mesh_manager.poll_loading()
+        # create and upload background loaded assets within the frame budget
+        self.assets.pump()
+
+    def __render_frame(self):
+        self.__load_pending()
+
+        # refresh screen
+        if self.resolution != None:
+            # the scene goes to the scaled offscreen framebuffer, upscaled in __update_model
+            self.resolution.begin(self.scr_width, self.scr_height)
+        else:
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
-        shader = compileProgram(
-        compileShader(vertex_src, GL_VERTEX_SHADER),
-        compileShader(fragment_src, GL_FRAGMENT_SHADER)
-       )   
+        # Rendering code would go here
+        glUseProgram(self.shader)
+        self.programs.update_camera()
+
+        #rotate cube
+        # self.obj.transform.rotation.move(dz=1)
+        # self.obj.transform.position.bounce(dy=0.01)
+        # self.obj.transform.scale.bounce(dx=0.001)
+        
+        #update model matrices and draw meshes
+        self.__update_model()
         
-        return shader   
+    def __prepare_frame(self, packet:FramePacket):
+        """worker thread half of a pipelined frame: picking, world matrices, frustum culling and the sorted draw
+        packets, no GL calls"""
+        if self.pick_position != None:
+            self.__pick(*self.pick_position)
+            self.pick_position = None
+
+        self.__advance()
+        scene = self.mesh_manager.scene
+        scene.update()
+        packet.begin(scene.world)
+        packet.view, packet.projection = self.view, self.projection
+        planes = frustum_planes(self.view @ self.projection, np.array([-1, -1, 1, 1]))
+        visible = boxes_in_frustum(planes, scene.world_min, scene.world_max)
+        for mesh in self.mesh_manager.meshes:
+            row = mesh.node.index
+            # the scene boxes of dynamic and still loading meshes can be stale, they are never culled
+            if mesh.static and not visible[row]:
+                packet.culled += 1
+                continue
+            mesh.submit(packet, self.shader, self.modelMatrixLocation, packet.world[row])
+        packet.packets.sort(key=DrawPacket.key)
+
+    def __advance(self):
+        """animation and other per frame vertex edits, before the world boxes are updated"""
+        for mesh in self.mesh_manager.meshes:
+            if not mesh.static:
+                mesh.advance(self.time_delta)
+
+    def __draw_packet(self, packet:FramePacket):
+        """context thread half of a pipelined frame, everything but the GL calls comes from the packet"""
+        self.pipeline.begin_draw()
+        if self.resolution != None:
+            self.resolution.begin(self.scr_width, self.scr_height)
+        else:
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+
+        glUseProgram(self.shader)
+        # the staged camera may already be the next frame's
+        self.programs.upload_camera(packet.view, packet.projection)
+        queue = self.render_queue
+        queue.begin_frame()
+        queue.packets = packet.packets
+        if self.resolution != None and self.resolution.active:
+            queue.flush(passes=(PASS_MESH,), presorted=True)
+            self.resolution.end()
+        queue.flush(presorted=True)
+
+    def __init_gui(self):
+        # pygame_gui is only imported when the gui is used, it is one of the slowest imports
+        import pygame_gui as pg_gui
+        from gui_test import UIInputStepper
+
+        self.pg_gui_manager = pg_gui.UIManager((self.scr_width, self.scr_height))
+        UIInputStepper(relative_rect=pg.Rect(50, 50, 200, 40), manager=self.pg_gui_manager, value=0)
+
+    def createShader(self, vertexFilepath, fragmentFilepath):
+        # compiled once, later launches link the cached program binary
+        return self.programs.load(vertexFilepath, fragmentFilepath)
 
     def __adjust_ratio(self, event):
         """on Window Resize event adjust aspect ratio"""
         if event.type == pg.VIDEORESIZE:
-            self.scr_width, self.scr_height  = pg.display.get_window_size()
+            # from the event, replayed resizes do not change the window
+            self.scr_width, self.scr_height  = event.w, event.h
             self.__update_projection()
 
     def __object_ctl(self, event):
@@ -165,6 +357,7 @@ class Renderer:
                 #     world = world / world[3]
                 
                 self.mesh_focus.transform.position.update(x=world[0], y=world[1], z=z)
+                self.__flag_overlaps()
 
         if event.type == pg.KEYDOWN:
             if event.key == pg.K_w:
@@ -175,6 +368,35 @@ class Renderer:
             if event.key == pg.K_ESCAPE and self.mesh_focus != None:
                 self.mesh_focus.highlight.enable = False
                 self.mesh_focus = None
+                for mesh in self.overlapping:
+                    mesh.highlight.enable = mesh in self.selection.meshes
+                self.overlapping = []
+
+    def __flag_overlaps(self):
+        """highlight the meshes whose triangles the focused mesh passes through"""
+        hits = self.mesh_manager.overlaps(self.mesh_focus, narrow=True)
+        for mesh in self.overlapping:
+            if mesh not in hits and mesh not in self.selection.meshes:
+                mesh.highlight.enable = False
+        for mesh in hits:
+            mesh.highlight.enable = True
+        self.overlapping = hits
+
+    def __box_select(self, event):
+        """right drag selects the meshes inside the rectangle, with shift the vertices"""
+        if event.type == pg.MOUSEBUTTONDOWN and event.button == 3:
+            self.box_start = event.pos
+
+        if event.type == pg.MOUSEBUTTONUP and event.button == 3 and self.box_start != None:
+            rect = screen_rect_to_ndc(self.box_start, event.pos, self.scr_width, self.scr_height)
+            self.box_start = None
+            vertex_mode = bool(pg.KMOD_LSHIFT & pg.key.get_mods())
+
+            for mesh in self.selection.meshes:
+                mesh.highlight.enable = mesh is self.mesh_focus
+            self.selection = box_select(self.mesh_manager.scene, self.view, self.projection, rect, vertices=vertex_mode)
+            for mesh in self.selection.meshes:
+                mesh.highlight.enable = True
 
     def __camera_ctl(self, event):
         if event.type == pg.MOUSEWHEEL:
@@ -202,10 +424,10 @@ class Renderer:
                 
     def __update_camera(self):
         # create view matrix with updated camera target
-        view = self.camera.view_matrix()
+        self.view = self.camera.view_matrix()
 
-        #update view matrix in gpu mem
-        glUniformMatrix4fv(self.viewMatrixLocation, 1, GL_FALSE, view)
+        #stage view matrix, uploaded to the camera uniform buffer once per frame
+        self.programs.set_camera(view=self.view)
 
     def __update_projection(self):
         # create projection matrix and bind data to gpu memory
@@ -213,36 +435,145 @@ class Renderer:
         fovy=self.fov, aspect=self.scr_width/self.scr_height, 
         near=0.1, far=self.render_distance, dtype=np.float32)
         
-        # send the data to gpu variable
-        glUniformMatrix4fv(self.ProjectionMatrixLocation, 1, GL_FALSE, self.projection)
+        # stage the data for the camera uniform buffer
+        self.programs.set_camera(projection=self.projection)
 
     def __update_model(self):
         """update model matrix for all meshes and draw them"""
-        for mesh in self.mesh_manager.meshes:
-            model = mesh.create_model_matrix()
-            # update model matrix in gpu memory
-            glUniformMatrix4fv(self.modelMatrixLocation, 1, GL_FALSE, model)
-            mesh.draw()
+        self.__advance()
+        # recompute world matrices of the subtrees that moved since the last frame
+        scene = self.mesh_manager.scene
+        scene.update()
+        queue = self.render_queue
+        queue.begin_frame()
+        meshes = self.mesh_manager.meshes
+        gpu = self.gpu_culling
+        if gpu != None:
+            # one compute dispatch and one indirect draw for the batched meshes, the rest go through the queue
+            gpu.update(scene, meshes, self.view, self.projection)
+            gpu.submit(queue)
+            for mesh in gpu.decorated:
+                mesh.submit_overlays(queue, self.shader, self.modelMatrixLocation, scene.world[mesh.node.index])
+            meshes = gpu.others
+        occlusion = self.occlusion
+        if occlusion != None:
+            occlusion.begin_frame()
+        for mesh in meshes:
+            if occlusion != None and occlusion.cull(mesh):
+                continue
+            model = scene.world[mesh.node.index]
+            mesh.submit(queue, self.shader, self.modelMatrixLocation, model)
+        if occlusion != None:
+            # the occluders go first, the boxes are tested against their depth
+            queue.flush(passes=(PASS_MESH,))
+            occlusion.test_and_submit(meshes, scene, self.camera.transform.position.vector(),
+                                      queue, self.shader, self.modelMatrixLocation)
+        # sorted draws, the model matrix is only uploaded when the mesh changes
+        if self.resolution != None and self.resolution.active:
+            queue.flush(passes=(PASS_MESH,))
+            self.resolution.end()
+        # overlays (at native resolution)
+        queue.flush()
 
        
     def __mouse_picking(self, event):
         if not event.type == pg.MOUSEMOTION:
             return None
 
-        mouse_x, mouse_y = event.pos
+        if self.pipeline != None:
+            # picked once per frame by the worker, at the last position
+            self.pick_position = event.pos
+            return None
+        self.__pick(*event.pos)
+
+    def __pick(self, mouse_x:int, mouse_y:int):
         self.mesh_manager.hit_manager.draw_rays(mouse_x, mouse_y)
 
         id, hit, dist = self.mesh_manager.hit_manager.get_hit()
         self.mesh_mouse_hover = self.mesh_manager.get_mesh(id)
        
     
+    def __vertex_hover(self, event, radius:float=12):
+        """snap to the vertex nearest to the mouse on meshes showing their wireframe"""
+        if not event.type == pg.MOUSEMOTION or any(event.buttons):
+            return None
+
+        meshes = [mesh for mesh in self.mesh_manager.meshes if mesh.wireframe.enable and mesh.ready]
+        scene = self.mesh_manager.scene
+        mouse_x, mouse_y = event.pos
+        hits = self.vertex_query.nearest(meshes, [scene.world_matrix(mesh) for mesh in meshes], self.view, self.projection,
+                                         (self.scr_width, self.scr_height), mouse_x, mouse_y, k=1)
+        hover = hits[0] if hits and hits[0][2] <= radius else None
+
+        if self.vertex_hover != None and (hover == None or hover[0] is not self.vertex_hover[0]):
+            self.vertex_hover[0].wireframe.points.hover(None)
+        if hover != None:
+            hover[0].wireframe.points.hover(hover[1])
+        self.vertex_hover = hover
+    
+    def ray_cast(self, shading:bool=True, **options):
+        """cpu reference image of the current view at the window size, see MeshManager.ray_cast"""
+        return self.mesh_manager.ray_cast(self.view, self.projection, self.scr_width, self.scr_height, shading, **options)
+
+    def forget_mesh(self, mesh):
+        """drop every reference to a mesh removed from the mesh manager"""
+        if self.mesh_focus is mesh:
+            self.mesh_focus = None
+        if self.mesh_mouse_hover is mesh:
+            self.mesh_mouse_hover = None
+        if self.vertex_hover != None and self.vertex_hover[0] is mesh:
+            self.vertex_hover = None
+        if mesh in self.selection.meshes:
+            self.selection.meshes.remove(mesh)
+            self.selection.vertices.pop(mesh.id, None)
+        if mesh in self.overlapping:
+            self.overlapping.remove(mesh)
+        self.vertex_query.forget(mesh)
+        if self.occlusion != None:
+            self.occlusion.forget(mesh)
+
     def quit(self):
+        if self.pipeline != None:
+            # the worker may still be preparing a frame from the meshes destroyed below
+            self.pipeline.stop()
+        if self.recorder != None:
+            self.recorder.close()
+        self.assets.shutdown()
         self.mesh_manager.destroy_meshes()
-        glDeleteProgram(self.shader)    
+        if self.picking == 'id':
+            self.mesh_manager.hit_manager.destroy()
+        if self.resolution != None:
+            self.resolution.destroy()
+        if self.occlusion != None:
+            self.occlusion.destroy()
+        if self.gpu_culling != None:
+            self.gpu_culling.destroy()
+        self.programs.destroy()
+        # everything is destroyed, anything still registered leaked
+        tracker.check_leaks()
         pg.quit()
      
 
 
 if __name__ == "__main__":
-    renderer = Renderer()
-    renderer.renderLoop()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="meshy viewer")
+    parser.add_argument("--record", metavar="FILE", help="record the input events of the session")
+    parser.add_argument("--replay", metavar="FILE", help="replay a recorded session in a hidden window and exit")
+    parser.add_argument("--timings", metavar="CSV", help="per frame timings of the replay")
+    parser.add_argument("--no-render", action="store_true", help="replay the event handlers only, no drawing")
+    parser.add_argument("--frame-budget", type=float, metavar="MS", help="scale the render resolution to hold this gpu frame time")
+    parser.add_argument("--occlusion", action="store_true", help="skip meshes hidden behind others with occlusion queries")
+    parser.add_argument("--gpu-culling", action="store_true", help="cull and draw static meshes on the gpu (OpenGL 4.3)")
+    parser.add_argument("--pipelined", action="store_true", help="prepare the next frame on a worker thread while drawing")
+    args = parser.parse_args()
+
+    if args.replay:
+        renderer = Renderer(gui=False, hidden=True, frame_budget=args.frame_budget, occlusion=args.occlusion, gpu_culling=args.gpu_culling, pipelined=args.pipelined)
+        renderer.replay(args.replay, render=not args.no_render, timings=args.timings)
+        renderer.quit()
+    else:
+        renderer = Renderer(frame_budget=args.frame_budget, occlusion=args.occlusion, gpu_culling=args.gpu_culling, pipelined=args.pipelined)
+        if args.record:
+            renderer.record(args.record)
+        renderer.renderLoop()
\ No newline at end of file
@@ -0,0 +1,188 @@
+import time
+import queue
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, Future
+from gl import *
+from mesh import Mesh, MeshManager
+from bounds import Bounds
+from hightlight import prepare_overlays
+from cleanup import CleanupPipeline
+from geometry import uv_sphere
+from loader import parse_obj_chunk, detect_format, read_mesh
+
+
+class UploadJob:
+    """Copy of one host array into an already allocated buffer object, done in slices across frames"""
+    __slots__ = ("buffer", "data", "offset")
+
+    def __init__(self, buffer, data:np.ndarray):
+        self.buffer = buffer
+        self.data = data
+        self.offset = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.data.nbytes - self.offset
+
+    def upload(self, size:int) -> int:
+        """copy the next size bytes, returns the bytes copied"""
+        size = min(size, self.remaining)
+        # a flat byte view of the array, taken now so colors changed before the upload are picked up
+        raw = np.ascontiguousarray(self.data).reshape(-1).view(np.uint8)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, self.buffer)
+        glBufferSubData(GL_COPY_WRITE_BUFFER, self.offset, size, raw[self.offset:self.offset + size])
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        self.offset += size
+        return size
+
+
+class PendingMesh:
+    """A mesh whose buffers are allocated but still being filled, hidden until every job is done"""
+    __slots__ = ("mesh", "jobs", "on_ready", "started")
+
+    def __init__(self, mesh:Mesh, on_ready=None):
+        self.mesh = mesh
+        self.jobs = [UploadJob(buffer, data) for buffer, data in mesh.pending_uploads()]
+        self.on_ready = on_ready
+        self.started = time.perf_counter()
+
+
+class AssetLoader:
+    """Loads meshes without stalling the render loop.
+
+    Worker threads parse and preprocess (cleanup pipeline, generated geometry, bounds and overlay arrays) and
+    queue the finished arrays, pump() is called once per frame on the GL thread: it creates the hidden meshes and streams their buffers
+    with glBufferSubData until the frame's upload budget (budget_ms and/or budget_bytes) is used up.
+    At least one slice is uploaded per frame so loading always makes progress"""
+
+    def __init__(self, mesh_manager:MeshManager, workers:int=2, budget_ms:float=2.0, budget_bytes:int=8 << 20, slice_bytes:int=1 << 20):
+        self.mesh_manager = mesh_manager
+        self.budget_ms = budget_ms
+        self.budget_bytes = budget_bytes
+        self.slice_bytes = slice_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="assets")
+        self.completed = queue.Queue() # (future, parent, on_ready) filled by the workers
+        self.uploading:list[PendingMesh] = []
+        self.submitted = 0
+        self.bytes_uploaded = 0 # in the last pump
+        # removed meshes assets in flight were parented to -> the parent they attach to instead, see forget
+        self.removed:dict[Mesh, Mesh] = {}
+        # remove_mesh tells the loader about removed meshes
+        mesh_manager.assets = self
+
+    @property
+    def pending(self) -> int:
+        """assets submitted that are not drawable yet"""
+        return self.submitted
+
+    def load_mesh(self, filepath:str, pipeline:CleanupPipeline=None, parent:Mesh=None, on_ready=None) -> Future:
+        """parse an OBJ, PLY or STL file in the background, on_ready(mesh) is called on the GL thread once it is visible"""
+        return self.submit(_read_mesh, filepath, pipeline, parent=parent, on_ready=on_ready)
+
+    def load_sphere(self, radius:float=0.5, stacks:int=40, slices:int=40, parent:Mesh=None, on_ready=None) -> Future:
+        """generate a uv sphere in the background, placed like mesh.Sphere"""
+        def placed(mesh:Mesh):
+            mesh.transform.position.update(0.0, 0.0, -3.0)
+            if on_ready is not None:
+                on_ready(mesh)
+        return self.submit(uv_sphere, radius, stacks, slices, parent=parent, on_ready=placed)
+
+    def submit(self, build, *args, parent:Mesh=None, on_ready=None) -> Future:
+        """run build(*args) -> (vertices (N, 6) float32, indices uint32) on a worker, the result becomes a Mesh"""
+        future = self.executor.submit(_prepare, build, *args)
+        future.add_done_callback(lambda f: self.completed.put((f, parent, on_ready)))
+        self.submitted += 1
+        return future
+
+    def pump(self) -> bool:
+        """create meshes for finished assets and upload within the frame budget, returns True while work is left"""
+        start = time.perf_counter()
+        while True:
+            try:
+                future, parent, on_ready = self.completed.get_nowait()
+            except queue.Empty:
+                break
+            self._create(future, parent, on_ready)
+
+        deadline = start + self.budget_ms / 1000
+        self.bytes_uploaded = 0
+        while self.uploading:
+            if self.bytes_uploaded and (self.bytes_uploaded >= self.budget_bytes or time.perf_counter() >= deadline):
+                break
+            pending = self.uploading[0]
+            job = pending.jobs[0]
+            size = min(self.slice_bytes, max(self.budget_bytes - self.bytes_uploaded, 1))
+            self.bytes_uploaded += job.upload(size)
+            if job.remaining == 0:
+                pending.jobs.pop(0)
+            if not pending.jobs:
+                self.uploading.pop(0)
+                self._ready(pending)
+        if not self.submitted:
+            self.removed.clear()
+        return self.submitted > 0
+
+    def forget(self, mesh:Mesh):
+        """drop a mesh removed from the mesh manager, called before it leaves the scene graph. Its upload is
+        cancelled and assets still in flight under it attach to its parent, like the children remove_mesh moves up"""
+        for pending in self.uploading:
+            if pending.mesh is mesh:
+                self.uploading.remove(pending)
+                self.submitted -= 1
+                break
+        if self.submitted:
+            parent = mesh.node.parent if mesh.node is not None else None
+            self.removed[mesh] = parent.mesh if parent is not None else None
+
+    def shutdown(self):
+        """stop the workers, assets not uploaded yet are dropped"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _create(self, future:Future, parent:Mesh, on_ready):
+        if future.cancelled():
+            self.submitted -= 1
+            return None
+        error = future.exception()
+        if error is not None:
+            self.submitted -= 1
+            print(f'Loading asset failed: {error}')
+            return None
+
+        vertices, indices, bounds, overlays = future.result()
+        while parent in self.removed:
+            parent = self.removed[parent]
+        # storage only, the data follows in slices
+        mesh = Mesh(vertices, indices, upload=False, bounds=bounds, overlays=overlays)
+        self.mesh_manager.add_mesh(mesh, parent=parent)
+        pending = PendingMesh(mesh, on_ready)
+        if pending.jobs:
+            self.uploading.append(pending)
+        else:
+            self._ready(pending)
+
+    def _ready(self, pending:PendingMesh):
+        pending.mesh.set_ready()
+        self.submitted -= 1
+        if pending.on_ready is not None:
+            pending.on_ready(pending.mesh)
+
+
+def _prepare(build, *args) -> tuple:
+    """worker side of AssetLoader.submit, everything Mesh computes from the arrays so only GL calls are left"""
+    vertices, indices = build(*args)
+    return vertices, indices, Bounds(vertices[:, 0:3]), prepare_overlays(vertices, indices)
+
+
+def _read_mesh(filepath:str, pipeline:CleanupPipeline=None) -> tuple[np.ndarray, np.ndarray]:
+    """worker side of AssetLoader.load_mesh"""
+    if detect_format(filepath) != 'obj':
+        vertices, indices = read_mesh(filepath)
+    else:
+        with open(filepath, 'rb') as f:
+            vertices, triangles = parse_obj_chunk(f.read(), colors=True)
+        indices = triangles.astype(np.uint32).reshape(-1)
+        print(f'Loaded /{filepath}: {len(vertices)} vertices, {len(indices)//3} triangles')
+    if pipeline is not None:
+        vertices, indices = pipeline.run(vertices, indices)
+        print(pipeline.summary())
+    return vertices, indices
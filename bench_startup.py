@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# measures cold import time of each module and time-to-first-frame of the Renderer, every sample runs
+# in a fresh interpreter so no module is already cached in sys.modules
+
+MODULES = ["loader", "geometry", "ray", "vector", "camera", "gl", "mesh", "app"]
+
+IMPORT_SNIPPET = """
+import time, sys
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start, int('pygame' in sys.modules), int('OpenGL.GL' in sys.modules))
+"""
+
+FIRST_FRAME_SNIPPET = """
+import time
+start = time.perf_counter()
+import pygame as pg
+from app import Renderer
+imported = time.perf_counter()
+renderer = Renderer(gui={gui})
+initialized = time.perf_counter()
+# the loop handles the queued quit after presenting its first frame
+pg.event.post(pg.event.Event(pg.QUIT))
+renderer.renderLoop()
+print(imported - start, initialized - start, renderer.first_frame - start)
+"""
+
+
+def run(snippet:str, production:bool) -> list[str]:
+    env = dict(os.environ, MESHY_PRODUCTION="1" if production else "0")
+    result = subprocess.run([sys.executable, "-c", snippet], env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1].split()
+
+
+def import_times(repeat:int, production:bool) -> dict:
+    results = {}
+    for module in MODULES:
+        samples = [run(IMPORT_SNIPPET.format(module=module), production) for _ in range(repeat)]
+        results[module] = {
+            "seconds": min(float(s[0]) for s in samples),
+            "pygame": bool(int(samples[0][1])),
+            "gl": bool(int(samples[0][2])),
+        }
+    return results
+
+
+def first_frame_times(repeat:int, production:bool, gui:bool) -> dict:
+    samples = [run(FIRST_FRAME_SNIPPET.format(gui=gui), production) for _ in range(repeat)]
+    imported, initialized, first_frame = (min(float(s[i]) for s in samples) for i in range(3))
+    return {"import": imported, "init": initialized, "first_frame": first_frame}
+
+
+def profile_imports(module:str, top:int) -> list[tuple[int, str]]:
+    """return the slowest imports (cumulative microseconds, name) reported by python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="startup benchmark: import time and time-to-first-frame")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per measurement, best is reported")
+    parser.add_argument("--production", action="store_true", help="run with MESHY_PRODUCTION=1")
+    parser.add_argument("--no-gui", action="store_true", help="create the Renderer without pygame_gui")
+    parser.add_argument("--skip-frame", action="store_true", help="only measure imports (no window needed)")
+    parser.add_argument("--profile", metavar="MODULE", help="list the slowest imports of MODULE")
+    parser.add_argument("--json", action="store_true", help="print results as json")
+    args = parser.parse_args()
+
+    results = {"imports": import_times(args.repeat, args.production)}
+    if not args.skip_frame:
+        results["first_frame"] = first_frame_times(args.repeat, args.production, not args.no_gui)
+    if args.profile:
+        results["profile"] = profile_imports(args.profile, top=15)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        sys.exit(0)
+
+    print(f"{'module':<10} {'import ms':>10}  pygame  gl")
+    for module, r in results["imports"].items():
+        print(f"{module:<10} {r['seconds'] * 1000:>10.1f}  {str(r['pygame']):<6}  {r['gl']}")
+
+    if "first_frame" in results:
+        r = results["first_frame"]
+        print(f"\nimports {r['import'] * 1000:.1f} ms, renderer ready {r['init'] * 1000:.1f} ms, "
+              f"first frame {r['first_frame'] * 1000:.1f} ms")
+
+    if "profile" in results:
+        print(f"\nslowest imports of {args.profile}:")
+        for cumulative, name in results["profile"]:
+            print(f"{cumulative / 1000:>10.1f} ms  {name}")
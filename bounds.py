@@ -0,0 +1,162 @@
+import numpy as np
+
+# object space bounds of meshes and their world space transforms, GL free.
+# matrices follow the pyrr row vector convention used everywhere else: world = [p, 1] @ model
+
+
+class Bounds:
+    """Tight object space bounds of a set of positions, computed once and cached on the mesh:
+    axis aligned box, near minimal bounding sphere (Ritter) and a PCA oriented box.
+
+    positions are read chunk by chunk so memory mapped vertices are never loaded whole"""
+    __slots__ = ("min", "max", "center", "radius", "obb_center", "obb_axes", "obb_extent")
+
+    def __init__(self, positions:np.ndarray, chunk:int=1 << 20):
+        if len(positions) == 0:
+            self._set_box(np.zeros(3), np.zeros(3))
+            return None
+
+        self.min, self.max = chunked_bounds(positions, chunk)
+        self.center, self.radius = _ritter_sphere(positions, chunk)
+        self.obb_center, self.obb_axes, self.obb_extent = _pca_box(positions, chunk)
+
+        # a skewed point distribution can give a pca box larger than the aabb, keep the tighter one
+        aabb_extent = (self.max - self.min) / 2
+        if np.prod(self.obb_extent) > np.prod(aabb_extent):
+            self.obb_center = (self.min + self.max) / 2
+            self.obb_axes = np.eye(3)
+            self.obb_extent = aabb_extent
+
+    @classmethod
+    def from_aabb(cls, low:np.ndarray, high:np.ndarray) -> 'Bounds':
+        """bounds known only by their box (e.g. while a mesh is still loading)"""
+        bounds = cls.__new__(cls)
+        bounds._set_box(np.asarray(low, dtype=np.float64), np.asarray(high, dtype=np.float64))
+        return bounds
+
+    def world_sphere(self, matrix:np.ndarray) -> tuple[np.ndarray, float]:
+        """(center, radius) of the bounding sphere under model matrix"""
+        centers, radii = transform_spheres(self.center[None], np.array([self.radius]), matrix[None])
+        return centers[0], radii[0]
+
+    def world_aabb(self, matrix:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(min, max) of the world axis aligned box enclosing the transformed box"""
+        mins, maxs = transform_aabbs(self.min[None], self.max[None], matrix[None])
+        return mins[0], maxs[0]
+
+    def world_obb(self, matrix:np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(center, axes (3, 3) one unit axis per row, half extents) of the oriented box under model matrix"""
+        centers, axes, extents = transform_obbs(self.obb_center[None], self.obb_axes[None], self.obb_extent[None], matrix[None])
+        return centers[0], axes[0], extents[0]
+
+    def _set_box(self, low:np.ndarray, high:np.ndarray):
+        self.min, self.max = low, high
+        self.center = (low + high) / 2
+        self.radius = float(np.linalg.norm(high - low) / 2)
+        self.obb_center = self.center
+        self.obb_axes = np.eye(3)
+        self.obb_extent = (high - low) / 2
+
+    def __repr__(self):
+        return f"Bounds(min={self.min}, max={self.max}, radius={self.radius:.4f})"
+
+
+def stack(bounds:list[Bounds], name:str) -> np.ndarray:
+    """one attribute of many bounds as an array for the transform_* functions, e.g. stack(bounds, 'radius')"""
+    return np.array([getattr(b, name) for b in bounds], dtype=np.float64)
+
+
+def transform_spheres(centers:np.ndarray, radii:np.ndarray, matrices:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """world spheres of n meshes, the radius grows with the largest axis scale of each matrix"""
+    linear = matrices[:, :3, :3]
+    world_centers = np.einsum('ni,nij->nj', centers, linear) + matrices[:, 3, :3]
+    scale = np.linalg.norm(linear, axis=2).max(axis=1)
+    return world_centers, radii * scale
+
+
+def transform_aabbs(mins:np.ndarray, maxs:np.ndarray, matrices:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """world axis aligned boxes of n meshes: transform the center, the extents take the absolute linear part"""
+    linear = matrices[:, :3, :3]
+    center = np.einsum('ni,nij->nj', (mins + maxs) / 2, linear) + matrices[:, 3, :3]
+    extent = np.einsum('ni,nij->nj', (maxs - mins) / 2, np.abs(linear))
+    return center - extent, center + extent
+
+
+def transform_obbs(centers:np.ndarray, axes:np.ndarray, extents:np.ndarray, matrices:np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """world oriented boxes of n meshes, scale moves from the axes into the extents"""
+    linear = matrices[:, :3, :3]
+    world_centers = np.einsum('ni,nij->nj', centers, linear) + matrices[:, 3, :3]
+    world_axes = axes @ linear
+    lengths = np.linalg.norm(world_axes, axis=2)
+    world_axes = world_axes / np.where(lengths > 0, lengths, 1)[..., None]
+    return world_centers, world_axes, extents * lengths
+
+
+def chunked_bounds(positions:np.ndarray, chunk:int) -> tuple[np.ndarray, np.ndarray]:
+    """float64 box of (N, 3) positions read chunk rows at a time, memory mapped inputs are not loaded whole"""
+    low, high = np.full(3, np.inf), np.full(3, -np.inf)
+    for start in range(0, len(positions), chunk):
+        p = np.asarray(positions[start:start + chunk], dtype=np.float64)
+        low = np.minimum(low, p.min(axis=0))
+        high = np.maximum(high, p.max(axis=0))
+    return low, high
+
+
+def _farthest(positions:np.ndarray, point:np.ndarray, chunk:int) -> tuple[np.ndarray, float]:
+    """position farthest from point and its distance"""
+    best, best_dist = point, -1.0
+    for start in range(0, len(positions), chunk):
+        p = np.asarray(positions[start:start + chunk], dtype=np.float64)
+        dist = np.einsum('ij,ij->i', p - point, p - point)
+        i = int(dist.argmax())
+        if dist[i] > best_dist:
+            best, best_dist = p[i], float(dist[i])
+    return best, np.sqrt(best_dist)
+
+
+def _ritter_sphere(positions:np.ndarray, chunk:int, iterations:int=32) -> tuple[np.ndarray, float]:
+    """Ritter's bounding sphere: start from two far apart points, then grow toward the farthest outside
+    point until every position is inside. each step is one vectorized pass, the sphere is typically within a few
+    percent larger than the minimal one"""
+    x = np.asarray(positions[0], dtype=np.float64)
+    y, _ = _farthest(positions, x, chunk)
+    z, _ = _farthest(positions, y, chunk)
+    center = (y + z) / 2
+    radius = np.linalg.norm(z - y) / 2
+
+    for _ in range(iterations):
+        point, dist = _farthest(positions, center, chunk)
+        if dist <= radius * (1 + 1e-7):
+            return center, float(radius)
+        # new sphere touches the old one on the far side and the outside point
+        new_radius = (radius + dist) / 2
+        center = center + (point - center) * ((new_radius - radius) / dist)
+        radius = new_radius
+
+    # did not settle, enclose everything from the current center
+    return center, float(_farthest(positions, center, chunk)[1])
+
+
+def _pca_box(positions:np.ndarray, chunk:int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """oriented box along the principal axes of the positions, axes are rows of a right handed basis"""
+    count = len(positions)
+    total = np.zeros(3)
+    outer = np.zeros((3, 3))
+    for start in range(0, count, chunk):
+        p = np.asarray(positions[start:start + chunk], dtype=np.float64)
+        total += p.sum(axis=0)
+        outer += p.T @ p
+    mean = total / count
+    covariance = outer / count - np.outer(mean, mean)
+
+    _, vectors = np.linalg.eigh(covariance)
+    axes = vectors.T[::-1].copy() # largest variance first
+    if np.linalg.det(axes) < 0:
+        axes[2] = -axes[2]
+
+    low, high = np.full(3, np.inf), np.full(3, -np.inf)
+    for start in range(0, count, chunk):
+        local = np.asarray(positions[start:start + chunk], dtype=np.float64) @ axes.T
+        low = np.minimum(low, local.min(axis=0))
+        high = np.maximum(high, local.max(axis=0))
+    return ((low + high) / 2) @ axes, axes, (high - low) / 2
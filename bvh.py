@@ -0,0 +1,163 @@
+import numpy as np
+from bounds import transform_aabbs
+from ray import ray_triangles_intersect
+
+# bounding volume hierarchy over the triangles of a mesh, GL free.
+#
+# built as a linear bvh: triangles are sorted once by the morton code of their centroid and every node splits
+# its range of the sorted triangles in half, so each level of the tree is one vectorized pass (reduceat) over
+# the triangle boxes. queries walk the tree level by level with a frontier of nodes instead of recursion
+
+
+class TriangleBVH:
+    """Object space bvh of a triangle mesh. Node i covers triangles order[start[i]:start[i] + count[i]],
+    left[i] is its first child (the second is left[i] + 1) or -1 for leaves"""
+
+    def __init__(self, positions:np.ndarray, triangles:np.ndarray, leaf_size:int=8):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.leaf_size = leaf_size
+
+        corners = self.positions[self.triangles] # (T, 3, 3)
+        tri_min, tri_max = corners.min(axis=1), corners.max(axis=1)
+        self.order = np.argsort(_morton_codes((tri_min + tri_max) / 2), kind='stable')
+        tri_min, tri_max = tri_min[self.order], tri_max[self.order]
+
+        starts, counts, lefts, mins, maxs = [], [], [], [], []
+        level_start, level_count = np.zeros(1, dtype=np.int64), np.array([len(self.triangles)], dtype=np.int64)
+        node_count = 1
+        while len(level_start):
+            mins.append(np.minimum.reduceat(tri_min, level_start) if len(tri_min) else np.zeros((1, 3)))
+            maxs.append(np.maximum.reduceat(tri_max, level_start) if len(tri_max) else np.zeros((1, 3)))
+            split = level_count > leaf_size
+            left = np.full(len(level_start), -1, dtype=np.int64)
+            # children of this level are numbered in order after every node so far
+            left[split] = node_count + 2 * np.arange(np.count_nonzero(split))
+            node_count += 2 * np.count_nonzero(split)
+            starts.append(level_start)
+            counts.append(level_count)
+            lefts.append(left)
+
+            half = level_count[split] // 2
+            level_start = np.stack((level_start[split], level_start[split] + half), axis=1).reshape(-1)
+            level_count = np.stack((half, level_count[split] - half), axis=1).reshape(-1)
+
+        self.start = np.concatenate(starts)
+        self.count = np.concatenate(counts)
+        self.left = np.concatenate(lefts)
+        self.min = np.concatenate(mins)
+        self.max = np.concatenate(maxs)
+        # per axis copies for the ray traversal, gathers from 1d arrays are much faster than from (n, 3) rows
+        self.min_axes = tuple(np.ascontiguousarray(self.min[:, axis]) for axis in range(3))
+        self.max_axes = tuple(np.ascontiguousarray(self.max[:, axis]) for axis in range(3))
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def overlapping_leaves(self, other:'TriangleBVH', matrix:np.ndarray, max_pairs:int=1 << 22) -> tuple[np.ndarray, np.ndarray]:
+        """pairs of leaves (self node, other node) whose boxes overlap, other placed in the space of self by
+        matrix (row vector convention, p_self = [p_other, 1] @ matrix). The node with more triangles of a pair
+        is opened first, a frontier of more than max_pairs node pairs raises MemoryError"""
+        a = np.zeros(1, dtype=np.int64)
+        b = np.zeros(1, dtype=np.int64)
+        leaves_a, leaves_b = [], []
+        while len(a):
+            b_min, b_max = transform_aabbs(other.min[b], other.max[b], np.broadcast_to(matrix, (len(b), 4, 4)))
+            hit = np.all((self.min[a] <= b_max) & (b_min <= self.max[a]), axis=1)
+            a, b = a[hit], b[hit]
+
+            a_leaf, b_leaf = self.left[a] < 0, other.left[b] < 0
+            done = a_leaf & b_leaf
+            leaves_a.append(a[done])
+            leaves_b.append(b[done])
+
+            open_a = ~a_leaf & (b_leaf | (self.count[a] >= other.count[b]))
+            open_b = ~done & ~open_a
+            a_children = self.left[a[open_a]]
+            b_children = other.left[b[open_b]]
+            a = np.concatenate((a_children, a_children + 1, a[open_b], a[open_b]))
+            b = np.concatenate((b[open_a], b[open_a], b_children, b_children + 1))
+            if len(a) > max_pairs:
+                raise MemoryError(f"bvh traversal frontier exceeds {max_pairs} node pairs")
+
+        return np.concatenate(leaves_a), np.concatenate(leaves_b)
+
+    def intersect_rays(self, origins:np.ndarray, directions:np.ndarray, t_max:np.ndarray=None, max_pairs:int=1 << 22) -> tuple[np.ndarray, ...]:
+        """closest triangle hit by each of k rays (k, 3) given in the space of the bvh, hits are searched up to
+        t_max (k,) (default unbounded). returns (t, triangle, u, v) (k,): t stays t_max and triangle -1 for rays
+        without a closer hit, u v are the barycentric weights of the hit triangle's second and third corner"""
+        count = len(origins)
+        best = np.full(count, np.inf) if t_max is None else np.array(t_max, dtype=np.float64)
+        triangle = np.full(count, -1, dtype=np.int64)
+        u, v = np.zeros(count), np.zeros(count)
+        with np.errstate(divide='ignore'):
+            inverse = 1.0 / directions
+        origin_axes = [np.ascontiguousarray(origins[:, axis]) for axis in range(3)]
+        inverse_axes = [np.ascontiguousarray(inverse[:, axis]) for axis in range(3)]
+
+        def test_leaves(rays:np.ndarray, nodes:np.ndarray):
+            counts = self.count[nodes]
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            ray = np.repeat(rays, counts)
+            tri = self.order[np.repeat(self.start[nodes], counts) + offset]
+            corners = self.positions[self.triangles[tri]]
+            t, hit_u, hit_v = ray_triangles_intersect(origins[ray], directions[ray], corners[:, 0], corners[:, 1], corners[:, 2])
+            closer = t < best[ray]
+            ray, tri, t, hit_u, hit_v = ray[closer], tri[closer], t[closer], hit_u[closer], hit_v[closer]
+            # the nearest candidate of each ray, sorted by ray then t
+            nearest = np.lexsort((t, ray))
+            first = nearest[np.r_[True, ray[nearest][1:] != ray[nearest][:-1]]] if len(ray) else nearest
+            best[ray[first]] = t[first]
+            triangle[ray[first]] = tri[first]
+            u[ray[first]], v[ray[first]] = hit_u[first], hit_v[first]
+
+        rays, nodes = np.arange(count), np.zeros(count, dtype=np.int64)
+        while len(rays):
+            # slab test of every (ray, node) pair per axis, fmin/fmax drop the nan of rays running inside a slab plane
+            with np.errstate(invalid='ignore'):
+                for axis in range(3):
+                    origin, scale = origin_axes[axis][rays], inverse_axes[axis][rays]
+                    t1 = (self.min_axes[axis][nodes] - origin) * scale
+                    t2 = (self.max_axes[axis][nodes] - origin) * scale
+                    if axis == 0:
+                        near, far = np.fmin(t1, t2), np.fmax(t1, t2)
+                    else:
+                        near, far = np.fmax(near, np.fmin(t1, t2)), np.fmin(far, np.fmax(t1, t2))
+            hit = (near <= far) & (far >= 0) & (near <= best[rays])
+            rays, nodes, near = rays[hit], nodes[hit], near[hit]
+
+            leaf = self.left[nodes] < 0
+            if leaf.any():
+                # leaves front to back: the k-th nearest leaf of every ray is tested after the hits in the
+                # nearer ones, leaves behind a hit are skipped
+                leaf_order = np.lexsort((near[leaf], rays[leaf]))
+                leaf_rays, leaf_nodes, leaf_near = rays[leaf][leaf_order], nodes[leaf][leaf_order], near[leaf][leaf_order]
+                starts = np.flatnonzero(np.r_[True, leaf_rays[1:] != leaf_rays[:-1]])
+                sizes = np.diff(np.r_[starts, len(leaf_rays)])
+                for rank in range(sizes.max()):
+                    pick = starts[sizes > rank] + rank
+                    pick = pick[leaf_near[pick] <= best[leaf_rays[pick]]]
+                    if len(pick):
+                        test_leaves(leaf_rays[pick], leaf_nodes[pick])
+
+            inner = ~leaf
+            children = self.left[nodes[inner]]
+            rays = np.concatenate((rays[inner], rays[inner]))
+            nodes = np.concatenate((children, children + 1))
+            if len(rays) > max_pairs:
+                raise MemoryError(f"bvh traversal frontier exceeds {max_pairs} ray node pairs")
+
+        return best, triangle, u, v
+
+
+def _morton_codes(points:np.ndarray) -> np.ndarray:
+    """30 bit morton code of each point inside the bounds of all points"""
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64)
+    low, high = points.min(axis=0), points.max(axis=0)
+    cells = ((points - low) / np.where(high > low, high - low, 1) * 1023).astype(np.int64)
+    code = np.zeros(len(points), dtype=np.int64)
+    for bit in range(10):
+        for axis in range(3):
+            code |= ((cells[:, axis] >> bit) & 1) << (3 * bit + 2 - axis)
+    return code
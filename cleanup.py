@@ -0,0 +1,254 @@
+import abc
+import time
+import numpy as np
+from bounds import chunked_bounds
+
+# mesh cleanup stages run between parsing and Mesh creation, every stage works on
+# (vertices (N, 6) float32, indices (T * 3,) uint32) and walks the data in chunks of rows, so memory mapped
+# inputs are read piece by piece and besides the outputs only compact integer keys and remap tables are held in memory
+
+
+class StageReport:
+    """What a cleanup stage did: elements removed, elements fixed in place and time taken"""
+    __slots__ = ("name", "removed", "fixed", "seconds")
+
+    def __init__(self, name:str, removed:int=0, fixed:int=0, seconds:float=0.0):
+        self.name = name
+        self.removed = removed
+        self.fixed = fixed
+        self.seconds = seconds
+
+    def __repr__(self):
+        return f"{self.name}: removed {self.removed}, fixed {self.fixed} in {self.seconds * 1000:.2f} ms"
+
+
+class CleanupStage(abc.ABC):
+    """Base class for cleanup stages"""
+    name = "stage"
+
+    @abc.abstractmethod
+    def run(self, vertices:np.ndarray, indices:np.ndarray, chunk:int) -> tuple[np.ndarray, np.ndarray, int, int]:
+        """returns (vertices, indices, removed, fixed), inputs may be memory mapped and should be read chunk rows at a time"""
+
+
+class WeldVertices(CleanupStage):
+    """Merge vertices whose positions fall in the same tolerance sized cell of a spatial hash grid,
+    the first vertex of a cell is kept (with its color)"""
+    name = "weld"
+
+    def __init__(self, tolerance:float=1e-6):
+        self.tolerance = tolerance
+
+    def run(self, vertices, indices, chunk):
+        if len(vertices) == 0:
+            return vertices, indices, 0, 0
+
+        low, high = chunked_bounds(vertices[:, 0:3], chunk)
+        span = np.floor((high - low) / self.tolerance + 0.5).max()
+
+        # quantize positions to integer cells chunk by chunk, the three cell coordinates are packed
+        # in one int64 key when they fit in 21 bits each
+        packed = span < (1 << 21)
+        keys = np.empty(len(vertices) if packed else (len(vertices), 3), dtype=np.int64)
+        for start in range(0, len(vertices), chunk):
+            positions = np.asarray(vertices[start:start + chunk, 0:3], dtype=np.float64)
+            cells = np.floor((positions - low) / self.tolerance + 0.5).astype(np.int64)
+            if packed:
+                cells = (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+            keys[start:start + chunk] = cells
+
+        _, first, remap = np.unique(keys, axis=None if packed else 0, return_index=True, return_inverse=True)
+
+        # keep cells in order of first appearance so the output is stable
+        order = np.argsort(first, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        remap = rank[remap.reshape(-1)].astype(np.uint32)
+
+        welded = np.asarray(vertices[first[order]], dtype=np.float32)
+        return welded, _remap_chunked(indices, remap, chunk), len(vertices) - len(welded), 0
+
+
+class RemoveDegenerateTriangles(CleanupStage):
+    """Drop triangles that repeat a vertex index or whose area is below min_area"""
+    name = "degenerate"
+
+    def __init__(self, min_area:float=1e-12):
+        self.min_area = min_area
+
+    def run(self, vertices, indices, chunk):
+        triangles = indices.reshape(-1, 3)
+        kept = []
+        for start in range(0, len(triangles), chunk):
+            t = np.asarray(triangles[start:start + chunk])
+            a, b, c = (np.asarray(vertices[t[:, i], 0:3], dtype=np.float64) for i in range(3))
+            area = 0.5 * np.linalg.norm(np.cross(b - a, c - a), axis=1)
+            valid = (t[:, 0] != t[:, 1]) & (t[:, 1] != t[:, 2]) & (t[:, 2] != t[:, 0]) & (area >= self.min_area)
+            kept.append(t[valid])
+
+        result = np.concatenate(kept).reshape(-1) if kept else np.zeros(0, dtype=np.uint32)
+        return vertices, result.astype(np.uint32), len(triangles) - len(result) // 3, 0
+
+
+class RemoveDuplicateTriangles(CleanupStage):
+    """Drop triangles using the same three vertices as an earlier triangle (in any order or winding).
+
+    The keys of all triangles are compared at once: one int64 per triangle while the vertex indices fit in
+    21 bits, three uint32 past that. Both are built chunk by chunk"""
+    name = "duplicates"
+
+    def run(self, vertices, indices, chunk):
+        triangles = indices.reshape(-1, 3)
+        if len(triangles) == 0:
+            return vertices, indices, 0, 0
+
+        if len(vertices) < (1 << 21):
+            keys = np.empty(len(triangles), dtype=np.int64)
+            for start in range(0, len(triangles), chunk):
+                t = np.sort(np.asarray(triangles[start:start + chunk], dtype=np.int64), axis=1)
+                keys[start:start + chunk] = (t[:, 0] << 42) | (t[:, 1] << 21) | t[:, 2]
+            _, first = np.unique(keys, return_index=True)
+        else:
+            keys = np.empty((len(triangles), 3), dtype=np.uint32)
+            for start in range(0, len(triangles), chunk):
+                keys[start:start + chunk] = np.sort(np.asarray(triangles[start:start + chunk], dtype=np.uint32), axis=1)
+            _, first = np.unique(keys, axis=0, return_index=True)
+
+        first.sort()
+        result = np.asarray(triangles[first], dtype=np.uint32).reshape(-1)
+        return vertices, result, len(triangles) - len(first), 0
+
+
+class CompactVertices(CleanupStage):
+    """Drop vertices no triangle references and remap indices"""
+    name = "compact"
+
+    def run(self, vertices, indices, chunk):
+        used = np.zeros(len(vertices), dtype=bool)
+        for start in range(0, len(indices), chunk):
+            used[indices[start:start + chunk]] = True
+
+        remap = (np.cumsum(used, dtype=np.int64) - 1).astype(np.uint32)
+        compacted = np.asarray(vertices[used], dtype=np.float32)
+        return compacted, _remap_chunked(indices, remap, chunk), len(vertices) - len(compacted), 0
+
+
+class FixWinding(CleanupStage):
+    """Make triangle winding consistent across shared edges, per connected patch the orientation
+    used by the majority of its triangles wins.
+
+    Neighbouring triangles agree when their shared edge runs in opposite directions, the flips are
+    spread with a breadth first search whose frontiers are expanded with vectorized numpy operations.
+
+    The edge keys are built chunk by chunk but the adjacency spans the whole mesh, about 100 bytes per
+    triangle are held while it is built and about 40 during the search"""
+    name = "winding"
+
+    def run(self, vertices, indices, chunk):
+        triangles = indices.reshape(-1, 3)
+        count = len(triangles)
+        if count == 0:
+            return vertices, indices, 0, 0
+
+        indptr, neighbours, same_direction = self._adjacency(triangles, chunk)
+        flip = np.zeros(count, dtype=bool)
+        visited = indptr[1:] == indptr[:-1] # isolated triangles need no work
+
+        while not visited.all():
+            seed = int(np.argmin(visited))
+            visited[seed] = True
+            component = [np.array([seed])]
+            frontier = component[0]
+            while len(frontier):
+                starts, ends = indptr[frontier], indptr[frontier + 1]
+                counts = ends - starts
+                edge = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+                nodes = neighbours[edge]
+                values = flip[np.repeat(frontier, counts)] ^ same_direction[edge]
+                fresh = ~visited[nodes]
+                nodes, first = np.unique(nodes[fresh], return_index=True)
+                flip[nodes] = values[fresh][first]
+                visited[nodes] = True
+                component.append(nodes)
+                frontier = nodes
+
+            # keep the orientation of the majority
+            component = np.concatenate(component)
+            if flip[component].sum() * 2 > len(component):
+                flip[component] = ~flip[component]
+
+        fixed = np.asarray(indices, dtype=np.uint32).reshape(-1, 3).copy()
+        fixed[flip, 1], fixed[flip, 2] = fixed[flip, 2], fixed[flip, 1].copy()
+        return vertices, fixed.reshape(-1), 0, int(flip.sum())
+
+    def _adjacency(self, triangles:np.ndarray, chunk:int):
+        """CSR triangle adjacency over manifold edges, with a flag for neighbours sharing the edge in the same direction"""
+        # edge 3 * t + k runs from corner k to corner k + 1 of triangle t, its key is the vertex pair low << 32 | high
+        keys = np.empty(len(triangles) * 3, dtype=np.int64)
+        forward = np.empty(len(triangles) * 3, dtype=bool) # low is the start of the edge
+        for start in range(0, len(triangles), chunk):
+            t = np.asarray(triangles[start:start + chunk], dtype=np.int64)
+            ends = t[:, [1, 2, 0]]
+            edges = slice(3 * start, 3 * (start + len(t)))
+            keys[edges] = ((np.minimum(t, ends) << 32) | np.maximum(t, ends)).reshape(-1)
+            forward[edges] = (t <= ends).reshape(-1)
+        order = np.argsort(keys)
+        keys = keys[order]
+
+        # edges shared by exactly two triangles
+        same_as_next = keys[1:] == keys[:-1]
+        del keys
+        starts = np.flatnonzero(same_as_next)
+        manifold = np.ones(len(starts), dtype=bool)
+        manifold &= ~np.concatenate((same_as_next[1:], [False]))[starts] # no third edge after
+        manifold &= ~np.concatenate(([False], same_as_next[:-1]))[starts] # no edge before
+        starts = starts[manifold]
+
+        a, b = order[starts], order[starts + 1]
+        same = forward[a] == forward[b]
+        src = np.concatenate((a // 3, b // 3))
+        dst = np.concatenate((b // 3, a // 3))
+        same = np.concatenate((same, same))
+
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(len(triangles) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(triangles)), out=indptr[1:])
+        return indptr, dst[order], same[order]
+
+
+class CleanupPipeline:
+    """Runs cleanup stages in order and keeps a StageReport for each"""
+
+    def __init__(self, stages:list[CleanupStage], chunk:int=1 << 20):
+        self.stages = stages
+        self.chunk = chunk
+        self.reports:list[StageReport] = []
+
+    def run(self, vertices:np.ndarray, indices:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        self.reports = []
+        for stage in self.stages:
+            start = time.perf_counter()
+            vertices, indices, removed, fixed = stage.run(vertices, indices, self.chunk)
+            self.reports.append(StageReport(stage.name, removed, fixed, time.perf_counter() - start))
+        return vertices, indices
+
+    def summary(self) -> str:
+        return "\n".join(repr(report) for report in self.reports)
+
+
+def default_pipeline(tolerance:float=1e-6, chunk:int=1 << 20) -> CleanupPipeline:
+    """weld, drop degenerate and duplicate triangles, compact, then fix winding"""
+    return CleanupPipeline([
+        WeldVertices(tolerance),
+        RemoveDegenerateTriangles(),
+        RemoveDuplicateTriangles(),
+        CompactVertices(),
+        FixWinding(),
+    ], chunk=chunk)
+
+
+def _remap_chunked(indices:np.ndarray, remap:np.ndarray, chunk:int) -> np.ndarray:
+    result = np.empty(len(indices), dtype=np.uint32)
+    for start in range(0, len(indices), chunk):
+        result[start:start + chunk] = remap[indices[start:start + chunk]]
+    return result
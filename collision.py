@@ -0,0 +1,198 @@
+import numpy as np
+from bvh import TriangleBVH
+
+# overlap queries between meshes, GL free.
+#
+# broadphase: sweep and prune over the world space boxes the scene graph keeps per mesh. The boxes stay sorted
+# along one axis between updates, a nearly sorted order is re-sorted by timsort in about linear time, and the
+# candidate pairs come from one searchsorted over the sorted starts. Pairs are kept as sorted int64 keys so the
+# pairs that started or stopped overlapping since the last update are two set differences.
+#
+# narrow phase: the triangles of both meshes are paired through their bvhs (see bvh.py), then the triangle pairs
+# are separated with the separating axis test in vectorized batches
+
+TRIANGLES = 0x0004 # GL_TRIANGLES, only triangle meshes get a narrow phase
+
+
+def triangles_intersect(a:np.ndarray, b:np.ndarray, chunk:int=1 << 16) -> np.ndarray:
+    """separating axis test of triangle pairs, a and b (k, 3, 3) corners in the same space, touching counts as
+    intersecting. returns bool (k,)"""
+    result = np.zeros(len(a), dtype=bool)
+    for start in range(0, len(a), chunk):
+        result[start:start + chunk] = _sat(a[start:start + chunk], b[start:start + chunk])
+    return result
+
+
+def _sat(a:np.ndarray, b:np.ndarray) -> np.ndarray:
+    edges_a = np.roll(a, -1, axis=1) - a
+    edges_b = np.roll(b, -1, axis=1) - b
+    normal_a = np.cross(edges_a[:, 0], edges_a[:, 1])
+    normal_b = np.cross(edges_b[:, 0], edges_b[:, 1])
+    # both normals, the 9 edge x edge directions and, for coplanar pairs, the in plane edge normals of both
+    axes = np.concatenate((
+        normal_a[:, None], normal_b[:, None],
+        np.cross(edges_a[:, :, None], edges_b[:, None, :]).reshape(-1, 9, 3),
+        np.cross(normal_a[:, None], edges_a), np.cross(normal_b[:, None], edges_b),
+    ), axis=1)
+    # (nearly) zero axes from parallel edges separate nothing, their projections are rounding noise
+    x, y, z = (np.ascontiguousarray(axes[:, :, i]) for i in range(3))
+    lengths = x * x + y * y + z * z
+    valid = lengths > 1e-18 * lengths.max(axis=1, keepdims=True)
+
+    # projections of the corners on every axis, written out per component: reductions over axes of
+    # length 3 are much slower than elementwise operations on (k, 17) arrays
+    def interval(corners):
+        p = [x * corners[:, v, 0, None] + y * corners[:, v, 1, None] + z * corners[:, v, 2, None] for v in range(3)]
+        return np.minimum(np.minimum(p[0], p[1]), p[2]), np.maximum(np.maximum(p[0], p[1]), p[2])
+
+    min_a, max_a = interval(a)
+    min_b, max_b = interval(b)
+    separated = ((max_a < min_b) | (max_b < min_a)) & valid
+    return ~separated.any(axis=1)
+
+
+class SweepAndPrune:
+    """Overlapping pairs of n axis aligned boxes, the sort order is kept between calls"""
+
+    def __init__(self):
+        self.order = np.zeros(0, dtype=np.int64)
+        self.axis = 0
+
+    def pairs(self, mins:np.ndarray, maxs:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """rows (i, j) of every pair of overlapping boxes"""
+        n = len(mins)
+        if len(self.order) != n:
+            self.order = np.arange(n)
+        if n < 2:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # sweep along the axis the boxes are spread the most, it has the fewest false candidates
+        self.axis = int(np.argmax(((mins + maxs) / 2).var(axis=0)))
+        # the previous order is nearly sorted after small moves, timsort ('stable') takes about linear time on it
+        self.order = self.order[np.argsort(mins[self.order, self.axis], kind='stable')]
+        low = mins[self.order, self.axis]
+        high = maxs[self.order, self.axis]
+
+        # every box after i that starts before i ends overlaps it on the sweep axis
+        counts = np.searchsorted(low, high, side='right') - np.arange(n) - 1
+        counts = np.maximum(counts, 0)
+        first = np.repeat(np.arange(n), counts)
+        second = first + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        i, j = self.order[first], self.order[second]
+
+        hit = np.all((mins[i] <= maxs[j]) & (mins[j] <= maxs[i]), axis=1)
+        return i[hit], j[hit]
+
+
+class CollisionWorld:
+    """Overlapping meshes of a SceneGraph.
+
+    update() runs the broadphase on the world boxes when any moved and returns the pairs that started and
+    stopped overlapping since the last call, overlaps() and intersects() answer per mesh with the optional
+    triangle level narrow phase. Mesh bvhs are built on first use and rebuilt when the mesh bounds change"""
+
+    def __init__(self, scene, leaf_size:int=8):
+        self.scene = scene
+        self.leaf_size = leaf_size
+        self.broadphase = SweepAndPrune()
+        self.keys = np.zeros(0, dtype=np.int64) # sorted pair keys (low id << 32 | high id)
+        self.bvhs = {} # mesh -> (bounds the bvh was built for, TriangleBVH)
+        self.by_id = {}
+        self.nodes = None # scene node list the id table was built for
+        self.ids = np.zeros(0, dtype=np.int64) # mesh id of every scene row
+        self.mins = self.maxs = None # world boxes of the last broadphase
+
+    @property
+    def pairs(self) -> list[tuple]:
+        """every overlapping pair of the last update (broadphase)"""
+        return self._meshes_of(self.keys)
+
+    def update(self) -> tuple[list[tuple], list[tuple]]:
+        """refresh the broadphase, returns (pairs that started overlapping, pairs that stopped)"""
+        scene = self.scene
+        scene.update()
+        if self.nodes is not scene.nodes:
+            self.nodes = scene.nodes
+            self.ids = np.array([node.mesh.id for node in scene.nodes], dtype=np.int64)
+            self.by_id = {node.mesh.id: node.mesh for node in scene.nodes}
+        elif self.mins is not None and np.array_equal(self.mins, scene.world_min) and np.array_equal(self.maxs, scene.world_max):
+            return [], []
+        self.mins, self.maxs = scene.world_min.copy(), scene.world_max.copy()
+
+        i, j = self.broadphase.pairs(self.mins, self.maxs)
+        a, b = self.ids[i], self.ids[j]
+        keys = np.unique((np.minimum(a, b) << 32) | np.maximum(a, b))
+        started = np.setdiff1d(keys, self.keys, assume_unique=True)
+        stopped = np.setdiff1d(self.keys, keys, assume_unique=True)
+        self.keys = keys
+        return self._meshes_of(started), self._meshes_of(stopped, removed=True)
+
+    def overlaps(self, mesh, narrow:bool=False) -> list:
+        """meshes whose world box overlaps mesh's, with narrow only those whose triangles intersect it"""
+        self.update()
+        low, high = self.keys >> 32, self.keys & 0xFFFFFFFF
+        ids = np.concatenate((high[low == mesh.id], low[high == mesh.id]))
+        others = [self.by_id[int(id)] for id in ids]
+        if narrow:
+            others = [other for other in others if self.intersects(mesh, other)]
+        return others
+
+    def intersects(self, a, b, batch:int=1 << 16) -> bool:
+        """triangle level test of two meshes at their current world transforms. Meshes that are not
+        triangle meshes or not loaded yet fall back to their box overlap"""
+        bvh_a, bvh_b = self.bvh(a), self.bvh(b)
+        self.scene.update()
+        world_a = self.scene.world_matrix(a).astype(np.float64)
+        world_b = self.scene.world_matrix(b).astype(np.float64)
+        if bvh_a is None or bvh_b is None:
+            return True
+
+        # b in the object space of a, row vector convention: p_a = [p_b, 1] @ world_b @ inverse(world_a)
+        matrix = world_b @ np.linalg.inv(world_a)
+        leaves_a, leaves_b = bvh_a.overlapping_leaves(bvh_b, matrix)
+        if len(leaves_a) == 0:
+            return False
+
+        # every triangle of a leaf of a against every triangle of the paired leaf of b, in batches of about
+        # `batch` triangle pairs so a hit stops early
+        count_a, count_b = bvh_a.count[leaves_a], bvh_b.count[leaves_b]
+        pair_counts = count_a * count_b
+        ends = np.cumsum(pair_counts)
+        start = 0
+        while start < len(leaves_a):
+            stop = max(int(np.searchsorted(ends, ends[start] - pair_counts[start] + batch, side='right')), start + 1)
+            counts = pair_counts[start:stop]
+            leaf = np.repeat(np.arange(start, stop), counts)
+            offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            tri_a = bvh_a.order[bvh_a.start[leaves_a[leaf]] + offset // count_b[leaf]]
+            tri_b = bvh_b.order[bvh_b.start[leaves_b[leaf]] + offset % count_b[leaf]]
+
+            corners_a = bvh_a.positions[bvh_a.triangles[tri_a]]
+            corners_b = bvh_b.positions[bvh_b.triangles[tri_b]] @ matrix[:3, :3] + matrix[3, :3]
+            # most pairs of a leaf pair are apart, their boxes reject them before the axis test
+            near = np.all((corners_a.min(axis=1) <= corners_b.max(axis=1)) & (corners_b.min(axis=1) <= corners_a.max(axis=1)), axis=1)
+            if triangles_intersect(corners_a[near], corners_b[near]).any():
+                return True
+            start = stop
+        return False
+
+    def bvh(self, mesh) -> TriangleBVH:
+        """the (cached) bvh of a loaded triangle mesh, None for other meshes"""
+        if not mesh.ready or int(mesh.mode) != TRIANGLES:
+            return None
+        cached = self.bvhs.get(mesh)
+        if cached is None or cached[0] is not mesh.bounds:
+            cached = self.bvhs[mesh] = (mesh.bounds, TriangleBVH(mesh.vertices[:, 0:3], mesh.indices, self.leaf_size))
+        return cached[1]
+
+    def forget(self, mesh):
+        """drop the bvh and the pairs of a removed mesh"""
+        self.bvhs.pop(mesh, None)
+        self.by_id.pop(mesh.id, None)
+        self.keys = self.keys[((self.keys >> 32) != mesh.id) & ((self.keys & 0xFFFFFFFF) != mesh.id)]
+
+    def _meshes_of(self, keys:np.ndarray, removed:bool=False) -> list[tuple]:
+        by_id = self.by_id
+        pairs = [(by_id.get(int(key >> 32)), by_id.get(int(key & 0xFFFFFFFF))) for key in keys]
+        # a stopped pair may involve a mesh that left the scene
+        return pairs if removed else [pair for pair in pairs if None not in pair]
@@ -0,0 +1,210 @@
+import numpy as np
+from gl import *
+from mesh import Mesh
+from bounds import Bounds, chunked_bounds
+from resources import tracker
+from render_queue import DrawPacket, PASS_MESH
+from OpenGL.constant import IntConstant
+
+
+class StagedDraw:
+    """Copies a DynamicMesh draw uploads, taken when the mesh is submitted: edited vertex rows (start, stop, rows),
+    (overlay, vertices) of the visible overlays that changed, and the enable flag and model matrix of the frame"""
+    __slots__ = ("enable", "model", "rows", "overlays", "sample")
+
+    def __init__(self, enable:bool, model:np.ndarray=None):
+        self.enable = enable
+        self.model = model
+        self.rows = []
+        self.overlays = []
+        self.sample = None # (a, b, t) frames of an AnimatedMesh
+
+
+class DynamicMesh(Mesh):
+    """Mesh whose vertices change every frame (simulation output, deformation, live scans).
+
+    Edit self.vertices (or the positions / colors views) in place and call mark_dirty with the rows touched,
+    it also keeps the bounds (box only) and the scene's boxes of the mesh up to date. submit stages copies of
+    the edited rows with the draw packet, the draw only uploads them.
+    The vertex buffer is a ring of segments (3 by default): each frame the next segment whose fence has
+    signaled receives the accumulated dirty ranges and is drawn with glDrawElementsBaseVertex, so the cpu
+    never writes memory the gpu is still reading. When the next segment is still busy the previous one is
+    drawn again and the changes wait a frame, nothing blocks.
+
+    With GL 4.4 buffer storage the ring is persistently mapped and written through a numpy view, otherwise
+    the segments are written with glBufferSubData"""
+    static = False
+
+    def __init__(self, vertices:np.ndarray, indices:np.ndarray, mode:IntConstant=GL_TRIANGLES, line:float=1, segments:int=3, persistent:bool=None):
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        super().__init__(vertices, indices, mode, line)
+        self.segments = segments
+        self.segment_bytes = self.vertices.nbytes
+        self.persistent = bool(glBufferStorage) if persistent is None else persistent
+
+        self.edits:list[tuple] = [] # (start, stop) rows edited since the last stage
+        self.dirty:list[list[tuple]] = [[] for _ in range(segments)] # staged (start, stop, rows) to write per segment
+        self.fences = [None] * segments
+        self.current = 0 # segment drawn last
+        self.skipped = 0 # frames the next segment was still in use
+        self.uploaded = 0 # bytes written in the last update
+
+        # replace the static vertex buffer with the ring
+        glDeleteBuffers(1, (self.vbo,))
+        tracker.release('buffer', self.vbo)
+        size = max(self.segment_bytes * segments, 1)
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if self.persistent:
+            flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+            glBufferStorage(GL_ARRAY_BUFFER, size, None, flags)
+            ptr = glMapBufferRange(GL_ARRAY_BUFFER, 0, size, flags)
+            address = ptr.value if isinstance(ptr, ctypes.c_void_p) else int(ptr)
+            # (segments, N, 6) view of the mapped ring
+            self.mapped = np.ctypeslib.as_array((ctypes.c_float * (size // 4)).from_address(address)).reshape(segments, -1, 6)
+            self.mapped[:] = self.vertices
+        else:
+            self.mapped = None
+            glBufferData(GL_ARRAY_BUFFER, size, np.tile(self.vertices, (segments, 1)), GL_DYNAMIC_DRAW)
+        tracker.track('buffer', self.vbo, size, owner=self, label='DynamicMesh ring')
+
+        glBindVertexArray(self.vao)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self.vertices[:, 0:3]
+
+    @property
+    def colors(self) -> np.ndarray:
+        return self.vertices[:, 3:6]
+
+    def mark_dirty(self, start:int=0, stop:int=None):
+        """vertex rows [start, stop) were edited, every segment picks them up before it is drawn again"""
+        stop = len(self.vertices) if stop is None else min(stop, len(self.vertices))
+        if stop <= start:
+            return None
+        self.edits.append((start, stop))
+        self.vertex_version += 1
+        # box only bounds: tight when every row changed, otherwise grown by the edited rows
+        low, high = chunked_bounds(self.vertices[start:stop, 0:3], 1 << 20)
+        if stop - start < len(self.vertices):
+            low, high = np.minimum(low, self.bounds.min), np.maximum(high, self.bounds.max)
+        self.bounds = Bounds.from_aabb(low, high)
+        if self.node is not None:
+            self.node.graph.refresh_bounds(self)
+        # overlays keep their own copies of the positions
+        for overlay in (self.highlight, self.wireframe, self.wireframe.points):
+            overlay.vertices[start:stop, 0:3] = self.vertices[start:stop, 0:3]
+            overlay.stale = True
+
+    def change_color(self, r, g, b):
+        self.vertices[:, 3:6] = (r, g, b)
+        self.mark_dirty()
+
+    def stage(self, model:np.ndarray=None) -> StagedDraw:
+        """copy what the next draw uploads: the rows edited since the last call and the vertices of the visible
+        overlays that changed. model is the matrix the draw is submitted with"""
+        staged = StagedDraw(self.enable, model)
+        staged.rows = [(start, stop, self.vertices[start:stop].copy()) for start, stop in _merge(self.edits)]
+        self.edits = []
+        for overlay, visible in ((self.highlight, self.highlight.enable), (self.wireframe, self.wireframe.enable),
+                                 (self.wireframe.points, self.wireframe.enable)):
+            if visible and getattr(overlay, "stale", False):
+                staged.overlays.append((overlay, overlay.vertices.copy()))
+                overlay.stale = False
+        return staged
+
+    def update(self, rows:list=()) -> int:
+        """queue staged rows for every segment, move to the next free segment and write what it misses,
+        returns the segment to draw"""
+        self.uploaded = 0
+        for pending in self.dirty:
+            pending.extend(rows)
+        following = (self.current + 1) % self.segments
+        if not self.dirty[following]:
+            return self.current # nothing changed, keep drawing the same data
+
+        fence = self.fences[following]
+        if fence is not None:
+            status = glClientWaitSync(fence, 0, 0)
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                self.skipped += 1
+                return self.current
+            glDeleteSync(fence)
+            self.fences[following] = None
+
+        # in staging order, later copies of a row overwrite earlier ones
+        for start, stop, data in self.dirty[following]:
+            if self.persistent:
+                self.mapped[following, start:stop] = data
+            else:
+                glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+                glBufferSubData(GL_ARRAY_BUFFER, following * self.segment_bytes + start * 24, data.nbytes, data)
+                glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.uploaded += data.nbytes
+        self.dirty[following] = []
+        self.current = following
+        return self.current
+
+    def submit(self, queue, program, location, model, condition=None):
+        # the edits are staged with the packet and its draw only uploads them, the vertices can be edited again
+        # while it is drawn (see frame_pipeline). The packet is queued while disabled too so the ring keeps
+        # advancing and the overlays are refreshed before their passes
+        if self.ready:
+            staged = self.stage(model)
+            queue.submit(DrawPacket(PASS_MESH, program, self.vao, self.mode, self.indices_count, location, model, self, line=self.line,
+                                    draw=lambda: self.draw(staged), condition=condition))
+        self.submit_overlays(queue, program, location, model)
+
+    def draw(self, staged:StagedDraw=None):
+        """write the staged edits to the ring and draw it, staged now when called directly"""
+        if not self.ready:
+            return None
+
+        staged = staged if staged is not None else self.stage()
+        segment = self.update(staged.rows)
+        if staged.enable:
+            glBindVertexArray(self.vao)
+            glDrawElementsBaseVertex(self.mode, self.indices_count, GL_UNSIGNED_INT, ctypes.c_void_p(0), segment * len(self.vertices))
+            # the segment is free again once the gpu is past this draw
+            if self.fences[segment] is not None:
+                glDeleteSync(self.fences[segment])
+            self.fences[segment] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        # the overlays are drawn in their own passes, see Mesh.submit_overlays
+        self._refresh(staged)
+
+    def destroy(self):
+        for fence in self.fences:
+            if fence is not None:
+                glDeleteSync(fence)
+        self.fences = [None] * self.segments
+        if self.persistent:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glUnmapBuffer(GL_ARRAY_BUFFER)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.mapped = None
+        super().destroy()
+
+    def _refresh(self, staged:StagedDraw):
+        """re-upload the staged positions of visible overlays after edits, overlays are drawn rarely so a full copy is fine"""
+        for overlay, vertices in staged.overlays:
+            glBindBuffer(GL_ARRAY_BUFFER, overlay.vbo)
+            glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+
+def _merge(ranges:list[tuple]) -> list[tuple]:
+    """sort and coalesce overlapping or touching (start, stop) ranges"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
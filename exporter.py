@@ -0,0 +1,126 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+# writes meshes with their transforms baked in, GL free.
+#
+# a part is (name, vertices (N, 6) position+color, indices, world (4, 4)), world matrices use the row vector
+# convention of the scene graph. The positions of a part are baked in one matrix product, then written as
+# OBJ text formatted in large chunks (one % format and one write per chunk, not per line) or as binary little
+# endian PLY, which loader.load_ply reads back. Files are exported in parallel by a process pool
+
+FORMATS = ('obj', 'ply')
+PLY_VERTEX = np.dtype([('x', '<f4'), ('y', '<f4'), ('z', '<f4'), ('red', 'u1'), ('green', 'u1'), ('blue', 'u1')])
+PLY_FACE = np.dtype([('count', 'u1'), ('indices', '<i4', 3)]) # packed, 13 bytes per triangle
+
+
+class ExportResult:
+    """One written file: counts, size and the seconds spent baking and writing it"""
+
+    def __init__(self, path:str, vertices:int, triangles:int, nbytes:int, seconds:float):
+        self.path = path
+        self.vertices = vertices
+        self.triangles = triangles
+        self.nbytes = nbytes
+        self.seconds = seconds
+
+    def throughput(self) -> float:
+        """MB written per second"""
+        return self.nbytes / 1e6 / self.seconds if self.seconds > 0 else float('inf')
+
+    def __repr__(self) -> str:
+        return f'{self.path}: {self.vertices} vertices, {self.triangles} triangles, {self.nbytes / 1e6:.1f} MB in {self.seconds:.3f} s ({self.throughput():.1f} MB/s)'
+
+
+def bake(vertices:np.ndarray, world:np.ndarray) -> np.ndarray:
+    """(N, 6) float32 copy of vertices with the positions moved to world space"""
+    world = np.asarray(world, dtype=np.float64)
+    baked = np.array(vertices[:, 0:6], dtype=np.float32)
+    baked[:, 0:3] = vertices[:, 0:3] @ world[:3, :3] + world[3, :3]
+    return baked
+
+
+def export_format(path:str) -> str:
+    kind = os.path.splitext(path)[1].lower().lstrip('.')
+    if kind not in FORMATS:
+        raise ValueError(f"{path}: can only export {', '.join(FORMATS)} files")
+    return kind
+
+
+def export(path:str, parts:list[tuple]) -> ExportResult:
+    """bake and write parts to one file, the format follows the extension"""
+    start = time.perf_counter()
+    kind = export_format(path)
+    baked = [(name, bake(vertices, world), np.asarray(indices, dtype=np.uint32).reshape(-1, 3)) for name, vertices, indices, world in parts]
+    nbytes = write_obj(path, baked) if kind == 'obj' else write_ply(path, baked)
+    vertices = sum(len(part[1]) for part in baked)
+    triangles = sum(len(part[2]) for part in baked)
+    return ExportResult(path, vertices, triangles, nbytes, time.perf_counter() - start)
+
+
+def export_parallel(jobs:list[tuple], workers:int=None) -> tuple[list[ExportResult], float]:
+    """export (path, parts) jobs, one file per job spread over a process pool. returns the results in job order
+    and the wall clock seconds"""
+    start = time.perf_counter()
+    workers = workers if workers is not None else os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        results = [export(path, parts) for path, parts in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            results = list(pool.map(export, *zip(*jobs)))
+    return results, time.perf_counter() - start
+
+
+def report(results:list[ExportResult], seconds:float) -> str:
+    nbytes = sum(result.nbytes for result in results)
+    vertices = sum(result.vertices for result in results)
+    rate = nbytes / 1e6 / seconds if seconds > 0 else float('inf')
+    return f'Exported {len(results)} files, {vertices} vertices, {nbytes / 1e6:.1f} MB in {seconds:.3f} s ({rate:.1f} MB/s)'
+
+
+def write_obj(path:str, parts:list[tuple], precision:int=7, chunk:int=1 << 16) -> int:
+    """OBJ text, an object per part, vertex colors follow the positions on the v lines (read back by the
+    loader). returns bytes written"""
+    vertex_line = f'v %.{precision}g %.{precision}g %.{precision}g %.4g %.4g %.4g\n'
+    offset = 1 # OBJ indices are 1 based and count the vertices of every object before
+    with open(path, 'w', newline='\n', buffering=1 << 20) as f:
+        written = f.write('# exported by meshy\n')
+        for name, vertices, triangles in parts:
+            written += f.write(f'o {name}\n')
+            for start in range(0, len(vertices), chunk):
+                rows = vertices[start:start + chunk]
+                written += f.write(vertex_line * len(rows) % tuple(rows.ravel().tolist()))
+            for start in range(0, len(triangles), chunk):
+                rows = triangles[start:start + chunk].astype(np.int64) + offset
+                written += f.write('f %d %d %d\n' * len(rows) % tuple(rows.ravel().tolist()))
+            offset += len(vertices)
+    # text mode counts characters, the output is ascii so they are bytes
+    return written
+
+
+def write_ply(path:str, parts:list[tuple]) -> int:
+    """binary little endian PLY of all parts merged, colors as uchar. returns bytes written"""
+    vertex_count = sum(len(part[1]) for part in parts)
+    triangle_count = sum(len(part[2]) for part in parts)
+    header = ('ply\nformat binary_little_endian 1.0\ncomment exported by meshy\n'
+              f'element vertex {vertex_count}\nproperty float x\nproperty float y\nproperty float z\n'
+              'property uchar red\nproperty uchar green\nproperty uchar blue\n'
+              f'element face {triangle_count}\nproperty list uchar int vertex_indices\nend_header\n').encode('ascii')
+
+    with open(path, 'wb') as f:
+        f.write(header)
+        for name, vertices, triangles in parts:
+            records = np.empty(len(vertices), dtype=PLY_VERTEX)
+            records['x'], records['y'], records['z'] = vertices[:, 0], vertices[:, 1], vertices[:, 2]
+            colors = np.rint(np.clip(vertices[:, 3:6], 0, 1) * 255).astype(np.uint8)
+            records['red'], records['green'], records['blue'] = colors[:, 0], colors[:, 1], colors[:, 2]
+            records.tofile(f)
+        offset = 0
+        for name, vertices, triangles in parts:
+            faces = np.empty(len(triangles), dtype=PLY_FACE)
+            faces['count'] = 3
+            faces['indices'] = triangles.astype(np.int64) + offset
+            faces.tofile(f)
+            offset += len(vertices)
+    return len(header) + vertex_count * PLY_VERTEX.itemsize + triangle_count * PLY_FACE.itemsize
@@ -0,0 +1,145 @@
+import time
+import threading
+import numpy as np
+
+# two stage frame loop: a worker thread prepares the cpu side of frame N+1 (picking, animation, world matrices,
+# culling, sorted draw packets) while the context thread issues the GL calls of frame N. The stages hand two
+# FramePackets back and forth, GL is never called from the worker.
+#
+# the application state (transforms, camera, meshes) belongs to the worker between kick() and wait() and to
+# the caller otherwise, so event handlers and loading run after wait() and before the next kick(). The drawn
+# frame lags the handled input by one frame. Draws that upload (see dynamic.StagedDraw) take copies staged in
+# the packet, never the mesh arrays the worker edits. The threads only overlap where one of them releases the GIL:
+# numpy kernels on the worker, GL calls, buffer swaps and the frame rate limit on the context thread
+
+
+class FramePacket:
+    """Cpu results of one frame. Mesh.submit queues into a packet like into a RenderQueue, the model matrices of
+    the draw packets point into world, the packet's own copy of the scene's world matrices"""
+
+    def __init__(self):
+        self.frame = -1
+        self.view = None
+        self.projection = None
+        self.world = np.zeros((0, 4, 4), dtype=np.float32)
+        self.packets:list = [] # DrawPackets in RenderQueue key order
+        self.culled = 0 # meshes outside the frustum
+        self.prepare_start = self.prepare_end = 0.0 # perf_counter() on the worker
+
+    def begin(self, world:np.ndarray):
+        """reset for a new frame and take a copy of the world matrices, the buffer is reused while the size fits"""
+        self.packets = []
+        self.culled = 0
+        if self.world.shape != world.shape:
+            self.world = np.empty_like(world)
+        np.copyto(self.world, world)
+
+    def submit(self, packet):
+        self.packets.append(packet)
+
+
+class FramePipeline:
+    """Runs prepare(packet) on a worker thread, double buffered.
+
+    kick() starts preparing the next packet, wait() blocks until it is done and returns it. The caller draws
+    the returned packet between begin_draw() and end_draw() after kicking the following one, the overlap of
+    that draw with the next prepare is measured in stats (last frame, ms) and totals (sums, ms)"""
+
+    def __init__(self, prepare, name:str="frame-prepare"):
+        self.prepare = prepare
+        self.packets = (FramePacket(), FramePacket())
+        self.index = 0 # packet the worker writes next
+        self.frames = 0
+        self.busy = False
+        self.error = None
+        self.running = True
+        self.draw_start = self.draw_end = None # interval of the last draw
+        self.stats = {}
+        self.totals = dict(frames=0, prepare_ms=0.0, draw_ms=0.0, overlap_ms=0.0, wait_ms=0.0)
+
+        self.requested = threading.Event()
+        self.ready = threading.Event()
+        self.worker = threading.Thread(target=self._run, name=name, daemon=True)
+        self.worker.start()
+
+    def kick(self):
+        """prepare the next packet, the worker owns the application state until wait()"""
+        if self.busy:
+            raise RuntimeError("the previous frame is still being prepared, wait() for it first")
+        self.packets[self.index].frame = self.frames
+        self.frames += 1
+        self.busy = True
+        self.ready.clear()
+        self.requested.set()
+
+    def wait(self) -> FramePacket:
+        """block until the kicked packet is prepared and return it"""
+        if not self.busy:
+            raise RuntimeError("no frame is being prepared, kick() first")
+        start = time.perf_counter()
+        self.ready.wait()
+        waited = time.perf_counter() - start
+        self.busy = False
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+        packet = self.packets[self.index]
+        self.index ^= 1
+        self._measure(packet, waited)
+        return packet
+
+    def begin_draw(self):
+        self.draw_start = time.perf_counter()
+
+    def end_draw(self):
+        self.draw_end = time.perf_counter()
+
+    def overlap_ratio(self) -> float:
+        """part of the prepare time hidden behind drawing, over all frames"""
+        return self.totals["overlap_ms"] / self.totals["prepare_ms"] if self.totals["prepare_ms"] > 0 else 0.0
+
+    def report(self) -> str:
+        totals = self.totals
+        frames = max(totals["frames"], 1)
+        return (f'{totals["frames"]} frames, per frame: prepare {totals["prepare_ms"] / frames:.3f} ms, draw {totals["draw_ms"] / frames:.3f} ms, '
+                f'overlapped {totals["overlap_ms"] / frames:.3f} ms ({self.overlap_ratio():.0%} of prepare), waited {totals["wait_ms"] / frames:.3f} ms')
+
+    def stop(self):
+        """finish the frame in flight and end the worker"""
+        if self.busy:
+            self.ready.wait()
+            self.busy = False
+        self.running = False
+        self.requested.set()
+        self.worker.join()
+
+    def _run(self):
+        while True:
+            self.requested.wait()
+            self.requested.clear()
+            if not self.running:
+                return None
+            packet = self.packets[self.index]
+            packet.prepare_start = time.perf_counter()
+            try:
+                self.prepare(packet)
+            except Exception as error:
+                # raised on the context thread by wait()
+                self.error = error
+            packet.prepare_end = time.perf_counter()
+            self.ready.set()
+
+    def _measure(self, packet:FramePacket, waited:float):
+        """timings of the packet's prepare against the draw issued while it ran"""
+        prepare = packet.prepare_end - packet.prepare_start
+        draw = overlap = 0.0
+        if self.draw_start is not None and self.draw_end is not None:
+            draw = self.draw_end - self.draw_start
+            overlap = max(0.0, min(packet.prepare_end, self.draw_end) - max(packet.prepare_start, self.draw_start))
+        self.draw_start = self.draw_end = None
+
+        self.stats = dict(frame=packet.frame, prepare_ms=prepare * 1000, draw_ms=draw * 1000, overlap_ms=overlap * 1000, wait_ms=waited * 1000)
+        for key in ("prepare_ms", "draw_ms", "overlap_ms", "wait_ms"):
+            self.totals[key] += self.stats[key]
+        self.totals["frames"] += 1
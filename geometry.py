@@ -0,0 +1,71 @@
+import numpy as np
+
+# procedural mesh data, kept free of pygame and OpenGL
+
+
+def uv_sphere_vertices(radius:float, stacks:int, slices:int) -> list[tuple]:
+    vertices = []
+
+    # 360 degrees is 2pi radians
+    # Angle steps between slices (longitude) and stacks (latitude)
+    d_slice = np.pi / stacks  # Phi: 0 to PI (Top to Bottom)
+    d_stack = 2 * np.pi / slices  # Theta: 0 to 2*PI (Around the sphere)
+
+    # Iterate over stacks (latitude lines)
+    for i in range(stacks + 1):
+        # i = 0 (top pole), i = stacks (bottom pole)
+        phi = i * d_slice
+        y = radius * np.cos(phi)
+
+        # Iterate over slices (longitude lines)
+        for j in range(slices + 1):
+            theta = j * d_stack
+
+            # Calculate vertex position (x, z) on the latitude circle
+            x = radius * np.sin(phi) * np.cos(theta)
+            z = radius * np.sin(phi) * np.sin(theta)
+
+            # Use position as color for visualization (optional)
+            r, g, b = x / radius, y / radius, z / radius
+
+            vertices.append((x, y, z ,r, g, b)) # Use white color for simplicity
+
+    return vertices
+
+
+def uv_sphere(radius:float=0.5, stacks:int=40, slices:int=40) -> tuple[np.ndarray, np.ndarray]:
+    """Generates UV Sphere vertices and indices (indices for EBO)."""
+    vertices = uv_sphere_vertices(radius, stacks, slices)
+    indices = []
+
+    # --- Generate Indices ---
+    # Vertices are arranged: (s0, l0), (s0, l1), ..., (s1, l0), (s1, l1), ...
+    # where s is stack index and l is slice index
+
+    # Iterate over quads formed by (stack i, slice j) and (stack i+1, slice j+1)
+    for i in range(stacks):
+        for j in range(slices):
+            # Calculate the 4 vertex indices that form the quad:
+            # v1 --- v2
+            # |      |
+            # v3 --- v4
+
+            # Vertex index for current stack (i) and current slice (j)
+            v1 = i * (slices + 1) + j
+            # Vertex index for next stack (i) and next slice (j+1)
+            v2 = v1 + 1
+            # Vertex index for next stack (i+1) and current slice (j)
+            v3 = (i + 1) * (slices + 1) + j
+            # Vertex index for next stack (i+1) and next slice (j+1)
+            v4 = v3 + 1
+
+            # The quad is split into two triangles: (v1, v3, v4) and (v1, v4, v2)
+            # Ensure correct winding order (e.g., counter-clockwise) for front-facing
+
+            # Triangle 1 (Bottom-Left)
+            indices.extend([v1, v3, v4])
+
+            # Triangle 2 (Top-Right)
+            indices.extend([v1, v4, v2])
+
+    return np.array(vertices, dtype=np.float32), np.array(indices, dtype=np.uint32)
@@ -0,0 +1,11 @@
+import os
+import OpenGL
+
+# import OpenGL through this module so the production flags are set before PyOpenGL builds its wrappers
+# MESHY_PRODUCTION=1 turns off the glGetError check and logging PyOpenGL adds to every call
+PRODUCTION = os.environ.get("MESHY_PRODUCTION", "0") == "1"
+if PRODUCTION:
+    OpenGL.ERROR_CHECKING = False
+    OpenGL.ERROR_LOGGING = False
+
+from OpenGL.GL import *
@@ -0,0 +1,173 @@
+import numpy as np
+from gl import *
+from resources import tracker
+from selection import frustum_planes
+from render_queue import DrawPacket, PASS_MESH
+
+# GL_DRAW_ELEMENTS_INDIRECT command: count, instanceCount, firstIndex, baseVertex, baseInstance
+DRAW_COMMAND = np.dtype([('count', '<u4'), ('instance_count', '<u4'), ('first_index', '<u4'), ('base_vertex', '<i4'), ('base_instance', '<u4')])
+GROUP_SIZE = 64 # local_size_x of shaders/cull_compute.txt
+
+# shader storage binding points, see the shaders
+MODELS_BINDING = 0
+BOUNDS_BINDING = 1
+COMMANDS_BINDING = 2
+ENABLED_BINDING = 3
+
+
+class GpuCuller:
+    """Draws the static triangle meshes of the scene without per mesh cpu work (GL 4.3).
+
+    The batched meshes are merged into one vertex and one index buffer with one indirect draw command each. The
+    world matrices and world boxes of the scene live in shader storage buffers and are re-uploaded in one call
+    when the scene changed. Every frame a compute shader tests the boxes against the frustum and writes the
+    instance count (0 or 1) of each command, then a single glMultiDrawElementsIndirect draws the visible ones.
+    The vertex shader finds its model matrix through an instanced attribute holding the scene row, selected by
+    the command's baseInstance (gl_BaseInstance would need GL 4.6).
+
+    The batch is rebuilt when the scene structure changes. Meshes that are loading, dynamic or not triangles
+    stay in `others` and are drawn the usual way; overlays of batched meshes are queued per mesh"""
+
+    def __init__(self, programs):
+        version = (glGetIntegerv(GL_MAJOR_VERSION), glGetIntegerv(GL_MINOR_VERSION))
+        if version < (4, 3):
+            raise RuntimeError(f"gpu culling needs OpenGL 4.3 (compute shaders, indirect multi draw), the context is {version[0]}.{version[1]}")
+
+        self.compute = programs.load_compute("shaders/cull_compute.txt")
+        self.program = programs.load("shaders/batch_vertex.txt", "shaders/fragment.txt")
+        self.draw_count_location = programs.uniform_location(self.compute, "drawCount")
+        self.planes_location = programs.uniform_location(self.compute, "planes")
+
+        self.members:list = [] # batched meshes, command order
+        self.others:list = [] # meshes drawn through the render queue
+        self.decorated:list = [] # batched meshes with an overlay enabled this frame
+        self.nodes = None # scene node list the batch was built for
+        self.version = -1 # scene version in the storage buffers
+        self.enabled = np.zeros(0, dtype=np.uint32)
+        self.capacity = {} # buffer -> allocated bytes
+
+        self.vao = glGenVertexArrays(1)
+        tracker.track('vao', self.vao, owner=self)
+        names = ('vertex_buffer', 'index_buffer', 'row_buffer', 'models', 'bounds', 'commands', 'enabled_buffer')
+        for name in names:
+            buffer = glGenBuffers(1)
+            setattr(self, name, buffer)
+            tracker.track('buffer', buffer, 0, owner=self, label=f'gpu culling {name}')
+
+    def update(self, scene, meshes:list, view:np.ndarray, projection:np.ndarray):
+        """sync the batch with the scene and cull it for the current camera, after scene.update()"""
+        if self.nodes is not scene.nodes:
+            self._build(scene, meshes)
+        if scene.version != self.version:
+            self._upload_scene(scene)
+            self.version = scene.version
+
+        # mesh.enable and the overlay flags are plain attributes, read them once per frame
+        enabled = np.fromiter((mesh.enable for mesh in self.members), dtype=np.uint32, count=len(self.members))
+        if not np.array_equal(enabled, self.enabled):
+            self._upload(GL_SHADER_STORAGE_BUFFER, self.enabled_buffer, enabled)
+            self.enabled = enabled
+        self.decorated = [mesh for mesh in self.members if mesh.highlight.enable or mesh.wireframe.enable]
+
+        if not self.members:
+            return None
+        planes = frustum_planes(view @ projection, np.array([-1, -1, 1, 1])).astype(np.float32)
+        glUseProgram(self.compute)
+        glUniform1ui(self.draw_count_location, len(self.members))
+        glUniform4fv(self.planes_location, 6, planes)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, BOUNDS_BINDING, self.bounds)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, COMMANDS_BINDING, self.commands)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, ENABLED_BINDING, self.enabled_buffer)
+        glDispatchCompute(-(-len(self.members) // GROUP_SIZE), 1, 1)
+
+    def submit(self, queue):
+        """queue the indirect draw of the batch, drawn with the other meshes"""
+        if self.members:
+            queue.submit(DrawPacket(PASS_MESH, self.program, self.vao, GL_TRIANGLES, 0, -1, None, self, draw=self.draw))
+
+    def draw(self):
+        glUseProgram(self.program)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, MODELS_BINDING, self.models)
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, self.commands)
+        # the instance counts written by the compute shader are read as draw commands
+        glMemoryBarrier(GL_COMMAND_BARRIER_BIT)
+        glMultiDrawElementsIndirect(GL_TRIANGLES, GL_UNSIGNED_INT, ctypes.c_void_p(0), len(self.members), DRAW_COMMAND.itemsize)
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, 0)
+        glBindVertexArray(0)
+
+    def visible_count(self) -> int:
+        """draws that passed the last cull, reads the commands back (stalls, for debugging and tests)"""
+        if not self.members:
+            return 0
+        glMemoryBarrier(GL_BUFFER_UPDATE_BARRIER_BIT)
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, self.commands)
+        data = glGetBufferSubData(GL_DRAW_INDIRECT_BUFFER, 0, len(self.members) * DRAW_COMMAND.itemsize)
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, 0)
+        return int(np.frombuffer(data, dtype=DRAW_COMMAND)['instance_count'].sum())
+
+    def destroy(self):
+        glDeleteVertexArrays(1, (self.vao,))
+        tracker.release('vao', self.vao)
+        buffers = (self.vertex_buffer, self.index_buffer, self.row_buffer, self.models, self.bounds, self.commands, self.enabled_buffer)
+        glDeleteBuffers(len(buffers), buffers)
+        tracker.release('buffer', *buffers)
+
+    def _build(self, scene, meshes:list):
+        """merge the batchable meshes and write their draw commands"""
+        self.nodes = scene.nodes
+        self.version = -1
+        batchable = [mesh.static and mesh.ready and mesh.mode == GL_TRIANGLES for mesh in meshes]
+        self.members = [mesh for mesh, batch in zip(meshes, batchable) if batch]
+        self.others = [mesh for mesh, batch in zip(meshes, batchable) if not batch]
+        self.enabled = np.zeros(0, dtype=np.uint32)
+
+        vertex_counts = np.array([len(mesh.vertices) for mesh in self.members], dtype=np.int64)
+        index_counts = np.array([mesh.indices_count for mesh in self.members], dtype=np.int64)
+        commands = np.zeros(len(self.members), dtype=DRAW_COMMAND)
+        commands['count'] = index_counts
+        commands['first_index'] = np.cumsum(index_counts) - index_counts
+        commands['base_vertex'] = np.cumsum(vertex_counts) - vertex_counts
+        commands['base_instance'] = [mesh.node.index for mesh in self.members]
+
+        vertices = np.concatenate([mesh.vertices for mesh in self.members]) if self.members else np.zeros((0, 6), dtype=np.float32)
+        indices = np.concatenate([mesh.indices[:mesh.indices_count] for mesh in self.members]) if self.members else np.zeros(0, dtype=np.uint32)
+        self._upload(GL_ARRAY_BUFFER, self.vertex_buffer, np.ascontiguousarray(vertices, dtype=np.float32))
+        self._upload(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer, np.ascontiguousarray(indices, dtype=np.uint32))
+        self._upload(GL_DRAW_INDIRECT_BUFFER, self.commands, commands)
+        self._upload(GL_ARRAY_BUFFER, self.row_buffer, np.arange(len(scene.nodes), dtype=np.uint32))
+
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
+        # one row per instance, the first instance of a draw is its baseInstance
+        glBindBuffer(GL_ARRAY_BUFFER, self.row_buffer)
+        glEnableVertexAttribArray(2)
+        glVertexAttribIPointer(2, 1, GL_UNSIGNED_INT, 4, ctypes.c_void_p(0))
+        glVertexAttribDivisor(2, 1)
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _upload_scene(self, scene):
+        """world matrices and world boxes of every scene row"""
+        self._upload(GL_SHADER_STORAGE_BUFFER, self.models, np.ascontiguousarray(scene.world, dtype=np.float32))
+        bounds = np.ones((len(scene.nodes), 2, 4), dtype=np.float32)
+        bounds[:, 0, 0:3] = scene.world_min
+        bounds[:, 1, 0:3] = scene.world_max
+        self._upload(GL_SHADER_STORAGE_BUFFER, self.bounds, bounds)
+
+    def _upload(self, target, buffer, data:np.ndarray):
+        """replace the contents of a buffer, the storage is re-specified only when it has to grow"""
+        size = max(data.nbytes, 4)
+        glBindBuffer(target, buffer)
+        if self.capacity.get(buffer, 0) < size:
+            glBufferData(target, size, None, GL_DYNAMIC_DRAW)
+            self.capacity[buffer] = size
+            tracker.resize('buffer', buffer, size)
+        if data.nbytes:
+            glBufferSubData(target, 0, data.nbytes, data)
+        glBindBuffer(target, 0)
@@ -1,6 +1,8 @@
 import numpy as np
-from OpenGL.GL import *
+from gl import *
 from vector import Transform
+from resources import tracker
+from render_queue import DrawPacket
 from OpenGL.constant import IntConstant
 
 
@@ -8,13 +10,19 @@ from OpenGL.constant import IntConstant
 class Mesh:
     """ Base class for Creating Object Meshes using Index Buffer Object(EBO) """
 
-    def __init__(self, vertices:np.ndarray, indices:np.ndarray, mode:IntConstant=GL_TRIANGLES, line:float=1):
+    def __init__(self, vertices:np.ndarray, indices:np.ndarray, mode:IntConstant=GL_TRIANGLES, line:float=1, upload:bool=True):
         self.transform:Transform = Transform()
         self.vertices = vertices
         self.indices = indices
         self.indices_count = len(self.indices)
         self.mode = mode
+        self.line = line
+        self.point = 1
         self.enable = True
+        # upload=False only allocates gpu storage, the data is streamed later (see assets.AssetLoader)
+        self.ready = upload
+        self.uploads = []
+        self.parent = None # mesh the overlay belongs to
 
         # create Vertex Attribute Object (VAO)
         self.vao = glGenVertexArrays(1)
@@ -23,12 +31,17 @@ class Mesh:
         # create Vertex Buffer Object (VBO)
         self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices if upload else None, GL_STATIC_DRAW)
 
         # create Element Buffer Object (EBO)
         self.ebo = glGenBuffers(1)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices if upload else None, GL_STATIC_DRAW)
+        if not upload:
+            self.uploads = [(self.vbo, self.vertices), (self.ebo, self.indices)]
+        tracker.track('vao', self.vao, owner=self)
+        tracker.track('buffer', self.vbo, self.vertices.nbytes, owner=self)
+        tracker.track('buffer', self.ebo, self.indices.nbytes, owner=self)
 
         #specify the layout of the vertex data for the shader
         glEnableVertexAttribArray(0)
@@ -48,94 +61,136 @@ class Mesh:
         rgb[:,0] = r
         rgb[:,1] = g
         rgb[:,2] = b
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        # not uploaded yet, the pending upload reads the recolored array
+        if self.ready:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
 
 
     def draw(self):
         """ Draw Mesh using glDrawElements """
-        if self.enable:
+        if self.enable and self.ready:
             glBindVertexArray(self.vao)
             # Draw primitive/triangles using indices specified in the EBO
             glDrawElements(self.mode, self.indices_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
 
 
+    def packet(self, pass_:int, program, location, model, owner) -> DrawPacket:
+        """draw packet for the render queue, drawn with the model matrix of owner"""
+        return DrawPacket(pass_, program, self.vao, self.mode, self.indices_count, location, model, owner, line=self.line, point=self.point)
+
     def destroy(self):
         glDeleteVertexArrays(1, (self.vao,))
         glDeleteBuffers(1, (self.vbo,))
         glDeleteBuffers(1, (self.ebo,))
+        tracker.release('vao', self.vao)
+        tracker.release('buffer', self.vbo, self.ebo)
     
 # draw points only with gl draw points and drawline for outline
 # experiment with glPolygonMode() to draw points and lines
 
 
+def prepare_overlays(vertices, indices) -> dict:
+    """GL free arrays of the highlight, wireframe and points overlays of a mesh, background loaders build them on
+    their worker and pass them to Mesh(overlays=) so only buffer creation is left for the GL thread"""
+    return dict(highlight=Highlight.prepare(vertices, indices), wireframe=WireFrame.prepare(vertices, indices),
+                points=Points.prepare(vertices, indices))
+
+
+def _recolored(vertices, color) -> np.ndarray:
+    # overlays own a copy of the vertices in their color
+    vertices = np.array(vertices, dtype=np.float32)
+    vertices[:, 3:6] = color
+    return vertices
+
+
 class Points(Mesh):
-    def __init__(self, vertices, indices):
+    color = (1, 1, 1)
+
+    def __init__(self, vertices, indices, upload:bool=True, prepared:tuple=None):
         mode = GL_POINTS
-        self.vertices = np.array(vertices, dtype=np.float32)
-        self.indices = np.unique(indices) #find only the vertices that are drawn to screen
-        self.indices = np.array(self.indices, dtype=np.uint32)
-        super().__init__(self.vertices, self.indices, mode)
-        self.change_color(1, 1, 1)
-        glPointSize(5)
+        # prepared (vertices, indices) from Points.prepare, built off the GL thread
+        self.vertices, self.indices = prepared if prepared is not None else self.prepare(vertices, indices)
+        super().__init__(self.vertices, self.indices, mode, upload=upload)
+        self.point = 5
+        self.hovered = None # vertex drawn in the hover color
+
+    @classmethod
+    def prepare(cls, vertices, indices) -> tuple[np.ndarray, np.ndarray]:
+        #find only the vertices that are drawn to screen
+        return _recolored(vertices, cls.color), np.unique(indices).astype(np.uint32)
+
+    def draw(self):
+        # the render queue sets the point size itself, direct draws set it here
+        if self.enable and self.ready:
+            glPointSize(self.point)
+        super().draw()
+
+    def hover(self, index:int=None, color=(1, 0.647, 0)):
+        """recolor one vertex (None clears), only the touched vertices are re-uploaded"""
+        if index == self.hovered:
+            return None
+        previous, self.hovered = self.hovered, index
+        if not self.ready:
+            return None
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        if previous is not None:
+            glBufferSubData(GL_ARRAY_BUFFER, previous * 24, 24, self.vertices[previous])
+        if index is not None:
+            vertex = self.vertices[index].copy()
+            vertex[3:6] = color
+            glBufferSubData(GL_ARRAY_BUFFER, index * 24, 24, vertex)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
 
 class WireFrame(Mesh):
-    def __init__(self, vertices, indices):
+    color = (1, 0.647, 0)
+
+    def __init__(self, vertices, indices, upload:bool=True, prepared:tuple=None):
         mode = GL_LINES
-        self.vertices = np.array(vertices, dtype=np.float32)
-        self.indices = self._outline(indices)
-        self.indices = np.array(self.indices, dtype=np.uint32)
-        super().__init__(self.vertices, self.indices, mode)
-        self.change_color(1, 0.647, 0)
-
-
-    def _outline(self, indices):
-        # render traingles only
-        outline = []
-        for i in range(0, len(indices), 3):
-            # get every three indices that create a triangle 
-            triangle = indices[i:i+3]
-            # draw traingle as lines
-            lines = [triangle[0], 
-                     triangle[1],
-                     triangle[1],
-                     triangle[2],
-                     triangle[2],
-                     triangle[0]]
-            outline.extend(lines)
-
-        return outline
+        self.vertices, self.indices = prepared if prepared is not None else self.prepare(vertices, indices)
+        super().__init__(self.vertices, self.indices, mode, upload=upload)
+
+    @classmethod
+    def prepare(cls, vertices, indices) -> tuple[np.ndarray, np.ndarray]:
+        return _recolored(vertices, cls.color), cls._outline(indices).astype(np.uint32)
+
+    @staticmethod
+    def _outline(indices):
+        # render traingles only, every triangle becomes its three edges as lines
+        triangles = np.asarray(indices).reshape(-1, 3)
+        return triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1)
     
 class WireFrameAndPoints(WireFrame):
-    def __init__(self, vertices, indices):
-        super().__init__(vertices, indices)
-        self.points = Points(vertices, indices)
+    def __init__(self, vertices, indices, upload:bool=True, prepared:tuple=None, points:tuple=None):
+        super().__init__(vertices, indices, upload=upload, prepared=prepared)
+        self.points = Points(vertices, indices, upload=upload, prepared=points)
 
     def draw(self):
         super().draw()
         self.points.draw()
 
+    def destroy(self):
+        super().destroy()
+        self.points.destroy()
+
 
 class Highlight(Mesh):
-    def __init__(self, vertices, indices):
-        indices = self.__create_outline(indices)
+    color = (1, 0.647, 0)
+
+    def __init__(self, vertices, indices, upload:bool=True, prepared:tuple=None):
         mode = GL_LINES
-        self.vertices = np.array(vertices, dtype=np.float32)
-        self.indices = np.array(indices, dtype=np.uint32)
-        super().__init__(self.vertices, self.indices, mode)
-        self.change_color(1, 0.647, 0)
+        self.vertices, self.indices = prepared if prepared is not None else self.prepare(vertices, indices)
+        super().__init__(self.vertices, self.indices, mode, upload=upload)
         self.transform.scale.move(0.5, 0.5, 0.5)
-        
 
-    def __create_outline(self, indices):
-        outline = []
-        for i in range(0, len(indices), 3):
-            # get every three indices that create a quad for the object
-            triangle = indices[i:i+3]  # eg 0,1 2
-            # create a pair of perpendicular lines instead of the triangle
-            lines = triangle[0], triangle[1], triangle[1], triangle[2]
-            outline.extend(lines)
-            
-        return outline
+    @classmethod
+    def prepare(cls, vertices, indices) -> tuple[np.ndarray, np.ndarray]:
+        return _recolored(vertices, cls.color), cls._outline(indices).astype(np.uint32)
+
+    @staticmethod
+    def _outline(indices):
+        # create a pair of perpendicular lines instead of each triangle eg 0,1 1,2
+        triangles = np.asarray(indices).reshape(-1, 3)
+        return triangles[:, [0, 1, 1, 2]].reshape(-1)
   
@@ -1,4 +1,4 @@
-from OpenGL.GL import *
+from gl import *
 import numpy as np
 from vector import Transform, OrbitalTransfrom
 from mesh import Mesh
@@ -0,0 +1,346 @@
+import re
+import numpy as np
+
+# mesh file parsing, kept free of pygame and OpenGL so tools can read meshes without a window
+
+DEFAULT_COLOR = (0.8, 0.8, 0.8)
+
+
+def load_obj(filepath:str) -> tuple[np.ndarray, np.ndarray]:
+    """parse a text OBJ file, returns (vertices (N, 6) float32 position+color, indices uint32)"""
+    vertices = []
+    indices = []
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+        for line in lines:
+            line = line.split(' ')
+
+            if line[0] == 'v':
+                v = read_vertex_data(line)
+                v.extend(read_vertex_color(line))
+                vertices.append(v)
+
+            elif line[0] == 'f':
+                i = read_face_data(line)
+                indices.extend(i)
+
+            elif line[0] == 'o':
+                name = line[1]
+
+    print(f'Loaded /{filepath}: {len(vertices)} vertices, {len(indices)//6} faces')
+
+    vertices = np.array(vertices, dtype=np.float32).reshape(-1, 6)
+    indices = np.array(indices, dtype=np.uint32)
+    return vertices, indices
+
+
+def read_vertex_data(vertex_line:list[str]) -> list[float]:
+    return [float(vertex_line[1]),
+            float(vertex_line[2]),
+            float(vertex_line[3])]
+
+
+def read_vertex_color(vertex_line:list[str]) -> list[float]:
+    # optional r g b after x y z (see exporter.write_obj), a single extra value is w
+    values = [word for word in vertex_line[4:] if word.strip()]
+    if len(values) == 3:
+        return [float(value) for value in values]
+    return list(DEFAULT_COLOR)
+
+
+def read_face_data(face_line:list[str]) -> list[int]:
+    # draw each traingle in quad
+    # triangles in face 4 points/ 2 triangles
+    face_v_index = []
+    indices = []
+    for corner in face_line[1:]:
+        face_v_index.append(read_corner(corner))
+
+    # draw each traingle in quad/face
+    t1 = [face_v_index[0], #1st point
+            face_v_index[1],#2nd point
+            face_v_index[2]#3rd point
+            ]
+    indices.extend(t1)
+
+    if len(face_v_index) > 3:
+        # if its a quad draw second traingle
+        t2 = [face_v_index[2],#3st point
+                face_v_index[3],#4th point
+                face_v_index[0]#1st point
+                ]
+        indices.extend(t2)
+
+    return indices
+
+
+def read_corner(corner:str) -> int:
+    corner = corner.split('/')
+    v_index = int(corner[0]) - 1
+    return v_index
+    # implement later
+    # vt_index =
+    # vn_index =
+
+
+VERTEX_LINE = re.compile(rb'^v[ \t]+([^\r\n]*)', re.M)
+FACE_LINE = re.compile(rb'^f[ \t]+([^\r\n]*)', re.M)
+CORNER_SUFFIX = re.compile(rb'/[^\s]*') # texture/normal part of a face corner "v/vt/vn"
+
+
+def parse_obj_chunk(data:bytes, vertex_base:int=0, colors:bool=False) -> tuple[np.ndarray, np.ndarray]:
+    """parse the v and f lines of a block of whole OBJ lines without a python loop per line,
+    vertex_base is the number of vertices before this block (for negative indices).
+    returns (positions (n, 3) float32, triangles (m, 3) int64 zero based), with colors the positions are
+    (n, 6) vertices with the r g b of the v lines, DEFAULT_COLOR when the lines have none"""
+    vertex_lines = VERTEX_LINE.findall(data)
+    positions = np.zeros((0, 6 if colors else 3), dtype=np.float32)
+    if vertex_lines:
+        values = np.fromstring(b' '.join(vertex_lines), dtype=np.float32, sep=' ')
+        # v lines may carry w or r g b after x y z
+        values = values.reshape(len(vertex_lines), -1)
+        if colors:
+            positions = np.empty((len(values), 6), dtype=np.float32)
+            positions[:, 0:3] = values[:, 0:3]
+            positions[:, 3:6] = values[:, 3:6] if values.shape[1] == 6 else DEFAULT_COLOR
+        else:
+            positions = values[:, 0:3]
+
+    face_lines = FACE_LINE.findall(data)
+    if not face_lines:
+        return positions, np.zeros((0, 3), dtype=np.int64)
+
+    # corners of all faces in one array, faces separated by 0 (obj indices start at 1)
+    corners = np.fromstring(CORNER_SUFFIX.sub(b'', b' 0 '.join(face_lines)), dtype=np.int64, sep=' ')
+    separators = np.flatnonzero(corners == 0)
+    starts = np.concatenate(([0], separators + 1))
+    counts = np.diff(np.concatenate((starts, [len(corners) + 1]))) - 1
+
+    # relative (negative) indices count back from the last vertex read before the face's own line
+    if (corners < 0).any():
+        before = vertex_base + np.searchsorted(_line_starts(data, b'v'), _line_starts(data, b'f'))
+        # every face's corners plus its separator, the last face has none
+        before = np.repeat(before, counts + 1)[:len(corners)]
+        corners = np.where(corners < 0, corners + before, corners - 1)
+    else:
+        corners = corners - 1
+
+    # fan triangulate every face: (c0, ck, ck+1) for k in 1..n-2
+    fans = np.maximum(counts - 2, 0)
+    face = np.repeat(np.arange(len(starts)), fans)
+    k = np.arange(fans.sum()) - np.repeat(np.cumsum(fans) - fans, fans) + 1
+    first = starts[face]
+    triangles = np.stack((corners[first], corners[first + k], corners[first + k + 1]), axis=1)
+    return positions, triangles
+
+
+def _line_starts(data:bytes, keyword:bytes) -> np.ndarray:
+    """byte offsets of the lines starting with a one letter keyword and a space or tab, in order"""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    at = np.flatnonzero(raw[:-1] == ord(keyword))
+    at = at[(raw[at + 1] == ord(' ')) | (raw[at + 1] == ord('\t'))]
+    return at[(at == 0) | (raw[at - 1] == ord('\n'))]
+
+
+# binary formats are memory mapped and viewed with structured dtypes, the only copies made are the
+# interleaved (N, 6) vertices and the uint32 indices handed to Mesh
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+PLY_COLOR = ('red', 'green', 'blue')
+
+STL_TRIANGLE = np.dtype([('normal', '<f4', 3), ('corners', '<f4', (3, 3)), ('attribute', '<u2')])
+STL_VERTEX = re.compile(rb'^\s*vertex\s+([^\r\n]*)', re.M)
+
+
+def detect_format(filepath:str) -> str:
+    """'ply', 'stl' or 'obj', from the magic bytes, the size of binary STL and the extension as a last resort"""
+    with open(filepath, 'rb') as f:
+        head = f.read(84)
+        size = f.seek(0, 2)
+    if head[:4] == b'ply\n' or head[:4] == b'ply\r':
+        return 'ply'
+    # binary stl has no magic: an 80 byte header, the triangle count and 50 bytes per triangle
+    if len(head) == 84 and size == 84 + int.from_bytes(head[80:84], 'little') * STL_TRIANGLE.itemsize:
+        return 'stl'
+    # ascii stl starts with "solid" (a binary header may too, the size check above comes first)
+    if filepath.lower().endswith('.stl') or head[:5] == b'solid':
+        return 'stl'
+    return 'obj'
+
+
+def read_mesh(filepath:str) -> tuple[np.ndarray, np.ndarray]:
+    """parse an OBJ, PLY or STL file, returns (vertices (N, 6) float32 position+color, indices uint32)"""
+    kind = detect_format(filepath)
+    if kind == 'ply':
+        return load_ply(filepath)
+    if kind == 'stl':
+        return load_stl(filepath)
+    return load_obj(filepath)
+
+
+def load_ply(filepath:str) -> tuple[np.ndarray, np.ndarray]:
+    """binary little or big endian PLY, keeps red green blue vertex colors. Faces with a single vertex count
+    (triangles, quads) are read as one fixed size record array, mixed polygons walk the face list"""
+    raw = np.memmap(filepath, dtype=np.uint8, mode='r')
+    end = bytes(raw[:min(len(raw), 1 << 16)]).find(b'end_header')
+    if end < 0:
+        raise ValueError(f"{filepath} has no PLY header")
+    header = bytes(raw[:end]).decode('ascii').split('\n')
+    offset = end + len('end_header')
+    offset += 2 if bytes(raw[offset:offset + 2]) == b'\r\n' else 1
+
+    order, elements = None, []
+    for line in header:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == 'format':
+            if words[1] not in ('binary_little_endian', 'binary_big_endian'):
+                raise ValueError(f"{filepath}: only binary PLY is supported, not {words[1]}")
+            order = '<' if words[1] == 'binary_little_endian' else '>'
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property':
+            # ('name', type) or ('name', count type, index type) for lists
+            elements[-1][2].append((words[-1], *(PLY_TYPES[word] for word in words[1:-1] if word != 'list')))
+
+    vertices = faces = None
+    for name, count, properties in elements:
+        if any(len(prop) == 3 for prop in properties):
+            if name != 'face' or len(properties) != 1:
+                raise ValueError(f"{filepath}: list properties are only supported on faces")
+            faces, offset = _ply_faces(raw, offset, count, order, *properties[0][1:])
+            continue
+        dtype = np.dtype([(prop_name, order + kind) for prop_name, kind in properties])
+        records = np.frombuffer(raw, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+        if name == 'vertex':
+            vertices = records
+
+    if vertices is None:
+        raise ValueError(f"{filepath} has no vertex element")
+    out = np.empty((len(vertices), 6), dtype=np.float32)
+    for axis, prop_name in enumerate('xyz'):
+        out[:, axis] = vertices[prop_name]
+    names = vertices.dtype.names
+    if all(color in names for color in PLY_COLOR):
+        for axis, color in enumerate(PLY_COLOR, 3):
+            channel = vertices[color]
+            # integer colors are 0..255
+            out[:, axis] = channel / np.float32(255) if channel.dtype.kind in 'iu' else channel
+    else:
+        out[:, 3:6] = DEFAULT_COLOR
+
+    indices = np.zeros(0, dtype=np.uint32) if faces is None else faces
+    print(f'Loaded /{filepath}: {len(out)} vertices, {len(indices)//3} triangles')
+    return out, indices
+
+
+def _ply_faces(raw:np.ndarray, offset:int, count:int, order:str, count_type:str, index_type:str) -> tuple[np.ndarray, int]:
+    """triangulated indices of a PLY face list and the offset after it"""
+    if count == 0:
+        return np.zeros(0, dtype=np.uint32), offset
+
+    count_size, index_size = np.dtype(count_type).itemsize, np.dtype(index_type).itemsize
+    first = int(np.frombuffer(raw, dtype=order + count_type, count=1, offset=offset)[0])
+    record = np.dtype([('n', order + count_type), ('v', order + index_type, first)])
+    if first >= 3 and offset + count * record.itemsize <= len(raw):
+        faces = np.frombuffer(raw, dtype=record, count=count, offset=offset)
+        if np.all(faces['n'] == first):
+            corners = faces['v']
+            # fan triangulate: (c0, ck, ck+1)
+            k = np.arange(1, first - 1)
+            triangles = np.stack((np.repeat(corners[:, 0:1], len(k), axis=1), corners[:, k], corners[:, k + 1]), axis=2)
+            return triangles.reshape(-1).astype(np.uint32), offset + count * record.itemsize
+
+    # mixed polygon sizes, the record boundaries depend on every count before them
+    count_dtype, index_dtype = np.dtype(order + count_type), np.dtype(order + index_type)
+    starts, offset = _ply_record_starts(raw, offset, count, count_dtype, index_size)
+    counts = _gather(raw, starts, count_dtype).astype(np.int64)
+
+    # corner j of record i sits at starts[i] + count_size + j * index_size
+    heads = np.cumsum(counts) - counts # position of every record's first corner in the flat corner list
+    record = np.repeat(np.arange(count), counts)
+    corner = np.arange(len(record)) - heads[record]
+    corners = _gather(raw, starts[record] + count_size + corner * index_size, index_dtype)
+
+    # fan triangulate every polygon: (c0, ck, ck+1) for k in 1 .. n-2
+    fans = np.maximum(counts - 2, 0)
+    face = np.repeat(np.arange(count), fans)
+    k = np.arange(len(face)) - (np.cumsum(fans) - fans)[face] + 1
+    base = heads[face]
+    triangles = np.stack((corners[base], corners[base + k], corners[base + k + 1]), axis=1)
+    return triangles.reshape(-1).astype(np.uint32), offset
+
+
+def _ply_record_starts(raw:np.ndarray, offset:int, count:int, count_dtype:np.dtype, index_size:int, window:int=1 << 15) -> tuple[np.ndarray, int]:
+    """byte offsets of count list records and the offset after them. Lists of one polygon size are a single
+    arange, mixed ones are walked a window at a time with pointer doubling over the record after every byte.
+    Doubling costs log2(records) gathers per byte, small windows keep the tables in cache"""
+    size = count_dtype.itemsize
+    first = int(np.frombuffer(raw, dtype=count_dtype, count=1, offset=offset)[0])
+    stride = size + first * index_size
+    if first >= 0 and offset + count * stride <= len(raw):
+        starts = offset + np.arange(count, dtype=np.int64) * stride
+        if np.all(_gather(raw, starts, count_dtype) == first):
+            return starts, offset + count * stride
+
+    parts, found = [], 0
+    while found < count:
+        stop = min(offset + window, len(raw) - size + 1)
+        if stop <= offset:
+            raise ValueError("PLY face list runs past the end of the file")
+        width = stop - offset
+        # the count read at every byte of [offset, stop), one strided read per byte phase
+        n = np.empty(width, dtype=np.int64)
+        for phase in range(size):
+            n[phase::size] = np.frombuffer(raw, dtype=count_dtype, count=len(range(offset + phase, stop, size)), offset=offset + phase)
+        step = size + n * index_size
+
+        # jump[p] is the record after a record at p, width past the window (and for the sentinel itself).
+        # chain holds the records 0 .. 2^k - 1 hops from the window start and jump skips 2^k of them,
+        # every round appends the next 2^k records and squares jump
+        jump = np.append(np.minimum(np.arange(width) + np.maximum(step, 1), width), width)
+        chain = np.zeros(1, dtype=np.int64)
+        while chain[-1] < width and len(chain) < count - found:
+            chain = np.concatenate((chain, jump[chain]))
+            jump = jump[jump]
+        chain = chain[chain < width][:count - found]
+        if np.any(n[chain] < 0):
+            raise ValueError("PLY face list has a negative count")
+
+        parts.append(offset + chain)
+        found += len(chain)
+        offset += int(chain[-1] + step[chain[-1]])
+    return np.concatenate(parts), offset
+
+
+def _gather(raw:np.ndarray, positions:np.ndarray, dtype:np.dtype) -> np.ndarray:
+    """values of dtype stored at byte positions of raw"""
+    data = raw[positions[:, None] + np.arange(dtype.itemsize)]
+    return np.ascontiguousarray(data).view(dtype).reshape(-1)
+
+
+def load_stl(filepath:str, tolerance:float=1e-6) -> tuple[np.ndarray, np.ndarray]:
+    """binary or ascii STL, the separate corners of every triangle are welded into indexed vertices"""
+    from cleanup import WeldVertices
+
+    raw = np.memmap(filepath, dtype=np.uint8, mode='r')
+    count = int(np.frombuffer(raw, dtype='<u4', count=1, offset=80)[0]) if len(raw) >= 84 else -1
+    # an ascii file can start with "solid", the size tells the two apart
+    if len(raw) == 84 + count * STL_TRIANGLE.itemsize:
+        positions = np.frombuffer(raw, dtype=STL_TRIANGLE, count=count, offset=84)['corners'].reshape(-1, 3)
+    else:
+        positions = np.fromstring(b' '.join(STL_VERTEX.findall(bytes(raw))), dtype=np.float32, sep=' ').reshape(-1, 3)
+
+    corners = np.empty((len(positions), 6), dtype=np.float32)
+    corners[:, 0:3] = positions
+    corners[:, 3:6] = DEFAULT_COLOR
+    vertices, indices, _, _ = WeldVertices(tolerance).run(corners, np.arange(len(corners), dtype=np.uint32), 1 << 20)
+    print(f'Loaded /{filepath}: {len(vertices)} vertices, {len(indices)//3} triangles')
+    return vertices, indices
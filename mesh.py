@@ -1,15 +1,29 @@
+import os
 import pyrr
 import numpy as np
+from gl import *
 from ray import *
-from OpenGL.GL import *
+from loader import read_mesh
+from cleanup import CleanupPipeline
+from scene import SceneGraph, SceneNode
+from collision import CollisionWorld
+from registry import Registry
+from raycaster import RayCaster, RayCastImage
+from exporter import ExportResult, export, export_parallel, export_format
+from geometry import uv_sphere
+from bounds import Bounds
+from resources import tracker
+from render_queue import DrawPacket, PASS_MESH, PASS_HIGHLIGHT, PASS_WIREFRAME, PASS_POINTS
 from OpenGL.constant import IntConstant
-from vector import Transform, OrbitalTransfrom
+from vector import Transform, TransformStore, OrbitalTransfrom
 from hightlight import Highlight, Points, WireFrame, WireFrameAndPoints
 
 class Mesh:
     """ Base class for Creating Object Meshes using Index Buffer Object(EBO) """
+    static = True # vertices only change through change_color / update_bounds, see gpu_culling.GpuCuller
 
-    def __init__(self, vertices:np.ndarray, indices:np.ndarray, mode:IntConstant=GL_TRIANGLES, line:float=1):
+    def __init__(self, vertices:np.ndarray, indices:np.ndarray, mode:IntConstant=GL_TRIANGLES, line:float=1, upload:bool=True,
+                 bounds:Bounds=None, overlays:dict=None):
         self.transform:Transform = Transform()
         self.vertices = vertices
         self.indices = indices
@@ -17,21 +31,26 @@ class Mesh:
         self.mode = mode
         self.line = line
         self.enable = True
-        self.highlight = Highlight(self.vertices, self.indices)
-        self.wireframe = WireFrameAndPoints(self.vertices, self.indices)
-        self.highlight.enable = False
-        self.wireframe.enable = False
+        # upload=False only allocates gpu storage, the data is streamed later (see assets.AssetLoader)
+        self.ready = upload
+        self.uploads = []
+        # bumped whenever the vertex positions change, for caches keyed on them (see vertex_query.VertexQuery)
+        self.vertex_version = 0
+        # object space bounds, recomputed by update_bounds when the vertices change. bounds and overlays
+        # (hightlight.prepare_overlays) can be computed up front off the GL thread, see assets.AssetLoader
+        self.bounds = bounds if bounds is not None else Bounds(self.vertices[:, 0:3])
+        self.highlight:Highlight = None
+        self.wireframe:WireFrameAndPoints = None
+        self._create_overlays(upload, overlays)
 
 
         # will be initialized by Mesh Manager
+        self.node:SceneNode = None
         self.id = None
         self.hit = None, None
         self.renderer = None
         self.ray:Ray = None
 
-        #set line thickness if drawing lines
-        glLineWidth(self.line)
-        
         # create Vertex Attribute Object (VAO)
         self.vao = glGenVertexArrays(1)
         glBindVertexArray(self.vao)
@@ -39,12 +58,17 @@ class Mesh:
         # create Vertex Buffer Object (VBO)
         self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices if upload else None, GL_STATIC_DRAW)
 
         # create Element Buffer Object (EBO)
         self.ebo = glGenBuffers(1)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices if upload else None, GL_STATIC_DRAW)
+        if not upload:
+            self.uploads = [(self.vbo, self.vertices), (self.ebo, self.indices)]
+        tracker.track('vao', self.vao, owner=self)
+        tracker.track('buffer', self.vbo, self.vertices.nbytes, owner=self)
+        tracker.track('buffer', self.ebo, self.indices.nbytes, owner=self)
 
         #specify the layout of the vertex data for the shader
         glEnableVertexAttribArray(0)
@@ -58,41 +82,88 @@ class Mesh:
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
 
+    def _create_overlays(self, upload:bool=True, overlays:dict=None):
+        """(re)build the highlight and wireframe overlays from the current vertices and indices, replaced
+        overlays are destroyed and their enable flags carried over"""
+        previous = (self.highlight, self.wireframe)
+        overlays = overlays if overlays is not None else {}
+        self.highlight = Highlight(self.vertices, self.indices, upload=upload, prepared=overlays.get('highlight'))
+        self.wireframe = WireFrameAndPoints(self.vertices, self.indices, upload=upload,
+                                            prepared=overlays.get('wireframe'), points=overlays.get('points'))
+        self.highlight.parent = self.wireframe.parent = self.wireframe.points.parent = self
+        self.highlight.enable = previous[0].enable if previous[0] is not None else False
+        self.wireframe.enable = previous[1].enable if previous[1] is not None else False
+        for overlay in previous:
+            if overlay is not None:
+                overlay.destroy()
+
+    def pending_uploads(self) -> list:
+        """(buffer, data) pairs still to be copied to the gpu for this mesh and its overlays"""
+        meshes = (self, self.highlight, self.wireframe, self.wireframe.points)
+        return [upload for mesh in meshes for upload in mesh.uploads]
+
+    def set_ready(self):
+        """mark the mesh and its overlays as uploaded, they start drawing"""
+        for mesh in (self, self.highlight, self.wireframe, self.wireframe.points):
+            mesh.ready = True
+            mesh.uploads = []
+        # the gpu culling batch only takes ready meshes, it is rebuilt with the scene structure
+        if self.node is not None:
+            self.node.graph.structure_changed = True
+
     def draw_ray_to_mesh(self, mouse_x:float, mouse_y:float):
+        if not self.ready:
+            # hidden meshes can not be picked
+            self.hit = Hit(self.id, False, float('inf'))
+            return None
         ray_dir, ray_origin = self.ray.gen_ray(mouse_x, mouse_y)
         sphere_r, sphere_center = self.gen_bounding_sphere()
         self.hit = self.ray.ray_sphere_intersect(ray_origin, ray_dir, sphere_center, sphere_r)
         
    
     def gen_bounding_sphere(self) -> tuple[float, np.ndarray]:
-        """Generates a bounding sphere for object, returns (radius, sphere_center) """
-        # prepare sphere center and radius in world space
+        """Bounding sphere of the object in world space, returns (radius, sphere_center) """
+        sphere_C, sphere_r = self.bounds.world_sphere(self.create_model_matrix())
+        return sphere_r, sphere_C
 
-        # Calculate xmax, ymax, zmax for axis aligned bounding box sphere
-        max_xyz =  self.vertices[:, 0:3].max(axis=0)
-        xmax, ymax, zmax = max_xyz[0], max_xyz[1], max_xyz[2]  
+    def update_bounds(self):
+        """recompute the cached bounds after the vertex positions were edited"""
+        self.bounds = Bounds(self.vertices[:, 0:3])
+        self.vertex_version += 1
+        # the scene graph caches object space boxes too
+        if self.node is not None:
+            self.node.graph.structure_changed = True
+
+    def advance(self, seconds:float):
+        """cpu side of a frame for meshes that are not static (animation, simulation), called before they are
+        submitted. Pipelined frames call it on the worker, draws only upload what submit staged"""
+        return None
 
-        sphere_C =self.transform.position.vector()
-        scale_vec = self.transform.scale.vector()
-        sphere_r = np.sqrt(
-            (xmax * scale_vec[0]) ** 2 + (ymax * scale_vec[1]) ** 2 + (zmax * scale_vec[2]) ** 2
-        )
-        return sphere_r, sphere_C
-    
     def change_color(self, r, g, b):
         # rgb 
         rgb = self.vertices[:,3:6] 
         rgb[:,0] = r
         rgb[:,1] = g
         rgb[:,2] = b
-        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        # not uploaded yet, the pending upload reads the recolored array
+        if self.ready:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        # copies of the vertices (the gpu culling batch) are rebuilt with the scene structure
+        if self.node is not None:
+            self.node.graph.structure_changed = True
     
     def create_model_matrix(self):
         """create model matrix with T * R * S
         Returns:
             np.ndarray: model matrix
         """
+        if self.node is not None:
+            return self.node.world_matrix()
+
+        if self.transform.store is not None:
+            return self.transform.store.model_matrices(self.transform.row)[0]
+
         model = pyrr.matrix44.create_identity(dtype=np.float32)
         model = pyrr.matrix44.multiply(m1=model, m2=pyrr.matrix44.create_from_scale(scale=self.transform.scale.vector(), dtype=np.float32))
         model = pyrr.matrix44.multiply(m1=model, m2=pyrr.matrix44.create_from_eulers(eulers=self.transform.rotation.to_radians(), dtype=np.float32))
@@ -100,8 +171,35 @@ class Mesh:
         
         return model
 
+    def submit(self, queue, program, location, model, condition=None):
+        """queue draw packets for the mesh and its enabled overlays, all drawn with model.
+        condition is an occlusion query the mesh draw (not the overlays) depends on"""
+        if not self.ready:
+            return None
+
+        if self.enable:
+            queue.submit(DrawPacket(PASS_MESH, program, self.vao, self.mode, self.indices_count, location, model, self, line=self.line, condition=condition))
+        self.submit_overlays(queue, program, location, model)
+
+    def submit_overlays(self, queue, program, location, model):
+        """queue the enabled overlays only, for meshes drawn by other means (see gpu_culling.GpuCuller)"""
+        if not self.ready:
+            return None
+
+        if self.highlight.enable:
+            self.highlight.transform = self.transform
+            queue.submit(self.highlight.packet(PASS_HIGHLIGHT, program, location, model, self))
+
+        if self.wireframe.enable:
+            self.wireframe.transform = self.transform
+            queue.submit(self.wireframe.packet(PASS_WIREFRAME, program, location, model, self))
+            queue.submit(self.wireframe.points.packet(PASS_POINTS, program, location, model, self))
+
     def draw(self):
         """ Draw Mesh using glDrawElements """
+        if not self.ready:
+            return None
+
         if self.enable:
             glBindVertexArray(self.vao)
             glDrawElements(self.mode, self.indices_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
@@ -119,107 +217,154 @@ class Mesh:
         glDeleteVertexArrays(1, (self.vao,))
         glDeleteBuffers(1, (self.vbo,))
         glDeleteBuffers(1, (self.ebo,))
+        tracker.release('vao', self.vao)
+        tracker.release('buffer', self.vbo, self.ebo)
         self.highlight.destroy()
+        self.wireframe.destroy()
 
     
 
 class MeshManager:
-    def __init__(self, renderer):
-        self.meshes:list[Mesh] = []
+    def __init__(self, renderer, picking:str='ray'):
+        # mesh ids are generational handles, ids of removed meshes are detected as stale by get_mesh
+        self.registry:Registry = Registry()
+        # dense and in storage order, removal moves the last mesh into the gap (swap-and-pop)
+        self.meshes:list[Mesh] = self.registry.items
         self.renderer:Renderer = renderer
-        self.hit_manager:HitManager = HitManager(self.meshes)
-        # initialize id generator
-        self.gen_id = self._id_generator()
+        # positions, rotations and scales of all meshes, row order follows self.meshes (both swap-and-pop)
+        self.transforms:TransformStore = TransformStore()
+        # parent/child hierarchy, meshes are drawn with the world matrices it computes
+        self.scene:SceneGraph = SceneGraph(self.transforms)
+        # overlapping meshes, broadphase over the scene's world boxes and an optional triangle test
+        self.collisions:CollisionWorld = CollisionWorld(self.scene)
+        # 'ray' - analytic bounding sphere picking, 'id' - gpu id buffer picking
+        if picking == 'id':
+            from picking import IdBufferHitManager
+            self.hit_manager:IdBufferHitManager = IdBufferHitManager(renderer, self.meshes)
+        else:
+            self.hit_manager:HitManager = HitManager(self.meshes, scene=self.scene)
+        # meshes still streaming in or building their overlays (see load_mesh_progressive)
+        self.loading:list[Mesh] = []
+        # background loader, set by assets.AssetLoader
+        self.assets = None
     
-    def add_mesh(self, *args:Mesh):
+    def add_mesh(self, *args:Mesh, parent:Mesh=None):
         for arg in args:
-            arg.id = next(self.gen_id)
+            arg.id = self.registry.add(arg)
             arg.renderer = self.renderer
             arg.ray = Ray(self.renderer, arg.id)
-            self.meshes.append(arg)
+            self.transforms.add(arg.transform)
+            self.scene.add(arg, parent)
    
-        # update hit manager
+        # update hit manager once for the whole batch
         self.hit_manager.meshes = self.meshes
 
-    def load_mesh(self, filepath:str):
+    def remove_mesh(self, *args:Mesh, destroy:bool=True):
+        """remove meshes (and their GL objects unless destroy=False), children move up to the removed mesh's parent"""
+        renderer = self.renderer
+        for arg in args:
+            self.registry.remove(arg.id)
+            # same swap-and-pop as the registry, the rows stay aligned with self.meshes
+            self.transforms.remove(arg.transform)
+            if self.assets is not None:
+                # before the scene drops the node, assets loading under arg move to its parent
+                self.assets.forget(arg)
+            self.scene.remove(arg)
+            self.collisions.forget(arg)
+            renderer.forget_mesh(arg)
+            if arg in self.loading:
+                self.loading.remove(arg)
+            if destroy:
+                arg.destroy()
+
+        # update hit manager once for the whole batch
+        self.hit_manager.meshes = self.meshes
+
+    def set_parent(self, mesh:Mesh, parent:Mesh=None):
+        """attach mesh to parent so it follows the parent's transform, None detaches it"""
+        self.scene.set_parent(mesh, parent)
+
+    def update_overlaps(self) -> tuple[list[tuple], list[tuple]]:
+        """pairs of meshes that started and stopped overlapping since the last call (world boxes)"""
+        return self.collisions.update()
+
+    def overlapping_pairs(self) -> list[tuple]:
+        """every pair of meshes whose world boxes overlap"""
+        self.collisions.update()
+        return self.collisions.pairs
+
+    def overlaps(self, mesh:Mesh, narrow:bool=False) -> list[Mesh]:
+        """meshes overlapping mesh, narrow=True tests their triangles instead of their boxes"""
+        return self.collisions.overlaps(mesh, narrow)
+
+    def ray_cast(self, view:np.ndarray, projection:np.ndarray, width:int, height:int, shading:bool=True, **options) -> RayCastImage:
+        """render the enabled, loaded triangle meshes on the cpu (see raycaster.RayCaster), ids are mesh ids.
+        The bvhs are shared with the collision queries"""
+        self.scene.update()
+        caster = RayCaster(**options)
+        for mesh in self.meshes:
+            bvh = self.collisions.bvh(mesh)
+            if mesh.enable and bvh is not None:
+                caster.add(mesh.id, mesh.vertices, mesh.indices, self.scene.world_matrix(mesh), bvh=bvh)
+        return caster.render(view, projection, width, height, shading)
+
+    def export_mesh(self, mesh:Mesh, path:str) -> ExportResult:
+        """write mesh with its world transform baked in, OBJ or binary PLY by the extension of path"""
+        return export(path, [self._export_part(mesh)])
+
+    def export_meshes(self, directory:str, format:str='ply', meshes:list[Mesh]=None, workers:int=None) -> tuple[list[ExportResult], float]:
+        """write each loaded triangle mesh (default all) to directory/mesh_<id>.<format> in parallel processes,
+        returns the results and the wall clock seconds (see exporter.report)"""
+        export_format('.' + format)
+        meshes = self._exportable(meshes)
+        jobs = [(os.path.join(directory, f'mesh_{mesh.id}.{format}'), [self._export_part(mesh)]) for mesh in meshes]
+        return export_parallel(jobs, workers)
+
+    def export_scene(self, path:str, meshes:list[Mesh]=None) -> ExportResult:
+        """write the loaded triangle meshes (default all) to one file, an OBJ object per mesh"""
+        return export(path, [self._export_part(mesh) for mesh in self._exportable(meshes)])
+
+    def _exportable(self, meshes:list[Mesh]=None) -> list[Mesh]:
+        return [mesh for mesh in (self.meshes if meshes is None else meshes) if mesh.ready and int(mesh.mode) == int(GL_TRIANGLES)]
+
+    def _export_part(self, mesh:Mesh) -> tuple:
+        if not mesh.ready or int(mesh.mode) != int(GL_TRIANGLES):
+            raise ValueError(f"mesh {mesh.id} is not a loaded triangle mesh")
+        self.scene.update()
+        return (f'mesh_{mesh.id}', mesh.vertices, mesh.indices[:mesh.indices_count], self.scene.world_matrix(mesh))
+
+    def load_mesh(self, filepath:str, pipeline:CleanupPipeline=None):
+        """load an OBJ, binary PLY or STL file, optionally running a cleanup pipeline (see cleanup.default_pipeline) before upload"""
         vertices, indices = self._load_object(filepath) 
         vertices = np.array(vertices, dtype=np.float32)
         indices = np.array(indices, dtype=np.uint32)
+        if pipeline is not None:
+            vertices, indices = pipeline.run(vertices, indices)
+            print(pipeline.summary())
         mesh = Mesh(vertices, indices)
         self.add_mesh(mesh)
 
-    def _load_object(self, filepath:str):
-        vertices = []
-        indices = []
-        with open(filepath, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                line = line.split(' ')
-
-                if line[0] == 'v':
-                    v = self.read_vertex_data(line)
-                    v.extend([0.8, 0.8, 0.8])
-                    vertices.append(v)
-
-                elif line[0] == 'f':
-                    i = self.read_face_data(line)
-                    indices.extend(i)
-                
-                elif line[0] == 'o':
-                    name = line[1]
-                
-        print(f'Loaded /{filepath}: {len(vertices)} vertices, {len(indices)//6} faces')
-    
-        return vertices, indices
-    
-    def read_vertex_data(self, vertex_line:list[str]) -> list[float]:
-        return [float(vertex_line[1]),
-                float(vertex_line[2]),
-                float(vertex_line[3])]
-    
-    def read_face_data(self, face_line:list[str]) -> list[int]:
-        # draw each traingle in quad
-        # triangles in face 4 points/ 2 triangles
-        face_v_index = []
-        indices = []
-        for corner in face_line[1:]:
-            face_v_index.append(self.read_corner(corner, indices))
-        
-       
-        # draw each traingle in quad/face
-        t1 = [face_v_index[0], #1st point
-                face_v_index[1],#2nd point
-                face_v_index[2]#3rd point
-                ]
-        indices.extend(t1)
-
-        if len(face_v_index) > 3:
-            # if its a quad draw second traingle
-            t2 = [face_v_index[2],#3st point
-                    face_v_index[3],#4th point
-                    face_v_index[0]#1st point
-                    ]
-            indices.extend(t2)
-
-                
-        # print(t1, '-', t2)
-        # print(face_v_index)
-
-        return indices
-        
-
-    def read_corner(self, corner:str, indices:list[list[float]]) -> int:
-        corner = corner.split('/')
-        v_index = int(corner[0]) - 1
-        return v_index
-        # indices.append(v_index)
-        
+    def load_mesh_progressive(self, filepath:str, chunk_bytes:int=16 << 20) -> Mesh:
+        """start streaming a large OBJ file, the mesh is drawn while it fills in, see poll_loading"""
+        from progressive import ProgressiveMesh
+        mesh = ProgressiveMesh(filepath, chunk_bytes=chunk_bytes)
+        self.add_mesh(mesh)
+        self.loading.append(mesh)
+        return mesh
 
-        # implement later
-        # vt_index = 
-        # vn_index =  
+    def load_animation(self, filepath:str, decoder:str='gpu') -> Mesh:
+        """load a keyframe + delta animation file (see animation.py) as a playing mesh"""
+        from morph import AnimatedMesh
+        mesh = AnimatedMesh.from_file(filepath, decoder=decoder)
+        self.add_mesh(mesh)
+        return mesh
 
+    def poll_loading(self, max_chunks:int=1):
+        """upload parsed chunks of progressively loading meshes (then their overlays when enabled), called once per frame"""
+        self.loading = [mesh for mesh in self.loading if mesh.poll(max_chunks)]
 
+    def _load_object(self, filepath:str):
+        return read_mesh(filepath)
 
     def mesh_ids(self):
         return [mesh.id for mesh in self.meshes]
@@ -229,16 +374,8 @@ class MeshManager:
             mesh.destroy()
 
     def get_mesh(self, id) -> Mesh:
-        for mesh in self.meshes:
-            if id == mesh.id:
-                return mesh
-        return None
-    
-    def _id_generator(self):
-        id = 0
-        while True:
-            yield id
-            id += 1
+        """mesh of an id, None for None, unknown and stale (removed) ids"""
+        return self.registry.get(id)
 
 
 class Square(Mesh):
@@ -339,79 +476,8 @@ class Sphere(Mesh):
 
     def __init__(self, radius=0.5, stacks=40, slices=40):
         # 1. Generate Vertices and Indices
-        vertices, indices = self._generate_uv_sphere(radius, stacks, slices)
-
-        self.vertices = np.array(vertices, dtype=np.float32)
-        self.indices = np.array(indices, dtype=np.uint32)
+        self.vertices, self.indices = uv_sphere(radius, stacks, slices)
         
         # 2. Initialize the Mesh with EBO setup
         super().__init__(self.vertices, self.indices, mode=GL_TRIANGLES)
         self.transform.position.update(0.0, 0.0, -3.0)
-   
-
-    def gen_uv_sphere(self, radius, stacks, slices):
-        vertices = []
-        
-        # 360 degrees is 2pi radians
-        # Angle steps between slices (longitude) and stacks (latitude)
-        d_slice = np.pi / stacks  # Phi: 0 to PI (Top to Bottom)
-        d_stack = 2 * np.pi / slices  # Theta: 0 to 2*PI (Around the sphere)
-
-        # Iterate over stacks (latitude lines)
-        for i in range(stacks + 1):
-            # i = 0 (top pole), i = stacks (bottom pole)
-            phi = i * d_slice
-            y = radius * np.cos(phi)
-            
-            # Iterate over slices (longitude lines)
-            for j in range(slices + 1):
-                theta = j * d_stack
-                
-                # Calculate vertex position (x, z) on the latitude circle
-                x = radius * np.sin(phi) * np.cos(theta)
-                z = radius * np.sin(phi) * np.sin(theta)
-
-                # Use position as color for visualization (optional)
-                r, g, b = x / radius, y / radius, z / radius
-
-                vertices.append((x, y, z ,r, g, b)) # Use white color for simplicity
-
-        return vertices
-
-    def _generate_uv_sphere(self, radius, stacks, slices):
-        """Generates UV Sphere vertices and indices (indices for EBO)."""
-        vertices = self.gen_uv_sphere(radius, stacks, slices)
-        indices = []
-        
-        # --- Generate Indices ---
-        # Vertices are arranged: (s0, l0), (s0, l1), ..., (s1, l0), (s1, l1), ...
-        # where s is stack index and l is slice index
-        
-        # Iterate over quads formed by (stack i, slice j) and (stack i+1, slice j+1)
-        for i in range(stacks):
-            for j in range(slices):
-                # Calculate the 4 vertex indices that form the quad:
-                # v1 --- v2
-                # |      |
-                # v3 --- v4
-                
-                # Vertex index for current stack (i) and current slice (j)
-                v1 = i * (slices + 1) + j
-                # Vertex index for next stack (i) and next slice (j+1)
-                v2 = v1 + 1
-                # Vertex index for next stack (i+1) and current slice (j)
-                v3 = (i + 1) * (slices + 1) + j
-                # Vertex index for next stack (i+1) and next slice (j+1)
-                v4 = v3 + 1
-                
-                # The quad is split into two triangles: (v1, v3, v4) and (v1, v4, v2)
-                # Ensure correct winding order (e.g., counter-clockwise) for front-facing
-                
-                # Triangle 1 (Bottom-Left)
-                indices.extend([v1, v3, v4]) 
-                
-                # Triangle 2 (Top-Right)
-                indices.extend([v1, v4, v2]) 
-
-        return vertices, indices
-  
\ No newline at end of file
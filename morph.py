@@ -0,0 +1,138 @@
+import numpy as np
+from gl import *
+from dynamic import DynamicMesh, StagedDraw
+from resources import tracker
+from loader import DEFAULT_COLOR
+from animation import Animation, load
+
+
+class AnimatedMesh(DynamicMesh):
+    """Plays a keyframe + delta animation (see animation.py).
+
+    decoder 'cpu' decodes and blends the two frames around the current time with numpy and streams the
+    positions through the DynamicMesh ring. decoder 'gpu' keeps every keyframe and delta on the gpu and blends
+    in the morph vertex shader, a frame only changes attribute offsets and uniforms, nothing is uploaded.
+    The gpu decoder still decodes on the cpu every sync_interval seconds (and on seek) so the vertices, bounds,
+    picking, overlays and exports follow the animation, at that rate"""
+
+    def __init__(self, animation:Animation, decoder:str='gpu', speed:float=1.0, loop:bool=True, sync_interval:float=0.1):
+        if decoder not in ('cpu', 'gpu'):
+            raise ValueError("decoder must be 'cpu' or 'gpu'")
+        self.animation = animation
+        self.decoder = decoder
+        self.speed = speed
+        self.loop = loop
+        self.playing = True
+        self.time = 0.0
+        self.sync_interval = sync_interval
+        self.synced = 0.0 # time of the last cpu decode of the gpu decoder
+
+        vertices = np.empty((animation.vertex_count, 6), dtype=np.float32)
+        animation.decode(0, out=vertices[:, 0:3])
+        vertices[:, 3:6] = DEFAULT_COLOR
+        # the gpu path never writes the vertex buffer, one segment is enough
+        super().__init__(vertices, np.asarray(animation.indices, dtype=np.uint32), segments=3 if decoder == 'cpu' else 1)
+
+        self.program = None
+        if decoder == 'gpu':
+            self.__init_morph()
+
+    @classmethod
+    def from_file(cls, path:str, **kwargs) -> 'AnimatedMesh':
+        return cls(load(path), **kwargs)
+
+    def seek(self, seconds:float):
+        self.time = seconds
+        self.__decode()
+
+    def advance(self, seconds:float):
+        """play seconds of the animation, the vertices are decoded here (every sync_interval for the gpu decoder)"""
+        if self.playing:
+            self.time += seconds * self.speed
+            if self.decoder == 'cpu' or abs(self.time - self.synced) >= self.sync_interval:
+                self.__decode()
+
+    def stage(self, model:np.ndarray=None) -> StagedDraw:
+        staged = super().stage(model)
+        staged.sample = self.animation.sample(self.time, self.loop)
+        if self.decoder == 'gpu':
+            # the morph draw does not read the ring, the cpu decodes only feed bounds, picking and overlays
+            staged.rows = []
+        return staged
+
+    def draw(self, staged:StagedDraw=None):
+        if self.decoder == 'cpu' or not self.ready:
+            return super().draw(staged)
+        staged = staged if staged is not None else self.stage()
+        if not staged.enable:
+            return super().draw(staged)
+
+        self.__draw_morph(staged)
+        self._refresh(staged)
+
+    def destroy(self):
+        if self.decoder == 'gpu':
+            glDeleteVertexArrays(1, (self.morph_vao,))
+            glDeleteBuffers(3, (self.key_buffer, self.delta_buffer, self.color_buffer))
+            tracker.release('vao', self.morph_vao)
+            tracker.release('buffer', self.key_buffer, self.delta_buffer, self.color_buffer)
+        super().destroy()
+
+    def __decode(self):
+        a, b, t = self.animation.sample(self.time, self.loop)
+        positions = self.animation.decode(a)
+        if t > 0:
+            positions += (self.animation.decode(b) - positions) * t
+        self.vertices[:, 0:3] = positions
+        self.synced = self.time
+        self.mark_dirty()
+
+    def __init_morph(self):
+        animation = self.animation
+        self.key_buffer, self.delta_buffer, self.color_buffer = (glGenBuffers(1) for _ in range(3))
+        for buffer, data in ((self.key_buffer, animation.keys), (self.delta_buffer, animation.deltas), (self.color_buffer, self.vertices[:, 3:6])):
+            data = np.ascontiguousarray(data)
+            glBindBuffer(GL_ARRAY_BUFFER, buffer)
+            glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_STATIC_DRAW)
+            tracker.track('buffer', buffer, data.nbytes, owner=self, label='AnimatedMesh morph')
+
+        self.morph_vao = glGenVertexArrays(1)
+        tracker.track('vao', self.morph_vao, owner=self)
+        glBindVertexArray(self.morph_vao)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBindBuffer(GL_ARRAY_BUFFER, self.color_buffer)
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+        for location in (0, 2, 3, 4):
+            glEnableVertexAttribArray(location)
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def __draw_morph(self, staged:StagedDraw):
+        programs = self.renderer.programs
+        if self.program is None:
+            self.program = programs.load("shaders/morph_vertex.txt", "shaders/fragment.txt")
+
+        animation = self.animation
+        a, b, t = staged.sample
+        n = animation.vertex_count
+        model = staged.model if staged.model is not None else self.create_model_matrix()
+
+        glUseProgram(self.program)
+        glBindVertexArray(self.morph_vao)
+        # point the attributes at the keyframes and deltas of both frames
+        glBindBuffer(GL_ARRAY_BUFFER, self.key_buffer)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(animation.key_of(a) * n * 12))
+        glVertexAttribPointer(3, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(animation.key_of(b) * n * 12))
+        glBindBuffer(GL_ARRAY_BUFFER, self.delta_buffer)
+        glVertexAttribPointer(2, 3, GL_SHORT, GL_FALSE, 6, ctypes.c_void_p(a * n * 6))
+        glVertexAttribPointer(4, 3, GL_SHORT, GL_FALSE, 6, ctypes.c_void_p(b * n * 6))
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glUniformMatrix4fv(programs.uniform_location(self.program, "model"), 1, GL_FALSE, model)
+        glUniform3fv(programs.uniform_location(self.program, "deltaScaleA"), 1, animation.scales[a])
+        glUniform3fv(programs.uniform_location(self.program, "deltaScaleB"), 1, animation.scales[b])
+        glUniform1f(programs.uniform_location(self.program, "blend"), t)
+        glDrawElements(self.mode, self.indices_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glBindVertexArray(0)
+        glUseProgram(self.renderer.shader)
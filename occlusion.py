@@ -0,0 +1,166 @@
+import numpy as np
+from gl import *
+from resources import tracker
+
+# unit cube, scaled to a world space box by the box vertex shader
+BOX_VERTICES = np.array([[x, y, z] for z in (0, 1) for y in (0, 1) for x in (0, 1)], dtype=np.float32)
+BOX_INDICES = np.array([
+    0, 2, 1, 1, 2, 3, # z = 0
+    4, 5, 6, 5, 7, 6, # z = 1
+    0, 1, 4, 1, 5, 4, # y = 0
+    2, 6, 3, 3, 6, 7, # y = 1
+    0, 4, 2, 2, 4, 6, # x = 0
+    1, 3, 5, 3, 7, 5, # x = 1
+], dtype=np.uint32)
+
+
+class OcclusionQuery:
+    """Occlusion state of one mesh, visible is the last result read back"""
+    __slots__ = ("query", "visible", "pending")
+
+    def __init__(self, query):
+        self.query = query
+        self.visible = True # untested meshes are drawn
+        self.pending = False # issued and the result not read yet
+
+
+class OcclusionCuller:
+    """Hardware occlusion culling with GL_ANY_SAMPLES_PASSED queries on the world space boxes of the scene.
+
+    Temporal coherence keeps the cpu from ever waiting on a result: meshes visible in the last result are drawn
+    as usual and retested every `interval` frames (staggered), their queries run after the scene so the depth
+    buffer holds the occluders. Meshes occluded in the last result are not drawn with the others, they are
+    tested against the depth of this frame and drawn with conditional rendering on that query, so the gpu
+    discards them while they stay hidden and they appear in the frame they become visible. Results are read
+    back in issue order as they become available, a few frames late at most. Meshes that are not static
+    (dynamic, animated, still loading) have stale scene boxes, they are never tested or held back.
+
+    stats holds the counts of the last frame, culled is the number of mesh draws held back as occluded"""
+
+    def __init__(self, programs, interval:int=4, margin:float=0.01):
+        self.programs = programs
+        self.interval = interval
+        self.margin = margin # box growth, keeps flat and thin boxes from z-fighting with their mesh
+        self.entries:dict = {} # mesh -> OcclusionQuery
+        self.in_flight:list[OcclusionQuery] = []
+        self.occluded:list = [] # meshes held back this frame
+        self.frame = 0
+        self.stats = {}
+
+        self.program = programs.load("shaders/box_vertex.txt", "shaders/box_fragment.txt")
+        self.box_min_location = programs.uniform_location(self.program, "boxMin")
+        self.box_max_location = programs.uniform_location(self.program, "boxMax")
+
+        self.vao = glGenVertexArrays(1)
+        self.vbo = glGenBuffers(1)
+        self.ebo = glGenBuffers(1)
+        tracker.track('vao', self.vao, owner=self)
+        tracker.track('buffer', self.vbo, BOX_VERTICES.nbytes, owner=self, label='occlusion box')
+        tracker.track('buffer', self.ebo, BOX_INDICES.nbytes, owner=self, label='occlusion box')
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, BOX_VERTICES.nbytes, BOX_VERTICES, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, BOX_INDICES.nbytes, BOX_INDICES, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def begin_frame(self):
+        """read back the finished queries, call before the meshes are submitted"""
+        self._collect()
+        self.frame += 1
+        self.occluded = []
+        self.stats = dict.fromkeys(("tested", "culled", "visible_tests", "occluded_tests"), 0)
+
+    def cull(self, mesh) -> bool:
+        """True when mesh was occluded in its last result, it is held back and drawn by test_and_submit"""
+        entry = self.entries.get(mesh)
+        if entry is None or entry.visible or not mesh.static:
+            return False
+        self.occluded.append(mesh)
+        self.stats["culled"] += 1
+        return True
+
+    def test_and_submit(self, meshes, scene, camera_position, queue, program, location):
+        """issue the box queries against the depth drawn so far and queue the held back meshes with their
+        query as draw condition. Call after the visible meshes are flushed, the occluded ones draw with the
+        next flush"""
+        glUseProgram(self.program)
+        glBindVertexArray(self.vao)
+        glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
+        glDepthMask(GL_FALSE)
+
+        # same as frustum culling, only static meshes have boxes to test
+        meshes = [mesh for mesh in meshes if mesh.ready and mesh.static]
+        if meshes:
+            rows = np.fromiter((mesh.node.index for mesh in meshes), dtype=np.intp, count=len(meshes))
+            box_min = scene.world_min[rows] - self.margin
+            box_max = scene.world_max[rows] + self.margin
+            # a box around the camera is cut by the near plane and may fail, such meshes count as visible
+            inside = np.all((box_min <= camera_position) & (camera_position <= box_max), axis=1)
+            for i, mesh in enumerate(meshes):
+                entry = self.entries.get(mesh)
+                if entry is None:
+                    # glGenQueries returns an array of names
+                    entry = self.entries[mesh] = OcclusionQuery(int(glGenQueries(1)[0]))
+                    tracker.track('query', entry.query, owner=self)
+                if inside[i]:
+                    entry.visible = True
+                    continue
+                if entry.pending:
+                    continue
+                # visible meshes are retested every interval frames, spread over the frames by row
+                if entry.visible and (self.frame + rows[i]) % self.interval:
+                    continue
+
+                glUniform3fv(self.box_min_location, 1, box_min[i])
+                glUniform3fv(self.box_max_location, 1, box_max[i])
+                glBeginQuery(GL_ANY_SAMPLES_PASSED, entry.query)
+                glDrawElements(GL_TRIANGLES, len(BOX_INDICES), GL_UNSIGNED_INT, ctypes.c_void_p(0))
+                glEndQuery(GL_ANY_SAMPLES_PASSED)
+                entry.pending = True
+                self.in_flight.append(entry)
+                self.stats["visible_tests" if entry.visible else "occluded_tests"] += 1
+            self.stats["tested"] = self.stats["visible_tests"] + self.stats["occluded_tests"]
+
+        glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
+        glDepthMask(GL_TRUE)
+        glBindVertexArray(0)
+        glUseProgram(program)
+        queue.state.invalidate()
+
+        for mesh in self.occluded:
+            entry = self.entries[mesh]
+            # the camera may have moved into the box since the mesh was held back
+            condition = None if entry.visible else entry.query
+            mesh.submit(queue, program, location, scene.world_matrix(mesh), condition=condition)
+
+    def forget(self, mesh):
+        """drop the query of a removed mesh"""
+        entry = self.entries.pop(mesh, None)
+        if entry is None:
+            return None
+        if entry in self.in_flight:
+            self.in_flight.remove(entry)
+        glDeleteQueries(1, (entry.query,))
+        tracker.release('query', entry.query)
+
+    def destroy(self):
+        for mesh in list(self.entries):
+            self.forget(mesh)
+        glDeleteVertexArrays(1, (self.vao,))
+        glDeleteBuffers(2, (self.vbo, self.ebo))
+        tracker.release('vao', self.vao)
+        tracker.release('buffer', self.vbo, self.ebo)
+
+    def _collect(self):
+        """read finished queries, oldest first, without waiting"""
+        while self.in_flight:
+            entry = self.in_flight[0]
+            if not glGetQueryObjectiv(entry.query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            self.in_flight.pop(0)
+            entry.visible = bool(glGetQueryObjectiv(entry.query, GL_QUERY_RESULT))
+            entry.pending = False
@@ -0,0 +1,164 @@
+import numpy as np
+from gl import *
+from resources import tracker
+
+
+class IdBufferHitManager:
+    """ Picking backend that renders mesh ids into an offscreen integer framebuffer,
+        the pixels under the cursor are read back through pixel buffer objects so the read never stalls
+    """
+
+    def __init__(self, renderer, meshes, radius:int=0, triangles:bool=False, buffers:int=2):
+        self.renderer = renderer
+        self.meshes = meshes
+        self.radius = radius # read a (2r+1) x (2r+1) rectangle around the cursor
+        self.triangles = triangles
+        self.width, self.height = 0, 0
+
+        # last resolved hit (mesh.id, hit, distance) and triangle index
+        self.last_hit = (None, None, None)
+        self.last_triangle = None
+
+        programs = renderer.programs
+        self.shader = programs.load("shaders/id_vertex.txt", "shaders/id_fragment.txt")
+        self.modelMatrixLocation = programs.uniform_location(self.shader, "model")
+        self.meshIdLocation = programs.uniform_location(self.shader, "meshId")
+
+        self.fbo = glGenFramebuffers(1)
+        self.color = glGenRenderbuffers(1)
+        self.depth = glGenRenderbuffers(1)
+
+        # ring of pixel buffer objects, each pending read keeps (pbo, fence, w, h)
+        size = (2 * self.radius + 1)
+        self.pbo_size = size * size * 16
+        self.pbos = [glGenBuffers(1) for _ in range(buffers)]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.pbo_size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        tracker.track('framebuffer', self.fbo, owner=self)
+        tracker.track('renderbuffer', self.color, owner=self)
+        tracker.track('renderbuffer', self.depth, owner=self)
+        for pbo in self.pbos:
+            tracker.track('buffer', pbo, self.pbo_size, owner=self)
+        self.pending = []
+        self.next_pbo = 0
+
+    def draw_rays(self, mouse_x, mouse_y):
+        """render the id buffer around (mouse_x, mouse_y) and queue an asynchronous read of it"""
+        self._resize(self.renderer.scr_width, self.renderer.scr_height)
+
+        # convert window coordinates (top left origin) to a clamped gl read rectangle
+        x = int(mouse_x) - self.radius
+        y = self.height - 1 - int(mouse_y) - self.radius
+        size = 2 * self.radius + 1
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + size, self.width), min(y + size, self.height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+
+        # every pbo is still in flight, drop the oldest read instead of waiting for it
+        if len(self.pending) == len(self.pbos):
+            glDeleteSync(self.pending.pop(0)[1])
+
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+        # only the pixels that will be read back are rasterized
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(x0, y0, x1 - x0, y1 - y0)
+        glClearBufferuiv(GL_COLOR, 0, np.zeros(4, dtype=np.uint32))
+        glClear(GL_DEPTH_BUFFER_BIT)
+
+        glUseProgram(self.shader)
+        self.renderer.programs.update_camera()
+        for mesh in self.meshes:
+            # only what the main pass draws can be picked
+            if not (mesh.enable and mesh.ready):
+                continue
+            glUniform1ui(self.meshIdLocation, mesh.id + 1)
+            glUniformMatrix4fv(self.modelMatrixLocation, 1, GL_FALSE, mesh.create_model_matrix())
+            glBindVertexArray(mesh.vao)
+            glDrawElements(mesh.mode, mesh.indices_count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glBindVertexArray(0)
+        glDisable(GL_SCISSOR_TEST)
+
+        # read into the pbo, this returns immediately and the copy happens on the gpu
+        pbo = self.pbos[self.next_pbo]
+        self.next_pbo = (self.next_pbo + 1) % len(self.pbos)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        glReadPixels(x0, y0, x1 - x0, y1 - y0, GL_RGBA_INTEGER, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.pending.append((pbo, fence, x1 - x0, y1 - y0))
+
+        # restore renderer state
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(*viewport)
+        glUseProgram(self.renderer.shader)
+
+    def get_hit(self):
+        """get the hit object of the mesh the mouse is currently point on returns (mesh.id, hit, distance)"""
+        # resolve every read the gpu already finished, newest result wins
+        while self.pending:
+            pbo, fence, w, h = self.pending[0]
+            status = glClientWaitSync(fence, 0, 0)
+            if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                break
+            self.pending.pop(0)
+            self.last_hit, self.last_triangle = self._decode(self._map(pbo, w * h * 16))
+            glDeleteSync(fence)
+
+        return self.last_hit
+
+    def destroy(self):
+        for pending in self.pending:
+            glDeleteSync(pending[1])
+        self.pending = []
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        glDeleteRenderbuffers(2, (self.color, self.depth))
+        glDeleteFramebuffers(1, (self.fbo,))
+        tracker.release('buffer', *self.pbos)
+        tracker.release('renderbuffer', self.color, self.depth)
+        tracker.release('framebuffer', self.fbo)
+
+    def _decode(self, pixels:np.ndarray):
+        """pick the closest mesh in the read rectangle, returns ((mesh.id, hit, distance), triangle)"""
+        pixels = pixels.reshape(-1, 4)
+        pixels = pixels[pixels[:, 0] != 0]
+        if len(pixels) == 0:
+            return (None, None, None), None
+
+        distances = pixels[:, 2].view(np.float32)
+        closest = pixels[np.argmin(distances)]
+        triangle = int(closest[1]) - 1 if self.triangles else None
+        return (int(closest[0]) - 1, True, float(distances.min())), triangle
+
+    def _map(self, pbo, nbytes:int) -> np.ndarray:
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        ptr = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, nbytes, GL_MAP_READ_BIT)
+        pixels = np.frombuffer(ctypes.string_at(ptr, nbytes), dtype=np.uint32).copy()
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return pixels
+
+    def _resize(self, width:int, height:int):
+        """(re)allocate framebuffer attachments when the window size changes"""
+        if (width, height) == (self.width, self.height):
+            return None
+        self.width, self.height = width, height
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA32UI, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        tracker.resize('renderbuffer', self.color, width * height * 16)
+        tracker.resize('renderbuffer', self.depth, width * height * 4)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
@@ -0,0 +1,308 @@
+import os
+import mmap
+import queue
+import tempfile
+import threading
+import numpy as np
+from gl import *
+from mesh import Mesh
+from bounds import Bounds
+from resources import tracker
+from loader import parse_obj_chunk
+from hightlight import Highlight, Points, WireFrame, _recolored
+
+
+class GrowableBuffer:
+    """GPU buffer that can be appended to, storage doubles when full and old contents are copied on the gpu"""
+
+    def __init__(self, target, capacity:int=1 << 20, usage=GL_STATIC_DRAW, owner=None):
+        self.target = target
+        self.usage = usage
+        self.capacity = capacity
+        self.size = 0
+        self.owner = owner # for the resource tracker
+        self.buffer = glGenBuffers(1)
+        glBindBuffer(self.target, self.buffer)
+        glBufferData(self.target, self.capacity, None, self.usage)
+        glBindBuffer(self.target, 0)
+        tracker.track('buffer', self.buffer, self.capacity, owner=owner)
+
+    def append(self, data:np.ndarray) -> bool:
+        """append data at the end of the buffer, returns True if the buffer object was reallocated"""
+        grown = False
+        if self.size + data.nbytes > self.capacity:
+            self._grow(max(2 * self.capacity, self.size + data.nbytes))
+            grown = True
+
+        glBindBuffer(self.target, self.buffer)
+        glBufferSubData(self.target, self.size, data.nbytes, data)
+        glBindBuffer(self.target, 0)
+        self.size += data.nbytes
+        return grown
+
+    def destroy(self):
+        glDeleteBuffers(1, (self.buffer,))
+        tracker.release('buffer', self.buffer)
+
+    def _grow(self, capacity:int):
+        new = glGenBuffers(1)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, new)
+        glBufferData(GL_COPY_WRITE_BUFFER, capacity, None, self.usage)
+        glBindBuffer(GL_COPY_READ_BUFFER, self.buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, 0, 0, self.size)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        glDeleteBuffers(1, (self.buffer,))
+        tracker.release('buffer', self.buffer)
+        tracker.track('buffer', new, capacity, owner=self.owner)
+        self.buffer = new
+        self.capacity = capacity
+
+
+class ProgressiveMesh(Mesh):
+    """Mesh streamed from a (huge) OBJ file: a worker thread parses memory mapped chunks and the render thread
+    appends them to growable gpu buffers with poll(), the mesh draws whatever has arrived so far.
+
+    Host memory stays bounded by chunk_bytes * (queue_chunks + 2), parsed data is spilled to temporary files
+    that back self.vertices / self.indices (as memmaps) once loading is done. The highlight and wireframe
+    overlays stay empty while loading, the first time one of them is enabled afterwards poll() streams their
+    arrays from the spill into temporary files one chunk per call and creates them from those"""
+    static = False # until loading is done
+
+    def __init__(self, filepath:str, chunk_bytes:int=16 << 20, queue_chunks:int=2):
+        super().__init__(np.zeros((0, 6), dtype=np.float32), np.zeros(0, dtype=np.uint32))
+        self.filepath = filepath
+        self.chunk_bytes = chunk_bytes
+        self.file_size = os.path.getsize(filepath)
+        self.bytes_parsed = 0
+        self.vertex_count = 0
+        self.done = False
+        self.error = None
+
+        # running object space bounds of the loaded positions
+        self.bounds_min = np.full(3, np.inf, dtype=np.float32)
+        self.bounds_max = np.full(3, -np.inf, dtype=np.float32)
+
+        # replace the empty static buffers with growable ones
+        glDeleteBuffers(2, (self.vbo, self.ebo))
+        tracker.release('buffer', self.vbo, self.ebo)
+        self.vertex_buffer = GrowableBuffer(GL_ARRAY_BUFFER, capacity=chunk_bytes, owner=self)
+        self.index_buffer = GrowableBuffer(GL_ELEMENT_ARRAY_BUFFER, capacity=chunk_bytes // 2, owner=self)
+        self._bind_layout()
+
+        # faces that reference vertices which have not been uploaded yet
+        self.pending = np.zeros((0, 3), dtype=np.uint32)
+
+        # parsed chunks spill to disk so the full mesh never has to fit in memory
+        self.vertex_file = tempfile.TemporaryFile()
+        self.index_file = tempfile.TemporaryFile()
+        self.overlay_files = []
+        self.overlay_build = None # generator stepped by poll(), see _spill_overlays
+        self.overlays_built = False
+
+        self.chunks = queue.Queue(maxsize=queue_chunks)
+        self.cancelled = threading.Event()
+        self.worker = threading.Thread(target=self._parse, daemon=True)
+        self.worker.start()
+
+    @property
+    def progress(self) -> float:
+        """fraction of the file parsed, 0.0 - 1.0"""
+        return self.bytes_parsed / self.file_size if self.file_size else 1.0
+
+    def cancel(self):
+        """stop loading, what was uploaded so far stays drawable"""
+        self.cancelled.set()
+
+    def poll(self, max_chunks:int=1) -> bool:
+        """upload up to max_chunks parsed chunks, call once per frame from the GL thread. Once loaded it steps the
+        overlay build instead. returns True while loading or until the overlays are built"""
+        if self.cancelled.is_set() and not self.done:
+            self._finish()
+        if self.done:
+            return self._poll_overlays(max_chunks)
+
+        for _ in range(max_chunks):
+            if self.done:
+                break
+            try:
+                chunk = self.chunks.get_nowait()
+            except queue.Empty:
+                break
+
+            if chunk is None:
+                self._finish()
+            else:
+                self._upload(*chunk)
+        return True
+
+    def _poll_overlays(self, max_chunks:int) -> bool:
+        if self.overlays_built:
+            return False
+        if self.overlay_build is None:
+            if not (self.highlight.enable or self.wireframe.enable):
+                return True
+            self.overlay_build = self._spill_overlays()
+        for _ in range(max_chunks):
+            if next(self.overlay_build, True):
+                self.overlays_built = True
+                self.overlay_build = None
+                return False
+        return True
+
+    def destroy(self):
+        self.cancel()
+        # the worker notices the cancel between chunks or while waiting for queue space
+        self.worker.join()
+        self.overlay_build = None
+        for spill in (self.vertex_file, self.index_file, *self.overlay_files):
+            spill.close()
+        glDeleteVertexArrays(1, (self.vao,))
+        tracker.release('vao', self.vao)
+        self.vertex_buffer.destroy()
+        self.index_buffer.destroy()
+        self.highlight.destroy()
+        self.wireframe.destroy()
+
+    def _parse(self):
+        """worker thread: parse the memory mapped file one chunk of whole lines at a time"""
+        try:
+            with open(self.filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                start, vertex_base = 0, 0
+                while start < self.file_size and not self.cancelled.is_set():
+                    end = mm.rfind(b'\n', start, start + self.chunk_bytes) + 1
+                    if end <= start:
+                        # a single line longer than the chunk, extend to its end
+                        end = mm.find(b'\n', start + self.chunk_bytes) + 1 or self.file_size
+                    vertices, triangles = parse_obj_chunk(mm[start:end], vertex_base, colors=True)
+                    vertex_base += len(vertices)
+                    self._put((vertices, triangles, end))
+                    start = end
+        except Exception as e:
+            self.error = e
+        self._put(None)
+
+    def _put(self, item):
+        # blocks while the render thread is behind, which is what bounds memory
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return None
+            except queue.Full:
+                continue
+
+    def _upload(self, vertices:np.ndarray, triangles:np.ndarray, parsed:int):
+        if len(vertices):
+            positions = vertices[:, 0:3]
+            grown = self.vertex_buffer.append(vertices)
+            self.vertex_file.write(vertices.tobytes())
+            self.vertex_count += len(vertices)
+            self.bounds_min = np.minimum(self.bounds_min, positions.min(axis=0))
+            self.bounds_max = np.maximum(self.bounds_max, positions.max(axis=0))
+            # box only while loading, the tight bounds are computed once in _finish
+            self.bounds = Bounds.from_aabb(self.bounds_min, self.bounds_max)
+            if self.node is not None:
+                self.node.graph.refresh_bounds(self)
+            if grown:
+                self._bind_layout()
+
+        # only faces whose vertices are all on the gpu can be drawn
+        triangles = np.concatenate((self.pending, triangles.astype(np.uint32)))
+        ready = triangles.max(axis=1, initial=0) < self.vertex_count
+        self.pending = triangles[~ready]
+        indices = triangles[ready].reshape(-1)
+        if len(indices):
+            if self.index_buffer.append(indices):
+                self._bind_layout()
+            self.index_file.write(indices.tobytes())
+            self.indices_count += len(indices)
+
+        self.bytes_parsed = parsed
+
+    def _finish(self):
+        """loading ended (completed, cancelled or failed), expose the spilled data as memmaps"""
+        self.done = True
+        # writable, change_color and friends edit the vertices in place
+        self.vertices = self._memmap(self.vertex_file, np.float32, 6)
+        self.indices = self._memmap(self.index_file, np.uint32, 1)
+        self.vertex_version += 1
+        self.bounds = Bounds(self.vertices[:, 0:3])
+        self.static = True
+        # tight bounds and a static mesh, the gpu culling batch is rebuilt with the scene structure
+        if self.node is not None:
+            self.node.graph.structure_changed = True
+        if self.error is not None:
+            print(f'Loading /{self.filepath} failed: {self.error}')
+        else:
+            print(f'Loaded /{self.filepath}: {self.vertex_count} vertices, {self.indices_count // 3} triangles')
+
+    def _spill_overlays(self):
+        """generator writing the overlay arrays to temporary files, one chunk of the spilled mesh per step.
+        The last step creates the overlays from the files (as memmaps) and yields True"""
+        rows = max(self.chunk_bytes // self.vertices.itemsize // 6, 1)
+        triangles = self.indices.reshape(-1, 3)
+        faces = max(self.chunk_bytes // self.indices.itemsize // 3, 1)
+
+        # the highlight and wireframe share their color, a copy of the vertices per color
+        colors = {}
+        for color in (Highlight.color, WireFrame.color, Points.color):
+            if color not in colors:
+                colors[color] = spill = self._scratch()
+                for start in range(0, self.vertex_count, rows):
+                    spill.write(_recolored(self.vertices[start:start + rows], color).tobytes())
+                    yield False
+
+        outlines = {}
+        for overlay in (Highlight, WireFrame):
+            outlines[overlay] = spill = self._scratch()
+            for start in range(0, len(triangles), faces):
+                spill.write(overlay._outline(triangles[start:start + faces]).astype(np.uint32).tobytes())
+                yield False
+
+        # the vertices the faces use, np.unique of the indices without holding them
+        points = self._scratch()
+        if self.vertex_count:
+            used = np.memmap(self._scratch(), dtype=np.bool_, mode='w+', shape=(self.vertex_count,))
+            for start in range(0, len(triangles), faces):
+                used[triangles[start:start + faces].reshape(-1)] = True
+                yield False
+            for start in range(0, self.vertex_count, rows):
+                points.write((np.flatnonzero(used[start:start + rows]) + start).astype(np.uint32).tobytes())
+                yield False
+
+        vertices = {color: self._memmap(spill, np.float32, 6) for color, spill in colors.items()}
+        self._create_overlays(overlays=dict(
+            highlight=(vertices[Highlight.color], self._memmap(outlines[Highlight], np.uint32, 1)),
+            wireframe=(vertices[WireFrame.color], self._memmap(outlines[WireFrame], np.uint32, 1)),
+            points=(vertices[Points.color], self._memmap(points, np.uint32, 1))))
+        yield True
+
+    def _scratch(self):
+        spill = tempfile.TemporaryFile()
+        self.overlay_files.append(spill)
+        return spill
+
+    @staticmethod
+    def _memmap(spill, dtype, columns:int) -> np.ndarray:
+        """writable memmap of a spill file, rows of columns values"""
+        spill.flush()
+        if spill.seek(0, os.SEEK_END) == 0:
+            # empty files can not be mapped
+            data = np.zeros(0, dtype=dtype)
+        else:
+            data = np.memmap(spill, dtype=dtype, mode='r+')
+        return data.reshape(-1, columns) if columns > 1 else data
+
+    def _bind_layout(self):
+        """point the VAO at the current vertex/index buffer objects"""
+        glBindVertexArray(self.vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vertex_buffer.buffer)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.index_buffer.buffer)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(0))
+        glEnableVertexAttribArray(1)
+        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 24, ctypes.c_void_p(12))
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+        self.vbo, self.ebo = self.vertex_buffer.buffer, self.index_buffer.buffer
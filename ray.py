@@ -1,14 +1,26 @@
 import math
 import numpy as np
-from app import Renderer
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app import Renderer
 
 
 class HitManager:
-    def __init__(self, meshes):
+    def __init__(self, meshes, scene=None):
         self.meshes = meshes
+        self.scene = scene # optional SceneGraph, its bounds reject whole branches before the per mesh tests
 
     def draw_rays(self, mouse_x, mouse_y):
-        for mesh in self.meshes:
+        meshes = self.meshes
+        if self.scene is not None and len(meshes) > 0:
+            ray_dir, ray_origin = meshes[0].ray.gen_ray(mouse_x, mouse_y)
+            candidates = self.scene.query(lambda mins, maxs: ray_aabb_intersect(ray_origin, ray_dir, mins, maxs))
+            for mesh in meshes:
+                mesh.hit = Hit(mesh.id, False, float('inf'))
+            meshes = candidates
+
+        for mesh in meshes:
             mesh.draw_ray_to_mesh(mouse_x, mouse_y)
 
     def hit_status(self):
@@ -42,6 +54,56 @@ class HitManager:
         # print('h', h)
         return hits[closest][0].item()
         
+def ray_aabb_intersect(ray_O:np.ndarray, ray_D:np.ndarray, box_min:np.ndarray, box_max:np.ndarray) -> np.ndarray:
+    """slab test of one ray against k axis aligned boxes (k, 3), returns bool mask (k,)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_D = 1.0 / ray_D
+        t1 = (box_min - ray_O) * inv_D
+        t2 = (box_max - ray_O) * inv_D
+    # nan comes from 0 * inf when the ray runs inside a slab plane, treat it as inside
+    t_near = np.nanmax(np.minimum(t1, t2), axis=1, initial=-np.inf)
+    t_far = np.nanmin(np.maximum(t1, t2), axis=1, initial=np.inf)
+    return (t_near <= t_far) & (t_far >= 0)
+
+def gen_rays(view:np.ndarray, projection:np.ndarray, width:int, height:int, rows:slice=slice(None), cols:slice=slice(None)) -> tuple[np.ndarray, np.ndarray]:
+    """primary rays through the pixel centers of a (rows, cols) window of the screen, the gen_ray math for a
+    whole grid: pixels are unprojected on the near and far plane through inverse(view @ projection), so they
+    match the GL image exactly. returns (origins, directions) (h, w, 3) float64, origin on the near plane and
+    direction reaching the far plane at t = 1 (not normalized)"""
+    y = np.arange(height)[rows] + 0.5
+    x = np.arange(width)[cols] + 0.5
+    ndc_x = np.broadcast_to(2 * x / width - 1, (len(y), len(x)))
+    ndc_y = np.broadcast_to((1 - 2 * y / height)[:, None], (len(y), len(x)))
+    # row vector convention, clip = [p, 1] @ view @ projection
+    inverse = np.linalg.inv(view.astype(np.float64) @ projection.astype(np.float64))
+    points = np.stack((ndc_x, ndc_y, -np.ones_like(ndc_x), np.ones_like(ndc_x)), axis=-1)
+    near = points @ inverse
+    points[..., 2] = 1
+    far = points @ inverse
+    near = near[..., 0:3] / near[..., 3:4]
+    far = far[..., 0:3] / far[..., 3:4]
+    return near, far - near
+
+def ray_triangles_intersect(ray_O:np.ndarray, ray_D:np.ndarray, a:np.ndarray, b:np.ndarray, c:np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """moller trumbore test of k rays against k triangles (k, 3) each, both faces count.
+    returns (t, u, v) (k,), t is inf where the ray misses, u v are the barycentric weights of b and c"""
+    # written out per component, reductions over axes of length 3 are much slower than elementwise ops
+    e1x, e1y, e1z = b[:, 0] - a[:, 0], b[:, 1] - a[:, 1], b[:, 2] - a[:, 2]
+    e2x, e2y, e2z = c[:, 0] - a[:, 0], c[:, 1] - a[:, 1], c[:, 2] - a[:, 2]
+    dx, dy, dz = ray_D[:, 0], ray_D[:, 1], ray_D[:, 2]
+    px, py, pz = dy * e2z - dz * e2y, dz * e2x - dx * e2z, dx * e2y - dy * e2x
+    det = e1x * px + e1y * py + e1z * pz
+    sx, sy, sz = ray_O[:, 0] - a[:, 0], ray_O[:, 1] - a[:, 1], ray_O[:, 2] - a[:, 2]
+    qx, qy, qz = sy * e1z - sz * e1y, sz * e1x - sx * e1z, sx * e1y - sy * e1x
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_det = 1.0 / det
+        u = (sx * px + sy * py + sz * pz) * inv_det
+        v = (dx * qx + dy * qy + dz * qz) * inv_det
+        t = (e2x * qx + e2y * qy + e2z * qz) * inv_det
+        # degenerate triangles (det 0) give nan or inf and fail the tests
+        hit = (det != 0) & (u >= 0) & (v >= 0) & (u + v <= 1) & (t >= 0)
+    return np.where(hit, t, np.inf), u, v
+
 class Hit:
     def __init__(self, id:int, hit:bool, distance:float):
         self.id = id
@@ -52,7 +114,7 @@ class Hit:
         return self.id, self.hit, self.distance
 
 class Ray:
-    def __init__(self, renderer:Renderer, id):
+    def __init__(self, renderer:'Renderer', id):
         self.renderer = renderer
         self.id = id
         
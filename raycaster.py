@@ -0,0 +1,181 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from bvh import TriangleBVH
+from bounds import transform_aabbs
+from ray import gen_rays
+
+# cpu reference renderer, GL free.
+#
+# the primary rays of the screen are cast tile by tile: every tile is one batch of rays (see ray.gen_rays) that
+# is tested against the world box of each mesh, the rays that hit a box walk the mesh bvh in object space (see
+# TriangleBVH.intersect_rays). Rays run from the near to the far plane with t in [0, 1], so the closest hit
+# over all meshes is the smallest t and the depth is the GL depth buffer value of the hit point. Tiles are
+# spread over a process pool, the meshes are sent once to every worker
+
+
+class RayCastImage:
+    """Result of RayCaster.render, rows top to bottom like the screen.
+    depth (h, w) float32 window depth as in the GL depth buffer, 1 where nothing is hit
+    ids (h, w) int64 id of the visible mesh, -1 where nothing is hit
+    color (h, w, 3) float32 rgb in [0, 1], black background"""
+
+    def __init__(self, depth:np.ndarray, ids:np.ndarray, color:np.ndarray, seconds:float):
+        self.depth = depth
+        self.ids = ids
+        self.color = color
+        self.seconds = seconds
+
+    def rays_per_second(self) -> float:
+        return self.ids.size / self.seconds if self.seconds > 0 else float('inf')
+
+
+class RayCaster:
+    """Renders triangle meshes with numpy, matching the GL image of the same view and projection matrices.
+
+    add() the meshes with their world matrices, then render(). Colors are the interpolated vertex colors like
+    shaders/fragment.txt, with shading they are scaled by the facing ratio of the triangle (flat shading)"""
+
+    def __init__(self, tile:int=32, workers:int=None, ambient:float=0.25, leaf_size:int=8):
+        self.tile = tile
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.ambient = ambient
+        self.leaf_size = leaf_size
+        self.items:list[tuple] = [] # (id, bvh, colors, world, inverse world, world min, world max)
+
+    def add(self, id:int, vertices:np.ndarray, indices:np.ndarray, world:np.ndarray=None, bvh:TriangleBVH=None):
+        """add a triangle mesh, vertices (N, 6) position+color or (N, 3), world its (4, 4) row vector world
+        matrix (default identity). A bvh already built for the vertices (e.g. CollisionWorld.bvh) is reused"""
+        world = np.identity(4) if world is None else np.asarray(world, dtype=np.float64)
+        if bvh is None:
+            bvh = TriangleBVH(vertices[:, 0:3], indices, self.leaf_size)
+        if vertices.shape[1] >= 6:
+            colors = np.asarray(vertices[:, 3:6], dtype=np.float32)
+        else:
+            colors = np.full((len(vertices), 3), 0.8, dtype=np.float32)
+        if len(bvh.triangles) == 0:
+            return
+        box_min, box_max = transform_aabbs(bvh.min[0:1], bvh.max[0:1], world[None])
+        self.items.append((id, bvh, colors, world, np.linalg.inv(world), box_min[0], box_max[0]))
+
+    def render(self, view:np.ndarray, projection:np.ndarray, width:int, height:int, shading:bool=True) -> RayCastImage:
+        start = time.perf_counter()
+        state = (self.items, np.asarray(view, dtype=np.float64), np.asarray(projection, dtype=np.float64), width, height, shading, self.ambient)
+        tiles = [(y, min(y + self.tile, height), x, min(x + self.tile, width))
+                 for y in range(0, height, self.tile) for x in range(0, width, self.tile)]
+
+        depth = np.ones((height, width), dtype=np.float32)
+        ids = np.full((height, width), -1, dtype=np.int64)
+        color = np.zeros((height, width, 3), dtype=np.float32)
+        if self.workers <= 1 or len(tiles) <= 1:
+            results = (_cast_tile(state, tile) for tile in tiles)
+            self._assemble(tiles, results, depth, ids, color)
+        else:
+            # the meshes go to every worker once through the initializer, tasks only carry tile bounds
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(state,)) as pool:
+                chunksize = max(1, len(tiles) // (4 * self.workers))
+                self._assemble(tiles, pool.map(_worker_tile, tiles, chunksize=chunksize), depth, ids, color)
+        return RayCastImage(depth, ids, color, time.perf_counter() - start)
+
+    def _assemble(self, tiles:list, results, depth:np.ndarray, ids:np.ndarray, color:np.ndarray):
+        for (y0, y1, x0, x1), (tile_depth, tile_ids, tile_color) in zip(tiles, results):
+            depth[y0:y1, x0:x1] = tile_depth
+            ids[y0:y1, x0:x1] = tile_ids
+            color[y0:y1, x0:x1] = tile_color
+
+
+_worker_state = None
+
+
+def _init_worker(state:tuple):
+    global _worker_state
+    _worker_state = state
+
+
+def _worker_tile(tile:tuple) -> tuple:
+    return _cast_tile(_worker_state, tile)
+
+
+def _cast_tile(state:tuple, tile:tuple) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """depth, ids and color of the pixels rows y0:y1, columns x0:x1"""
+    items, view, projection, width, height, shading, ambient = state
+    y0, y1, x0, x1 = tile
+    origins, directions = gen_rays(view, projection, width, height, slice(y0, y1), slice(x0, x1))
+    origins, directions = origins.reshape(-1, 3), directions.reshape(-1, 3)
+
+    best = np.ones(len(origins)) # the far plane
+    ids = np.full(len(origins), -1, dtype=np.int64)
+    color = np.zeros((len(origins), 3), dtype=np.float32)
+    for id, bvh, colors, world, inverse, box_min, box_max in items:
+        rays = np.flatnonzero(_rays_hit_box(origins, directions, box_min, box_max, best))
+        if len(rays) == 0:
+            continue
+        # object space rays keep the world t, the direction is not renormalized
+        local_origins = origins[rays] @ inverse[:3, :3] + inverse[3, :3]
+        local_directions = directions[rays] @ inverse[:3, :3]
+        t, triangle, u, v = bvh.intersect_rays(local_origins, local_directions, best[rays])
+        hit = triangle >= 0
+        if not hit.any():
+            continue
+        rays, triangle, u, v = rays[hit], bvh.triangles[triangle[hit]], u[hit, None], v[hit, None]
+        best[rays] = t[hit]
+        ids[rays] = id
+
+        rgb = colors[triangle[:, 0]] * (1 - u - v) + colors[triangle[:, 1]] * u + colors[triangle[:, 2]] * v
+        if shading:
+            corners = bvh.positions[triangle] @ world[:3, :3]
+            normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+            d = directions[rays]
+            facing = np.abs(np.einsum('ij,ij->i', normals, d)) / (np.linalg.norm(normals, axis=1) * np.linalg.norm(d, axis=1))
+            rgb = rgb * (ambient + (1 - ambient) * np.nan_to_num(facing))[:, None]
+        color[rays] = rgb
+
+    # window depth of the hit points, clip = [p, 1] @ view @ projection
+    depth = np.ones(len(origins), dtype=np.float32)
+    hit = np.flatnonzero(ids >= 0)
+    points = origins[hit] + directions[hit] * best[hit, None]
+    clip = np.concatenate((points, np.ones((len(hit), 1))), axis=1) @ view @ projection
+    depth[hit] = (clip[:, 2] / clip[:, 3] + 1) / 2
+
+    shape = (y1 - y0, x1 - x0)
+    return depth.reshape(shape), ids.reshape(shape), color.reshape(shape + (3,))
+
+
+def _rays_hit_box(origins:np.ndarray, directions:np.ndarray, box_min:np.ndarray, box_max:np.ndarray, t_max:np.ndarray) -> np.ndarray:
+    """slab test of k rays against one box, only the part of each ray up to t_max counts"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (box_min - origins) / directions
+        t2 = (box_max - origins) / directions
+    low, high = np.fmin(t1, t2), np.fmax(t1, t2)
+    near = np.fmax(np.fmax(low[:, 0], low[:, 1]), low[:, 2])
+    far = np.fmin(np.fmin(high[:, 0], high[:, 1]), high[:, 2])
+    return (near <= far) & (far >= 0) & (near <= t_max)
+
+
+if __name__ == "__main__":
+    import argparse
+    import pyrr
+    from camera import Camera
+    from loader import read_mesh
+    from vector import Transform, TransformStore
+
+    parser = argparse.ArgumentParser(description="render a mesh file on the cpu with the viewer's default camera")
+    parser.add_argument("path", help="OBJ, PLY or STL file")
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 700), metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--workers", type=int, help="processes, default one per cpu")
+    parser.add_argument("--output", default="preview.npz", help="npz file with depth, ids and color")
+    args = parser.parse_args()
+
+    vertices, indices = read_mesh(args.path)
+    store = TransformStore()
+    row = store.add(Transform())
+    width, height = args.size
+    # the Renderer's projection
+    projection = pyrr.matrix44.create_perspective_projection_matrix(fovy=45, aspect=width / height, near=0.1, far=20, dtype=np.float32)
+
+    caster = RayCaster(workers=args.workers)
+    caster.add(0, vertices, indices, store.model_matrices([row])[0])
+    image = caster.render(Camera().view_matrix(), projection, width, height)
+    np.savez_compressed(args.output, depth=image.depth, ids=image.ids, color=image.color)
+    print(f"{width}x{height} in {image.seconds:.3f} s ({image.rays_per_second() / 1e6:.2f} M rays/s), {np.count_nonzero(image.ids >= 0)} pixels hit")
@@ -0,0 +1,66 @@
+import json
+import time
+import pygame as pg
+
+# pygame event stream recording for replaying interactive sessions (see Renderer.replay)
+# one json object per line: {"frame", "t", "type", "mods", "attrs"}
+
+RECORDED_EVENTS = (pg.QUIT, pg.MOUSEMOTION, pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.MOUSEWHEEL,
+                   pg.KEYDOWN, pg.KEYUP, pg.VIDEORESIZE)
+
+
+class EventRecorder:
+    """Appends the events the Renderer handles to a json lines file, with the frame they arrived in,
+    the time since recording started and the keyboard modifiers held (handlers read pg.key.get_mods)"""
+
+    def __init__(self, path:str):
+        self.path = path
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+        self.count = 0
+
+    def record(self, event:pg.event.Event, frame:int):
+        if event.type not in RECORDED_EVENTS:
+            return None
+        # only plain values, e.g. the window object some events carry is dropped
+        attrs = {key: value for key, value in event.dict.items() if isinstance(value, (int, float, str, bool, tuple, list))}
+        line = {"frame": frame, "t": round(time.perf_counter() - self.start, 6), "type": event.type,
+                "mods": pg.key.get_mods(), "attrs": attrs}
+        self.file.write(json.dumps(line) + '\n')
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        print(f'Recorded {self.count} events to {self.path}')
+
+
+class RecordedEvent:
+    """An event read back from a recording"""
+    __slots__ = ("frame", "t", "mods", "event")
+
+    def __init__(self, frame:int, t:float, mods:int, event:pg.event.Event):
+        self.frame = frame
+        self.t = t
+        self.mods = mods
+        self.event = event
+
+
+def load_recording(path:str) -> list[list[RecordedEvent]]:
+    """read a recording, returns the events grouped per recorded frame (frames without events are empty lists)"""
+    events = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            # json turns tuples (pos, rel, buttons, size) into lists
+            attrs = {key: tuple(value) if isinstance(value, list) else value for key, value in data["attrs"].items()}
+            events.append(RecordedEvent(data["frame"], data["t"], data["mods"], pg.event.Event(data["type"], attrs)))
+
+    if not events:
+        return []
+    first = events[0].frame
+    frames = [[] for _ in range(events[-1].frame - first + 1)]
+    for recorded in events:
+        frames[recorded.frame - first].append(recorded)
+    return frames
@@ -0,0 +1,96 @@
+# handle based storage of the meshes of a MeshManager, GL free.
+#
+# a handle packs a slot index and the generation of the slot: removing an item frees its slot and bumps the
+# generation, so the slot is reused by the next add while handles to the removed item stay detectably stale.
+# items live densely in `items` (swap-and-pop on removal) for iteration in one contiguous pass
+
+SLOT_BITS = 20 # up to ~1M live items
+GENERATION_BITS = 11 # a slot is reused 2048 times before a handle could repeat, handles stay below 2**31
+SLOT_MASK = (1 << SLOT_BITS) - 1
+GENERATION_MASK = (1 << GENERATION_BITS) - 1
+
+
+def make_handle(slot:int, generation:int) -> int:
+    return (generation << SLOT_BITS) | slot
+
+
+def handle_slot(handle:int) -> int:
+    return handle & SLOT_MASK
+
+
+def handle_generation(handle:int) -> int:
+    return handle >> SLOT_BITS
+
+
+class Registry:
+    """Items addressed by generational handles with O(1) add, lookup and swap-and-pop removal.
+
+    items is the dense list in storage order, removal moves the last item into the freed position (the same
+    move TransformStore.remove makes, so parallel rows stay aligned when both are updated together)"""
+
+    def __init__(self):
+        self.items:list = [] # dense, position -> item
+        self.handles:list[int] = [] # dense, position -> handle
+        self.generations:list[int] = [] # slot -> current generation
+        self.positions:list[int] = [] # slot -> dense position, -1 when free
+        self.free:list[int] = [] # free slots, reused last in first out
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __contains__(self, handle) -> bool:
+        return self.position(handle) is not None
+
+    def add(self, item) -> int:
+        """store item, returns its handle"""
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = len(self.generations)
+            if slot > SLOT_MASK:
+                raise OverflowError(f"registry is full ({SLOT_MASK + 1} items)")
+            self.generations.append(0)
+            self.positions.append(-1)
+
+        handle = make_handle(slot, self.generations[slot])
+        self.positions[slot] = len(self.items)
+        self.items.append(item)
+        self.handles.append(handle)
+        return handle
+
+    def position(self, handle) -> int:
+        """dense position of a live handle, None for stale or unknown handles"""
+        if handle is None:
+            return None
+        slot = handle_slot(handle)
+        if slot >= len(self.generations) or self.generations[slot] != handle_generation(handle):
+            return None
+        position = self.positions[slot]
+        return position if position >= 0 else None
+
+    def get(self, handle):
+        """item of a live handle, None for stale or unknown handles"""
+        position = self.position(handle)
+        return self.items[position] if position is not None else None
+
+    def remove(self, handle):
+        """remove and return the item of handle, the last item moves into its position"""
+        position = self.position(handle)
+        if position is None:
+            raise KeyError(f"stale or unknown handle {handle}")
+        item, last = self.items[position], len(self.items) - 1
+        if position != last:
+            self.items[position] = self.items[last]
+            self.handles[position] = self.handles[last]
+            self.positions[handle_slot(self.handles[position])] = position
+        self.items.pop()
+        self.handles.pop()
+
+        slot = handle_slot(handle)
+        self.positions[slot] = -1
+        self.generations[slot] = (self.generations[slot] + 1) & GENERATION_MASK
+        self.free.append(slot)
+        return item
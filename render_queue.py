@@ -0,0 +1,150 @@
+from gl import *
+
+# passes draw in this order, overlays after the meshes they decorate
+PASS_MESH = 0
+PASS_HIGHLIGHT = 1
+PASS_WIREFRAME = 2
+PASS_POINTS = 3
+
+
+class DrawPacket:
+    """Everything needed to issue one draw: program, VAO, primitive mode, index count, fixed function state
+    (line width / point size) and the model matrix. A packet with draw set calls it instead (for meshes
+    that manage their own buffers), the program is bound and the model uploaded before. condition is an
+    occlusion query, the draw is discarded by the gpu when its samples did not pass"""
+    __slots__ = ("pass_", "program", "vao", "mode", "count", "location", "model", "owner", "line", "point", "draw", "condition")
+
+    def __init__(self, pass_:int, program, vao, mode, count:int, location, model, owner, line:float=1, point:float=1, draw=None, condition=None):
+        self.pass_ = pass_
+        self.program = program
+        self.vao = vao
+        self.mode = mode
+        self.count = count
+        self.location = location
+        self.model = model
+        self.owner = owner # mesh whose model matrix this is
+        self.line = line
+        self.point = point
+        self.draw = draw
+        self.condition = condition
+
+    def key(self) -> tuple:
+        """sort key, the most expensive state changes vary slowest"""
+        return (self.pass_, int(self.program), self.line, self.point, int(self.vao))
+
+
+class GLState:
+    """Shadow of the GL state the queue touches, changes equal to the current value are skipped"""
+
+    COUNTERS = ("programs", "vaos", "line_widths", "point_sizes", "models", "draws", "conditional", "skipped")
+
+    def __init__(self):
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+        self.invalidate()
+
+    def invalidate(self):
+        """forget the tracked values, after code outside the queue changed GL state"""
+        self.program = self.vao = self.line = self.point = None
+        self.model_owner = None # (program, mesh) whose model matrix is in the uniform
+
+    def reset_counts(self):
+        self.counts = dict.fromkeys(self.COUNTERS, 0)
+
+    def use_program(self, program):
+        if program == self.program:
+            self.counts["skipped"] += 1
+            return None
+        glUseProgram(program)
+        self.program = program
+        self.model_owner = None
+        self.counts["programs"] += 1
+
+    def bind_vao(self, vao):
+        if vao == self.vao:
+            self.counts["skipped"] += 1
+            return None
+        glBindVertexArray(vao)
+        self.vao = vao
+        self.counts["vaos"] += 1
+
+    def line_width(self, width:float):
+        if width == self.line:
+            self.counts["skipped"] += 1
+            return None
+        glLineWidth(width)
+        self.line = width
+        self.counts["line_widths"] += 1
+
+    def point_size(self, size:float):
+        if size == self.point:
+            self.counts["skipped"] += 1
+            return None
+        glPointSize(size)
+        self.point = size
+        self.counts["point_sizes"] += 1
+
+    def model(self, location, model, owner):
+        if (self.program, owner) == self.model_owner:
+            self.counts["skipped"] += 1
+            return None
+        glUniformMatrix4fv(location, 1, GL_FALSE, model)
+        self.model_owner = (self.program, owner)
+        self.counts["models"] += 1
+
+
+class RenderQueue:
+    """Collects draw packets for a frame, sorts them by state and issues them with redundant changes removed.
+    stats holds the counts of the last flushed frame"""
+
+    def __init__(self):
+        self.packets:list[DrawPacket] = []
+        self.state = GLState()
+        self.stats = {}
+
+    def begin_frame(self):
+        self.packets = []
+        # gui, picking and other passes change state between frames
+        self.state.invalidate()
+        self.state.reset_counts()
+        self.stats = {}
+
+    def submit(self, packet:DrawPacket):
+        self.packets.append(packet)
+
+    def flush(self, passes:tuple=None, presorted:bool=False):
+        """issue the queued packets, only those of the given passes when passes is set (the rest stay queued).
+        presorted packets were submitted in key order (see frame_pipeline), the sort is skipped"""
+        state = self.state
+        if passes is None:
+            batch, self.packets = self.packets, []
+        else:
+            batch = [packet for packet in self.packets if packet.pass_ in passes]
+            self.packets = [packet for packet in self.packets if packet.pass_ not in passes]
+        if not presorted:
+            batch.sort(key=DrawPacket.key)
+        for packet in batch:
+            state.use_program(packet.program)
+            state.model(packet.location, packet.model, packet.owner)
+            if packet.condition is not None:
+                # the query was issued this frame or earlier, the gpu waits for it, the cpu does not
+                glBeginConditionalRender(packet.condition, GL_QUERY_WAIT)
+                state.counts["conditional"] += 1
+
+            if packet.draw is not None:
+                packet.draw()
+                # custom draws bind their own objects
+                state.invalidate()
+            else:
+                state.bind_vao(packet.vao)
+                if packet.mode in (GL_LINES, GL_LINE_STRIP, GL_LINE_LOOP):
+                    state.line_width(packet.line)
+                elif packet.mode == GL_POINTS:
+                    state.point_size(packet.point)
+                glDrawElements(packet.mode, packet.count, GL_UNSIGNED_INT, ctypes.c_void_p(0))
+            state.counts["draws"] += 1
+
+            if packet.condition is not None:
+                glEndConditionalRender()
+
+        # counts accumulate over the flushes of a frame
+        self.stats = dict(state.counts, packets=self.stats.get("packets", 0) + len(batch))
@@ -0,0 +1,143 @@
+import ctypes
+from gl import *
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v as raw_glGetQueryObjectui64v
+from resources import tracker
+
+
+class ScaleController:
+    """Picks the render scale from measured gpu frame times: pixel cost grows with the area, so the scale
+    moves by sqrt(budget / time). Times are smoothed and the scale changes in steps with a dead band
+    so it does not oscillate"""
+
+    def __init__(self, budget_ms:float=16.6, min_scale:float=0.4, max_scale:float=1.0, step:float=0.05, tolerance:float=0.1, smoothing:float=0.2):
+        self.budget_ms = budget_ms
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.step = step
+        self.tolerance = tolerance # no change while within budget * (1 +- tolerance)
+        self.smoothing = smoothing
+        self.scale = max_scale
+        self.gpu_ms = None # smoothed measurement
+
+    def update(self, gpu_ms:float) -> float:
+        """feed one measured frame time, returns the scale for the next frames"""
+        self.gpu_ms = gpu_ms if self.gpu_ms is None else self.gpu_ms + (gpu_ms - self.gpu_ms) * self.smoothing
+        ratio = self.gpu_ms / self.budget_ms
+        if 1 - self.tolerance <= ratio <= 1 + self.tolerance:
+            return self.scale
+        # the time measured was spent at the current scale
+        wanted = self.scale / ratio ** 0.5
+        wanted = round(wanted / self.step) * self.step
+        wanted = min(max(wanted, self.min_scale), self.max_scale)
+        if wanted != self.scale:
+            # older measurements were taken at the previous scale
+            self.scale, self.gpu_ms = wanted, None
+        return self.scale
+
+
+class DynamicResolution:
+    """Renders the scene into an offscreen framebuffer at a fraction of the window size and upscales it.
+
+    The attachments are allocated at window size once and the scaled image uses a corner of them, so a
+    scale change costs nothing. The scene pass is timed with GL_TIME_ELAPSED queries, read back a few frames
+    later without waiting, and fed to the ScaleController. After end() the scaled depth is blitted too, so
+    overlays drawn afterwards at native resolution are still depth tested against the scene"""
+
+    def __init__(self, budget_ms:float=16.6, min_scale:float=0.4, queries:int=3):
+        self.controller = ScaleController(budget_ms, min_scale)
+        self.width, self.height = 0, 0 # allocated attachment size
+        self.window = (0, 0)
+        self.viewport = (0, 0) # scaled size of the current frame
+
+        self.fbo = glGenFramebuffers(1)
+        self.color = glGenRenderbuffers(1)
+        self.depth = glGenRenderbuffers(1)
+        tracker.track('framebuffer', self.fbo, owner=self)
+        tracker.track('renderbuffer', self.color, owner=self)
+        tracker.track('renderbuffer', self.depth, owner=self)
+
+        # ring of timer queries, a query is only read once its result is available
+        # glGenQueries returns an array of names, GL calls need them as ints
+        self.queries = [int(query) for query in glGenQueries(queries)]
+        self.in_flight = []
+        self.result = ctypes.c_uint64()
+        self.next_query = 0
+        self.timing = False
+        self.active = False # between begin and end
+
+    @property
+    def scale(self) -> float:
+        return self.controller.scale
+
+    def begin(self, width:int, height:int):
+        """bind the offscreen framebuffer at the current scale, draw the scene after this"""
+        self._collect()
+        self.window = (width, height)
+        self._resize(width, height)
+        scale = self.controller.scale
+        self.viewport = (max(int(width * scale), 1), max(int(height * scale), 1))
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, *self.viewport)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.active = True
+
+        # skip timing this frame when every query is still in flight
+        self.timing = len(self.in_flight) < len(self.queries)
+        if self.timing:
+            query = self.queries[self.next_query]
+            self.next_query = (self.next_query + 1) % len(self.queries)
+            glBeginQuery(GL_TIME_ELAPSED, query)
+            self.in_flight.append(query)
+
+    def end(self):
+        """upscale color and depth to the window, native resolution drawing can follow"""
+        if self.timing:
+            glEndQuery(GL_TIME_ELAPSED)
+
+        width, height = self.window
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.fbo)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBlitFramebuffer(0, 0, *self.viewport, 0, 0, width, height, GL_COLOR_BUFFER_BIT, GL_LINEAR)
+        # depth can only be blitted with nearest filtering
+        glBlitFramebuffer(0, 0, *self.viewport, 0, 0, width, height, GL_DEPTH_BUFFER_BIT, GL_NEAREST)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glViewport(0, 0, width, height)
+        self.active = False
+
+    def destroy(self):
+        glDeleteQueries(len(self.queries), self.queries)
+        glDeleteRenderbuffers(2, (self.color, self.depth))
+        glDeleteFramebuffers(1, (self.fbo,))
+        tracker.release('renderbuffer', self.color, self.depth)
+        tracker.release('framebuffer', self.fbo)
+
+    def _collect(self):
+        """feed finished timer queries to the controller, oldest first"""
+        while self.in_flight:
+            query = self.in_flight[0]
+            if not glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                break
+            self.in_flight.pop(0)
+            # the wrapped glGetQueryObjectui64v can not size its 64 bit output, the raw call writes into result
+            raw_glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(self.result))
+            self.controller.update(self.result.value / 1e6)
+
+    def _resize(self, width:int, height:int):
+        if width <= self.width and height <= self.height:
+            return None
+        self.width, self.height = max(width, self.width), max(height, self.height)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, self.width, self.height)
+        # same format as the default framebuffer's depth (requested in Renderer), depth blits need it
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, self.width, self.height)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        tracker.resize('renderbuffer', self.color, self.width * self.height * 4)
+        tracker.resize('renderbuffer', self.depth, self.width * self.height * 4)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+# bookkeeping of GL objects, GL free: creators register what they allocate (with its size and owner)
+# and unregister on delete, whatever is still registered after shutdown leaked
+
+
+class Resource:
+    """A registered GL object: kind ('vao', 'buffer', 'program', 'framebuffer', 'renderbuffer'), handle,
+    gpu bytes, owning object (a mesh, an overlay or a manager) and a label, the owner's class name by default"""
+    __slots__ = ("kind", "handle", "nbytes", "owner", "label")
+
+    def __init__(self, kind:str, handle:int, nbytes:int, owner, label:str):
+        self.kind = kind
+        self.handle = handle
+        self.nbytes = nbytes
+        self.owner = owner
+        self.label = label
+
+    @property
+    def mesh_id(self):
+        """id of the mesh the resource belongs to, overlays point at their mesh through .parent"""
+        mesh = getattr(self.owner, "parent", None) or self.owner
+        return getattr(mesh, "id", None)
+
+    def __repr__(self):
+        return f"{self.label} {self.kind} {self.handle} ({self.nbytes} bytes, mesh {self.mesh_id})"
+
+
+class ResourceTracker:
+    """Registry of live GL objects for memory reports and leak checks"""
+
+    def __init__(self):
+        self.resources:dict[tuple, Resource] = {} # (kind, handle) -> Resource
+        self.created = 0
+        self.released = 0
+
+    def track(self, kind:str, handle, nbytes:int=0, owner=None, label:str=None):
+        handle = int(handle)
+        label = label if label is not None else type(owner).__name__
+        self.resources[(kind, handle)] = Resource(kind, handle, int(nbytes), owner, label)
+        self.created += 1
+
+    def resize(self, kind:str, handle, nbytes:int):
+        """storage of a tracked object was reallocated"""
+        resource = self.resources.get((kind, int(handle)))
+        if resource is not None:
+            resource.nbytes = int(nbytes)
+
+    def release(self, kind:str, *handles):
+        for handle in handles:
+            if self.resources.pop((kind, int(handle)), None) is not None:
+                self.released += 1
+
+    @property
+    def gpu_bytes(self) -> int:
+        return sum(resource.nbytes for resource in self.resources.values())
+
+    def report(self) -> dict:
+        """{mesh id (None for renderer owned objects): {label: {"objects", "gpu_bytes", "host_bytes"}}}
+        host bytes are the vertex and index arrays the owners keep in memory"""
+        report = defaultdict(lambda: defaultdict(lambda: {"objects": 0, "gpu_bytes": 0, "host_bytes": 0}))
+        owners = {}
+        for resource in self.resources.values():
+            entry = report[resource.mesh_id][resource.label]
+            entry["objects"] += 1
+            entry["gpu_bytes"] += resource.nbytes
+            owners[id(resource.owner)] = (resource.owner, entry)
+
+        for owner, entry in owners.values():
+            entry["host_bytes"] += sum(getattr(getattr(owner, name, None), "nbytes", 0) for name in ("vertices", "indices"))
+        return {mesh: dict(labels) for mesh, labels in report.items()}
+
+    def summary(self) -> str:
+        lines = [f"{len(self.resources)} GL objects, {self.gpu_bytes / (1 << 20):.2f} MiB"]
+        for mesh, labels in self.report().items():
+            lines.append(f"mesh {mesh}:" if mesh is not None else "renderer:")
+            for label, entry in labels.items():
+                lines.append(f"  {label}: {entry['objects']} objects, gpu {entry['gpu_bytes']} bytes, host {entry['host_bytes']} bytes")
+        return "\n".join(lines)
+
+    def leaks(self) -> list[Resource]:
+        return list(self.resources.values())
+
+    def check_leaks(self) -> bool:
+        """print the objects still registered, call after everything was destroyed. returns True if clean"""
+        leaks = self.leaks()
+        if leaks:
+            print(f"Leaked {len(leaks)} GL objects:")
+            for resource in leaks:
+                print(f"  {resource}")
+        return not leaks
+
+
+# shared by every module that creates GL objects
+tracker = ResourceTracker()
@@ -0,0 +1,214 @@
+import numpy as np
+from vector import TransformStore
+from bounds import transform_aabbs
+
+
+class SceneNode:
+    """Node of the SceneGraph, wraps a Mesh and links it to its parent and children"""
+    __slots__ = ("graph", "mesh", "parent", "children", "index")
+
+    def __init__(self, graph, mesh, parent=None):
+        self.graph:SceneGraph = graph
+        self.mesh = mesh
+        self.parent:SceneNode = parent
+        self.children:list[SceneNode] = []
+        self.index:int = None # position in the graph's topological order
+
+    def world_matrix(self) -> np.ndarray:
+        return self.graph.world[self.index]
+
+
+class SceneGraph:
+    """Parent/child hierarchy over meshes with world matrices updated by dirty propagation.
+
+    Nodes are kept in topological (breadth first) order, every depth level is a contiguous slice so
+    the update pass walks the levels once and handles each level with vectorized numpy operations
+    """
+
+    def __init__(self, transforms:TransformStore):
+        self.transforms = transforms
+        self.roots:list[SceneNode] = []
+        self.nodes:list[SceneNode] = [] # topological order
+        self.structure_changed = False
+
+        self.parents = np.zeros(0, dtype=np.int64) # parent index of every node, -1 for roots
+        self.rows = np.zeros(0, dtype=np.int64) # transform store row of every node
+        self.levels:list[slice] = []
+
+        self.world = np.zeros((0, 4, 4), dtype=np.float32)
+        self.local_min = np.zeros((0, 3), dtype=np.float32) # object space bounds of each mesh
+        self.local_max = np.zeros((0, 3), dtype=np.float32)
+        self.world_min = np.zeros((0, 3), dtype=np.float32) # world space bounds of each mesh
+        self.world_max = np.zeros((0, 3), dtype=np.float32)
+        self.subtree_min = np.zeros((0, 3), dtype=np.float32) # world bounds of each node and its descendants
+        self.subtree_max = np.zeros((0, 3), dtype=np.float32)
+        self.changed = np.zeros(0, dtype=bool) # nodes whose world matrix changed in the last update
+        self.stale = np.zeros(0, dtype=bool) # nodes whose object space bounds changed, see refresh_bounds
+        self.version = 0 # bumped by every update that changed a world matrix, for caches of world and bounds
+
+    def add(self, mesh, parent=None) -> SceneNode:
+        """add mesh to the graph, under the node of parent mesh or as a root"""
+        node = SceneNode(self, mesh)
+        mesh.node = node
+        self._link(node, parent.node if parent is not None else None)
+        self.structure_changed = True
+        return node
+
+    def set_parent(self, mesh, parent=None):
+        """re-parent mesh (and its subtree) under parent mesh, None makes it a root"""
+        node = mesh.node
+        new_parent = parent.node if parent is not None else None
+        ancestor = new_parent
+        while ancestor is not None:
+            if ancestor is node:
+                raise ValueError("a mesh cannot be parented to its own descendant")
+            ancestor = ancestor.parent
+
+        self._unlink(node)
+        self._link(node, new_parent)
+        self.structure_changed = True
+
+    def remove(self, mesh):
+        """remove mesh from the graph, its children are attached to its parent"""
+        node = mesh.node
+        for child in list(node.children):
+            self._unlink(child)
+            self._link(child, node.parent)
+        self._unlink(node)
+        mesh.node = None
+        self.structure_changed = True
+
+    def world_matrix(self, mesh) -> np.ndarray:
+        return self.world[mesh.node.index]
+
+    def refresh_bounds(self, mesh):
+        """take the current object space bounds of mesh, its world and subtree bounds follow in the next update.
+        Cheaper than a structural change for meshes whose vertices grow or move every frame"""
+        node = mesh.node
+        if self.structure_changed or node.index is None:
+            # the rebuild reads every mesh's bounds anyway
+            return None
+        self.local_min[node.index], self.local_max[node.index] = self._mesh_bounds(mesh)
+        self.stale[node.index] = True
+
+    def update(self) -> np.ndarray:
+        """recompute world matrices of every node whose transform, or an ancestor's transform, changed.
+        returns the mask of updated nodes"""
+        force = self.structure_changed
+        if force:
+            self._rebuild()
+
+        dirty = self.transforms.dirty[self.rows] | self.stale
+        if force:
+            dirty[:] = True
+
+        # push dirty flags down, parents come before children so one pass over the levels is enough
+        for level in self.levels[1:]:
+            dirty[level] |= dirty[self.parents[level]]
+
+        if dirty.any():
+            # local matrices of the dirty nodes in one batch
+            local = np.empty((len(self.nodes), 4, 4), dtype=np.float32)
+            local[dirty] = self.transforms.model_matrices(self.rows[dirty])
+
+            for level in self.levels:
+                idx = np.flatnonzero(dirty[level]) + level.start
+                if len(idx) == 0:
+                    continue
+                parents = self.parents[idx]
+                world = local[idx]
+                has_parent = parents >= 0
+                # row vector convention, the child transform is applied before the parent's
+                world[has_parent] = world[has_parent] @ self.world[parents[has_parent]]
+                self.world[idx] = world
+
+            self._update_bounds(dirty)
+            self.version += 1
+
+        self.transforms.clear_dirty()
+        self.stale[:] = False
+        self.changed = dirty
+        return dirty
+
+    def query(self, test) -> list:
+        """return meshes whose world bounds pass test, whole branches are skipped when their subtree bounds fail.
+        test(mins (k, 3), maxs (k, 3)) -> bool mask (k,)"""
+        if self.structure_changed:
+            self.update()
+        alive = np.zeros(len(self.nodes), dtype=bool)
+        for i, level in enumerate(self.levels):
+            idx = np.arange(level.start, level.stop)
+            if i > 0:
+                idx = idx[alive[self.parents[idx]]]
+            if len(idx) == 0:
+                break
+            alive[idx] = test(self.subtree_min[idx], self.subtree_max[idx])
+
+        candidates = np.flatnonzero(alive)
+        hits = candidates[test(self.world_min[candidates], self.world_max[candidates])]
+        return [self.nodes[i].mesh for i in hits]
+
+    def _link(self, node:SceneNode, parent:SceneNode):
+        node.parent = parent
+        if parent is None:
+            self.roots.append(node)
+        else:
+            parent.children.append(node)
+
+    def _unlink(self, node:SceneNode):
+        if node.parent is None:
+            self.roots.remove(node)
+        else:
+            node.parent.children.remove(node)
+        node.parent = None
+
+    def _rebuild(self):
+        """rebuild topological order, levels and per node arrays after a structural change"""
+        nodes, levels = [], []
+        level = list(self.roots)
+        while level:
+            levels.append(slice(len(nodes), len(nodes) + len(level)))
+            nodes.extend(level)
+            level = [child for node in level for child in node.children]
+
+        for i, node in enumerate(nodes):
+            node.index = i
+
+        self.nodes, self.levels = nodes, levels
+        count = len(nodes)
+        self.parents = np.array([node.parent.index if node.parent is not None else -1 for node in nodes], dtype=np.int64)
+        self.rows = np.array([node.mesh.transform.row for node in nodes], dtype=np.int64)
+        self.world = np.zeros((count, 4, 4), dtype=np.float32)
+        self.local_min = np.zeros((count, 3), dtype=np.float32)
+        self.local_max = np.zeros((count, 3), dtype=np.float32)
+        for i, node in enumerate(nodes):
+            self.local_min[i], self.local_max[i] = self._mesh_bounds(node.mesh)
+        self.world_min = np.zeros((count, 3), dtype=np.float32)
+        self.world_max = np.zeros((count, 3), dtype=np.float32)
+        self.subtree_min = np.zeros((count, 3), dtype=np.float32)
+        self.subtree_max = np.zeros((count, 3), dtype=np.float32)
+        self.stale = np.zeros(count, dtype=bool)
+        self.structure_changed = False
+
+    def _mesh_bounds(self, mesh) -> tuple[np.ndarray, np.ndarray]:
+        # cached on the mesh, see bounds.Bounds
+        return mesh.bounds.min, mesh.bounds.max
+
+    def _update_bounds(self, dirty:np.ndarray):
+        """world bounds of dirty nodes, then subtree bounds aggregated bottom up"""
+        idx = np.flatnonzero(dirty)
+        self.world_min[idx], self.world_max[idx] = transform_aabbs(self.local_min[idx], self.local_max[idx], self.world[idx])
+
+        # a changed node changes the subtree bounds of all its ancestors
+        affected = dirty.copy()
+        for level in reversed(self.levels[1:]):
+            changed = np.flatnonzero(affected[level]) + level.start
+            affected[self.parents[changed]] = True
+
+        self.subtree_min[affected] = self.world_min[affected]
+        self.subtree_max[affected] = self.world_max[affected]
+        for level in reversed(self.levels[1:]):
+            # every child of an affected parent contributes, children are final before their parents
+            idx = np.flatnonzero(affected[self.parents[level]]) + level.start
+            np.minimum.at(self.subtree_min, self.parents[idx], self.subtree_min[idx])
+            np.maximum.at(self.subtree_max, self.parents[idx], self.subtree_max[idx])
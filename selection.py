@@ -0,0 +1,94 @@
+import numpy as np
+from scene import SceneGraph
+
+# marquee (box) selection, GL free. a screen rectangle becomes a sub-frustum: mesh bounds are tested
+# against its planes in bulk, then the vertices of the candidates are projected chunk by chunk
+
+
+class Selection:
+    """Result of a box selection: the meshes touched and, in vertex mode, the vertex indices
+    inside the rectangle per mesh id (sorted uint32 arrays)"""
+    __slots__ = ("meshes", "vertices")
+
+    def __init__(self, meshes:list=None, vertices:dict[int, np.ndarray]=None):
+        self.meshes = meshes if meshes is not None else []
+        self.vertices = vertices if vertices is not None else {}
+
+    @property
+    def vertex_count(self) -> int:
+        return sum(len(indices) for indices in self.vertices.values())
+
+    def __repr__(self):
+        return f"Selection({len(self.meshes)} meshes, {self.vertex_count} vertices)"
+
+
+def screen_rect_to_ndc(start:tuple, end:tuple, width:int, height:int) -> np.ndarray:
+    """two window corners in pixels (y down) to (xmin, ymin, xmax, ymax) in normalized device coordinates"""
+    (x0, y0), (x1, y1) = start, end
+    xs = np.array([x0, x1], dtype=np.float64) / width * 2 - 1
+    ys = 1 - np.array([y0, y1], dtype=np.float64) / height * 2
+    return np.array([xs.min(), ys.min(), xs.max(), ys.max()])
+
+
+def frustum_planes(view_projection:np.ndarray, rect:np.ndarray) -> np.ndarray:
+    """(6, 4) planes (normal, d) of the sub-frustum over rect, a point p is inside when p @ n + d >= 0 for all.
+    view_projection is view @ projection (row vector convention, clip = [p, 1] @ view_projection)"""
+    xmin, ymin, xmax, ymax = rect
+    x, y, z, w = (view_projection[:, i].astype(np.float64) for i in range(4))
+    return np.stack((
+        x - xmin * w, # right of the left edge
+        xmax * w - x,
+        y - ymin * w,
+        ymax * w - y,
+        z + w, # near
+        w - z, # far
+    ))
+
+
+def boxes_in_frustum(planes:np.ndarray, mins:np.ndarray, maxs:np.ndarray) -> np.ndarray:
+    """conservative test of (k, 3) boxes against the planes: a box is out when its corner farthest along
+    a plane normal is behind that plane"""
+    normals, d = planes[:, 0:3], planes[:, 3]
+    # (k, 6, 3) positive vertex of every box for every plane
+    corners = np.where(normals[None] >= 0, maxs[:, None], mins[:, None])
+    return (np.einsum('kpi,pi->kp', corners, normals) + d >= 0).all(axis=1)
+
+
+def vertices_in_rect(vertices:np.ndarray, model:np.ndarray, view_projection:np.ndarray, rect:np.ndarray,
+                     chunk:int=1 << 21, first_only:bool=False) -> np.ndarray:
+    """indices (uint32) of the vertices whose projection falls in rect and inside the depth range.
+    one float32 matrix product per chunk, first_only stops at the first chunk with a hit"""
+    mvp = (model @ view_projection).astype(np.float32)
+    linear, offset = mvp[:3], mvp[3]
+    xmin, ymin, xmax, ymax = rect
+    found = []
+    for start in range(0, len(vertices), chunk):
+        clip = np.asarray(vertices[start:start + chunk, 0:3], dtype=np.float32) @ linear
+        clip += offset
+        x, y, z, w = clip[:, 0], clip[:, 1], clip[:, 2], clip[:, 3]
+        # compare in clip space, no divide by w
+        inside = (x >= xmin * w) & (x <= xmax * w) & (y >= ymin * w) & (y <= ymax * w) & (z >= -w) & (z <= w)
+        hits = np.flatnonzero(inside)
+        if len(hits):
+            found.append((hits + start).astype(np.uint32))
+            if first_only:
+                break
+    return np.concatenate(found) if found else np.zeros(0, dtype=np.uint32)
+
+
+def box_select(scene:SceneGraph, view:np.ndarray, projection:np.ndarray, rect:np.ndarray, vertices:bool=False) -> Selection:
+    """select the meshes (vertices=False) or vertices (vertices=True) inside the ndc rect.
+    a mesh is selected when at least one of its vertices projects inside the rectangle"""
+    view_projection = view.astype(np.float64) @ projection.astype(np.float64)
+    planes = frustum_planes(view_projection, rect)
+    selection = Selection()
+    for mesh in scene.query(lambda mins, maxs: boxes_in_frustum(planes, mins, maxs)):
+        if not mesh.ready:
+            continue
+        indices = vertices_in_rect(mesh.vertices, scene.world_matrix(mesh), view_projection, rect, first_only=not vertices)
+        if len(indices) == 0:
+            continue
+        selection.meshes.append(mesh)
+        if vertices:
+            selection.vertices[mesh.id] = indices
+    return selection
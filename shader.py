@@ -0,0 +1,165 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from gl import *
+from resources import tracker
+from OpenGL.GL.shaders import ShaderProgram, ShaderLinkError, compileProgram, compileShader
+
+
+class ProgramManager:
+    """ Loads shader programs, caching linked binaries on disk and sharing the camera uniform block """
+
+    CAMERA_BINDING = 0 # uniform buffer binding point of the Camera block
+
+    def __init__(self, cache_dir:str=".shader_cache"):
+        self.cache_dir = cache_dir
+        self.programs = {} # (vertex path, fragment path) -> program
+        self.locations = {} # program -> {uniform name: location}
+
+        # binaries are only valid for the driver that produced them
+        self.driver = b"|".join(glGetString(name) or b"" for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
+        self.binary_support = glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0
+
+        # camera uniform buffer (std140: mat4 view, mat4 projection)
+        self.view = np.identity(4, dtype=np.float32)
+        self.projection = np.identity(4, dtype=np.float32)
+        self.camera_dirty = True
+        self.camera_ubo = glGenBuffers(1)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.camera_ubo)
+        glBufferData(GL_UNIFORM_BUFFER, 128, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.CAMERA_BINDING, self.camera_ubo)
+        tracker.track('buffer', self.camera_ubo, 128, owner=self, label='camera ubo')
+
+    def load(self, vertexFilepath:str, fragmentFilepath:str):
+        """return a linked program for the given shader files, from memory, the disk cache or by compiling"""
+        key = (vertexFilepath, fragmentFilepath)
+        if key in self.programs:
+            return self.programs[key]
+
+        with open(vertexFilepath, 'r') as f:
+            vertex_src = f.read()
+
+        with open(fragmentFilepath, 'r') as f:
+            fragment_src = f.read()
+
+        digest = hashlib.sha1(b"\0".join((vertex_src.encode(), fragment_src.encode(), self.driver))).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{digest}.bin")
+
+        program = self._load_binary(cache_path)
+        if program is None:
+            program = compileProgram(
+                compileShader(vertex_src, GL_VERTEX_SHADER),
+                compileShader(fragment_src, GL_FRAGMENT_SHADER),
+                retrievable=self.binary_support
+            )
+            self._save_binary(program, cache_path)
+
+        # bind the shared camera block if the program declares it
+        block = glGetUniformBlockIndex(program, "Camera")
+        if block != GL_INVALID_INDEX:
+            glUniformBlockBinding(program, block, self.CAMERA_BINDING)
+
+        self.programs[key] = program
+        self.locations[program] = {}
+        tracker.track('program', program, owner=self, label=os.path.basename(vertexFilepath))
+        return program
+
+    def load_compute(self, computeFilepath:str):
+        """return a linked compute program (GL 4.3), cached like load"""
+        key = (computeFilepath,)
+        if key in self.programs:
+            return self.programs[key]
+
+        with open(computeFilepath, 'r') as f:
+            compute_src = f.read()
+
+        digest = hashlib.sha1(b"\0".join((compute_src.encode(), self.driver))).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{digest}.bin")
+
+        program = self._load_binary(cache_path)
+        if program is None:
+            program = compileProgram(compileShader(compute_src, GL_COMPUTE_SHADER), retrievable=self.binary_support)
+            self._save_binary(program, cache_path)
+
+        self.programs[key] = program
+        self.locations[program] = {}
+        tracker.track('program', program, owner=self, label=os.path.basename(computeFilepath))
+        return program
+
+    def uniform_location(self, program, name:str) -> int:
+        """get (and cache) the location of a uniform in program"""
+        locations = self.locations[program]
+        if name not in locations:
+            locations[name] = glGetUniformLocation(program, name)
+        return locations[name]
+
+    def set_camera(self, view:np.ndarray=None, projection:np.ndarray=None):
+        """stage new view and/or projection matrices, uploaded by update_camera"""
+        if view is not None:
+            self.view = view
+        if projection is not None:
+            self.projection = projection
+        self.camera_dirty = True
+
+    def update_camera(self):
+        """upload staged camera matrices to the uniform buffer, at most once per change"""
+        if not self.camera_dirty:
+            return None
+        self.upload_camera(self.view, self.projection)
+        self.camera_dirty = False
+
+    def upload_camera(self, view:np.ndarray, projection:np.ndarray):
+        """upload the given matrices instead of the staged ones, for frames prepared on another thread (see
+        frame_pipeline) where the staged matrices may already belong to the next frame"""
+        data = np.concatenate((view, projection)).astype(np.float32)
+        glBindBuffer(GL_UNIFORM_BUFFER, self.camera_ubo)
+        glBufferSubData(GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def destroy(self):
+        for program in self.programs.values():
+            glDeleteProgram(program)
+            tracker.release('program', program)
+        glDeleteBuffers(1, (self.camera_ubo,))
+        tracker.release('buffer', self.camera_ubo)
+        self.programs = {}
+        self.locations = {}
+
+    def _load_binary(self, cache_path:str):
+        """link program from a cached binary, returns None on a cache miss or a rejected binary"""
+        if not self.binary_support or not os.path.exists(cache_path):
+            return None
+
+        with open(cache_path, 'rb') as f:
+            data = f.read()
+        binary_format = int.from_bytes(data[:4], 'little')
+        binary = np.frombuffer(data[4:], dtype=np.uint8)
+
+        program = ShaderProgram(glCreateProgram())
+        try:
+            program.load(binary_format, binary, validate=False)
+        except (ShaderLinkError, GLError):
+            # driver refused the binary (eg. after an update) or glProgramBinary rejected its format,
+            # compile from source instead
+            glDeleteProgram(program)
+            return None
+        return program
+
+    def _save_binary(self, program, cache_path:str):
+        if not self.binary_support:
+            return None
+        binary_format, binary = program.retrieve()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # written next to the cache file and renamed over it, a crash or a concurrent
+        # instance never leaves a half written binary behind
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(int(binary_format).to_bytes(4, 'little'))
+                f.write(np.asarray(binary).tobytes())
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
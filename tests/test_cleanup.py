@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from cleanup import (CleanupStage, CompactVertices, FixWinding, RemoveDegenerateTriangles,
+                     RemoveDuplicateTriangles, WeldVertices, default_pipeline)
+
+
+def vertices_of(positions) -> np.ndarray:
+    vertices = np.zeros((len(positions), 6), dtype=np.float32)
+    vertices[:, 0:3] = positions
+    vertices[:, 3] = np.arange(len(positions)) # tells the vertices apart after welding
+    return vertices
+
+
+def cube() -> tuple[np.ndarray, np.ndarray]:
+    """closed cube, every face wound counter clockwise seen from outside"""
+    positions = [(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)]
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    triangles = [(a, b, c) for a, b, c, d in quads] + [(a, c, d) for a, b, c, d in quads]
+    return vertices_of(positions), np.array(triangles, dtype=np.uint32).reshape(-1)
+
+
+def directed_edges(indices:np.ndarray) -> list[tuple]:
+    triangles = indices.reshape(-1, 3)
+    return [tuple(edge) for edge in triangles[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2).tolist()]
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 1 << 20])
+def test_weld_merges_close_vertices(chunk):
+    vertices = vertices_of([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1e-8, 0, 0), (1, 1e-8, 0)])
+    indices = np.array([0, 1, 2, 3, 4, 2], dtype=np.uint32)
+    welded, remapped, removed, fixed = WeldVertices(1e-6).run(vertices, indices, chunk)
+
+    assert (removed, fixed) == (2, 0)
+    np.testing.assert_array_equal(welded[:, 3], (0, 1, 2)) # first vertex of a cell wins, in order
+    np.testing.assert_array_equal(remapped, (0, 1, 2, 0, 1, 2))
+
+
+def test_degenerate_triangles():
+    vertices = vertices_of([(0, 0, 0), (1, 0, 0), (0, 1, 0), (2, 0, 0)])
+    # a good one, a repeated index, a zero area (collinear) one
+    indices = np.array([0, 1, 2, 0, 0, 1, 0, 1, 3], dtype=np.uint32)
+    _, kept, removed, _ = RemoveDegenerateTriangles().run(vertices, indices, 2)
+    assert removed == 2
+    np.testing.assert_array_equal(kept, (0, 1, 2))
+
+
+@pytest.mark.parametrize("vertex_count", [4, 1 << 21]) # packed keys and the uint32 rows past 21 bits
+def test_duplicate_triangles(vertex_count):
+    vertices = np.empty((vertex_count, 6), dtype=np.float32)
+    indices = np.array([0, 1, 2, 2, 0, 1, 1, 3, 2, 0, 2, 1, 3, 2, 1], dtype=np.uint32)
+    _, kept, removed, _ = RemoveDuplicateTriangles().run(vertices, indices, 2)
+    assert removed == 3
+    # the first of every set is kept, in input order
+    np.testing.assert_array_equal(kept, (0, 1, 2, 1, 3, 2))
+
+
+def test_compact_vertices():
+    vertices = vertices_of([(0, 0, 0), (9, 9, 9), (1, 0, 0), (0, 1, 0)])
+    indices = np.array([0, 2, 3], dtype=np.uint32)
+    compacted, remapped, removed, _ = CompactVertices().run(vertices, indices, 1)
+    assert removed == 1
+    np.testing.assert_array_equal(compacted[:, 3], (0, 2, 3))
+    np.testing.assert_array_equal(remapped, (0, 1, 2))
+
+
+@pytest.mark.parametrize("chunk", [1, 5, 1 << 20])
+def test_fix_winding_flips_the_minority(chunk):
+    vertices, indices = cube()
+    broken = indices.reshape(-1, 3).copy()
+    broken[[1, 8], 1], broken[[1, 8], 2] = broken[[1, 8], 2], broken[[1, 8], 1].copy()
+
+    _, fixed, removed, flipped = FixWinding().run(vertices, broken.reshape(-1), chunk)
+    assert (removed, flipped) == (0, 2)
+    np.testing.assert_array_equal(fixed, indices)
+    # closed and consistent: every edge is used once in each direction
+    edges = directed_edges(fixed)
+    assert len(set(edges)) == len(edges) == 36
+    assert all((b, a) in set(edges) for a, b in edges)
+
+
+def test_fix_winding_keeps_consistent_mesh():
+    vertices, indices = cube()
+    _, fixed, _, flipped = FixWinding().run(vertices, indices, 4)
+    assert flipped == 0
+    np.testing.assert_array_equal(fixed, indices)
+
+
+def test_default_pipeline():
+    vertices, indices = cube()
+    # split every corner of the cube into its own vertex, then add a duplicate and a degenerate triangle
+    corners = vertices[indices]
+    split = np.arange(len(corners), dtype=np.uint32)
+    split = np.concatenate((split, split[0:3], np.array([0, 0, 1], dtype=np.uint32)))
+
+    pipeline = default_pipeline(chunk=7)
+    cleaned, cleaned_indices = pipeline.run(corners, split)
+    assert len(cleaned) == 8
+    assert len(cleaned_indices) == 36
+    assert [report.name for report in pipeline.reports] == ["weld", "degenerate", "duplicates", "compact", "winding"]
+    assert [report.removed for report in pipeline.reports] == [28, 1, 1, 0, 0]
+
+
+def test_stage_is_abstract():
+    with pytest.raises(TypeError):
+        CleanupStage()
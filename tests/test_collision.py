@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from bounds import Bounds
+from collision import CollisionWorld, SweepAndPrune, triangles_intersect
+from scene import SceneGraph
+from vector import Transform, TransformStore
+
+
+def brute_force_pairs(mins:np.ndarray, maxs:np.ndarray) -> set:
+    n = len(mins)
+    return {(i, j) for i in range(n) for j in range(i + 1, n) if np.all((mins[i] <= maxs[j]) & (mins[j] <= maxs[i]))}
+
+
+def as_set(i:np.ndarray, j:np.ndarray) -> set:
+    return {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_sweep_and_prune_matches_brute_force():
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-10, 10, (300, 3))
+    sizes = rng.uniform(0.1, 1.5, (300, 3))
+    broadphase = SweepAndPrune()
+    for _ in range(5):
+        mins, maxs = centers - sizes, centers + sizes
+        assert as_set(*broadphase.pairs(mins, maxs)) == brute_force_pairs(mins, maxs)
+        # small moves, the kept order is nearly sorted
+        centers += rng.normal(0, 0.3, centers.shape)
+
+
+def test_sweep_and_prune_touching_and_tiny_inputs():
+    broadphase = SweepAndPrune()
+    mins = np.array([(0, 0, 0), (1, 0, 0), (2, 0, 0), (3.5, 0, 0)], dtype=np.float32)
+    maxs = mins + 1
+    assert as_set(*broadphase.pairs(mins, maxs)) == {(0, 1), (1, 2)}
+    assert as_set(*broadphase.pairs(mins[:1], maxs[:1])) == set()
+    assert as_set(*broadphase.pairs(mins[:0], maxs[:0])) == set()
+
+
+TRIANGLE = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0)], dtype=np.float64)
+
+CASES = [
+    # (b, intersecting)
+    (np.array([(0.2, 0.2, -1), (0.2, 0.2, 1), (0.3, 0.5, 0)]), True), # pierces a
+    (np.array([(0.2, 0.2, 0.5), (0.8, 0.2, 0.5), (0.2, 0.8, 0.5)]), False), # parallel above
+    (np.array([(2, 2, -1), (2, 2, 1), (3, 2, 0)]), False), # crosses the plane outside a
+    (np.array([(1, 0, 0), (2, 0, 1), (2, 1, -1)]), True), # shares a corner
+    (np.array([(0.5, 0.5, 0), (1.5, 0.5, 0), (0.5, 1.5, 0)]), True), # coplanar, overlapping
+    (np.array([(0.6, 0.6, 0), (1.6, 0.6, 0), (0.6, 1.6, 0)]), False), # coplanar, past the hypotenuse
+    (np.array([(0.1, 0.1, 0), (0.3, 0.1, 0), (0.1, 0.3, 0)]), True), # coplanar, inside
+]
+
+
+def test_triangles_intersect_cases():
+    b = np.array([case for case, _ in CASES], dtype=np.float64)
+    a = np.repeat(TRIANGLE[None], len(b), axis=0)
+    expected = [hit for _, hit in CASES]
+    assert triangles_intersect(a, b).tolist() == expected
+    # symmetric, and independent of the batch size
+    assert triangles_intersect(b, a, chunk=2).tolist() == expected
+
+
+def test_triangles_intersect_is_rigid_invariant():
+    rng = np.random.default_rng(1)
+    a = rng.uniform(-1, 1, (2000, 3, 3))
+    b = rng.uniform(-1, 1, (2000, 3, 3))
+    expected = triangles_intersect(a, b)
+    assert 0 < expected.sum() < len(a)
+
+    rotation, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    shift = rng.uniform(-100, 100, 3)
+    moved = triangles_intersect(a @ rotation + shift, b @ rotation + shift, chunk=333)
+    # only pairs within rounding of touching may change
+    assert (moved != expected).sum() <= 2
+
+
+class Body:
+    """the parts of a Mesh the collision world reads"""
+    mode = 0x0004
+    ready = True
+
+    def __init__(self, id:int, store:TransformStore, vertices:np.ndarray, indices:np.ndarray):
+        self.id = id
+        self.transform = Transform()
+        self.transform.scale.update(1.0, 1.0, 1.0)
+        store.add(self.transform)
+        self.vertices, self.indices = vertices, indices
+        self.bounds = Bounds(vertices[:, 0:3])
+        self.node = None
+
+
+def cube(size:float) -> tuple[np.ndarray, np.ndarray]:
+    corners = np.array([(x, y, z) for x in (-size, size) for y in (-size, size) for z in (-size, size)], dtype=np.float32)
+    vertices = np.zeros((8, 6), dtype=np.float32)
+    vertices[:, 0:3] = corners
+    quads = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    indices = np.array([(a, b, c) for a, b, c, d in quads] + [(a, c, d) for a, b, c, d in quads], dtype=np.uint32)
+    return vertices, indices.reshape(-1)
+
+
+@pytest.fixture
+def world():
+    store = TransformStore()
+    scene = SceneGraph(store)
+    big, small, far = Body(0, store, *cube(1.0)), Body(1, store, *cube(0.25)), Body(2, store, *cube(0.5))
+    far.transform.position.update(10.0, 0.0, 0.0)
+    for body in (big, small, far):
+        scene.add(body)
+    return CollisionWorld(scene), (big, small, far)
+
+
+def test_world_reports_started_and_stopped_pairs(world):
+    collisions, (big, small, far) = world
+    started, stopped = collisions.update()
+    assert started == [(big, small)] and stopped == []
+    assert collisions.update() == ([], []) # nothing moved
+
+    far.transform.position.update(1.2, 0.0, 0.0)
+    started, stopped = collisions.update()
+    assert started == [(big, far)] and stopped == []
+    small.transform.position.update(0.0, -5.0, 0.0)
+    started, stopped = collisions.update()
+    assert started == [] and stopped == [(big, small)]
+
+
+def test_narrow_phase_separates_nested_boxes(world):
+    collisions, (big, small, far) = world
+    # the small cube sits inside the big one: the boxes overlap, the surfaces do not
+    assert collisions.overlaps(big) == [small]
+    assert not collisions.intersects(big, small)
+    assert collisions.overlaps(big, narrow=True) == []
+
+    small.transform.position.update(1.0, 0.0, 0.0) # straddles a face
+    assert collisions.intersects(big, small)
+    assert collisions.overlaps(big, narrow=True) == [small]
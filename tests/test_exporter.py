@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from exporter import bake, export
+from loader import parse_obj_chunk, read_mesh
+
+
+def part(seed:int=0, count:int=40):
+    rng = np.random.default_rng(seed)
+    vertices = rng.random((count, 6)).astype(np.float32)
+    indices = rng.integers(0, count, 3 * count).astype(np.uint32)
+    world = np.identity(4)
+    world[3, :3] = (1.0, -2.0, 3.0)
+    world[:3, :3] *= 2.0
+    return vertices, indices, world
+
+
+@pytest.mark.parametrize("extension", ["obj", "ply"])
+def test_round_trip_keeps_positions_and_colors(tmp_path, extension):
+    first, second = part(0), part(1, count=25)
+    path = str(tmp_path / f"scene.{extension}")
+    result = export(path, [("first", *first), ("second", *second)])
+    assert (result.vertices, result.triangles) == (65, 65)
+
+    vertices, indices = read_mesh(path)
+    expected = np.concatenate((bake(first[0], first[2]), bake(second[0], second[2])))
+    np.testing.assert_allclose(vertices[:, 0:3], expected[:, 0:3], atol=1e-5)
+    # colors are written with 4 digits (obj) or as bytes (ply)
+    np.testing.assert_allclose(vertices[:, 3:6], expected[:, 3:6], atol=1 / 255)
+    np.testing.assert_array_equal(indices, np.concatenate((first[1], second[1] + 40)))
+
+
+def test_obj_colors_in_chunked_parse(tmp_path):
+    vertices, indices, world = part(2)
+    path = tmp_path / "colors.obj"
+    export(str(path), [("part", vertices, indices, world)])
+    parsed, triangles = parse_obj_chunk(path.read_bytes(), colors=True)
+    np.testing.assert_allclose(parsed[:, 3:6], vertices[:, 3:6], atol=1e-4)
+    np.testing.assert_array_equal(triangles.reshape(-1), indices)
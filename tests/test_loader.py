@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+from loader import parse_obj_chunk
+
+SQUARE = b"""# two triangles and a quad
+o square
+v 0 0 0
+v 1 0 0
+v 1 1 0
+v 0 1 0
+f 1 2 3
+f 1/1 3/3 4/4
+f 1//1 2//2 3//3 4//4
+"""
+
+
+def test_positions_and_faces():
+    positions, triangles = parse_obj_chunk(SQUARE)
+    assert positions.dtype == np.float32
+    np.testing.assert_array_equal(positions, [(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0)])
+    # texture / normal suffixes are dropped, the quad is fan triangulated
+    np.testing.assert_array_equal(triangles, [(0, 1, 2), (0, 2, 3), (0, 1, 2), (0, 2, 3)])
+
+
+def test_relative_indices_count_back_from_the_face_line():
+    data = b"""v 0 0 0
+v 1 0 0
+v 0 1 0
+f -3 -2 -1
+v 0 0 1
+v 1 0 1
+v 0 1 1
+f -3 -2 -1
+f 1 -1 -2
+"""
+    _, triangles = parse_obj_chunk(data)
+    np.testing.assert_array_equal(triangles, [(0, 1, 2), (3, 4, 5), (0, 5, 4)])
+
+
+def test_relative_indices_with_vertex_base():
+    # the second chunk of a file whose first chunk held 10 vertices
+    data = b"v 0 0 0\nv 1 0 0\nf -2 -1 11\nv 0 1 0\nf -3 -2 -1\n"
+    _, triangles = parse_obj_chunk(data, vertex_base=10)
+    np.testing.assert_array_equal(triangles, [(10, 11, 10), (10, 11, 12)])
+
+
+def test_chunks_match_whole_file():
+    rng = np.random.default_rng(0)
+    lines, count = [], 0
+    for _ in range(200):
+        if count >= 3 and rng.random() < 0.4:
+            corners = [int(c) + 1 for c in rng.integers(0, count, rng.integers(3, 6))]
+            corners = [c - count - 1 if rng.random() < 0.5 else c for c in corners] # mix in relative indices
+            lines.append('f ' + ' '.join(map(str, corners)))
+        else:
+            lines.append('v %f %f %f' % tuple(rng.random(3)))
+            count += 1
+    data = ('\n'.join(lines) + '\n').encode()
+    positions, triangles = parse_obj_chunk(data)
+
+    split = data.index(b'\n', len(data) // 2) + 1
+    first_positions, first_triangles = parse_obj_chunk(data[:split])
+    second_positions, second_triangles = parse_obj_chunk(data[split:], vertex_base=len(first_positions))
+    np.testing.assert_array_equal(np.concatenate((first_positions, second_positions)), positions)
+    np.testing.assert_array_equal(np.concatenate((first_triangles, second_triangles)), triangles)
+    assert triangles.min() >= 0 and triangles.max() < count
+
+
+@pytest.mark.parametrize("data", [b"", b"# nothing\no empty\n"])
+def test_empty(data):
+    positions, triangles = parse_obj_chunk(data)
+    assert positions.shape == (0, 3)
+    assert triangles.shape == (0, 3)
+
+
+def write_ply(path, faces:list, order:str='<', count_type:str='u1', index_type:str='i4', vertex_count:int=6):
+    names = {'u1': 'uchar', 'u2': 'ushort', 'i4': 'int', 'u4': 'uint'}
+    header = (f"ply\nformat {'binary_little_endian' if order == '<' else 'binary_big_endian'} 1.0\n"
+              f"element vertex {vertex_count}\nproperty float x\nproperty float y\nproperty float z\n"
+              f"element face {len(faces)}\nproperty list {names[count_type]} {names[index_type]} vertex_indices\nend_header\n")
+    body = [np.arange(vertex_count * 3, dtype=order + 'f4').tobytes()]
+    for face in faces:
+        body.append(np.array([len(face)], dtype=order + count_type).tobytes() + np.array(face, dtype=order + index_type).tobytes())
+    path.write_bytes(header.encode('ascii') + b''.join(body))
+
+
+@pytest.mark.parametrize("order, count_type, index_type", [('<', 'u1', 'i4'), ('>', 'u2', 'u4'), ('<', 'u4', 'i4')])
+def test_ply_mixed_polygons(tmp_path, order, count_type, index_type):
+    from loader import load_ply
+    faces = [(0, 1, 2), (0, 1, 2, 3), (5, 4), (1, 2, 3, 4, 5), (3, 4, 5)]
+    write_ply(tmp_path / "mixed.ply", faces, order, count_type, index_type)
+    vertices, indices = load_ply(str(tmp_path / "mixed.ply"))
+    assert vertices.shape == (6, 6)
+    # fans (c0, ck, ck+1), faces with fewer than three corners are skipped
+    np.testing.assert_array_equal(indices.reshape(-1, 3), [(0, 1, 2), (0, 1, 2), (0, 2, 3), (1, 2, 3), (1, 3, 4), (1, 4, 5), (3, 4, 5)])
+
+
+@pytest.mark.parametrize("window", [5, 64, 1 << 15])
+def test_ply_record_starts_across_windows(tmp_path, window):
+    from loader import _ply_record_starts
+    rng = np.random.default_rng(7)
+    faces = [tuple(rng.integers(0, 6, rng.integers(0, 7))) for _ in range(300)]
+    write_ply(tmp_path / "mixed.ply", faces)
+    raw = np.fromfile(tmp_path / "mixed.ply", dtype=np.uint8)
+    offset = bytes(raw).index(b'end_header\n') + len(b'end_header\n') + 6 * 12
+    sizes = 1 + 4 * np.array([len(face) for face in faces])
+    starts, end = _ply_record_starts(raw, offset, len(faces), np.dtype('<u1'), 4, window=window)
+    np.testing.assert_array_equal(starts, offset + np.cumsum(sizes) - sizes)
+    assert end == len(raw)
+
+
+def test_detect_binary_stl_without_extension(tmp_path):
+    from loader import STL_TRIANGLE, detect_format, read_mesh
+    triangles = np.zeros(2, dtype=STL_TRIANGLE)
+    triangles['corners'] = [[(0, 0, 0), (1, 0, 0), (0, 1, 0)], [(1, 0, 0), (1, 1, 0), (0, 1, 0)]]
+    # binary headers may start with "solid" too
+    (tmp_path / "part.bin").write_bytes(b'solid part'.ljust(80) + np.uint32(2).tobytes() + triangles.tobytes())
+    (tmp_path / "part.obj").write_bytes(SQUARE)
+    assert detect_format(str(tmp_path / "part.bin")) == 'stl'
+    assert detect_format(str(tmp_path / "part.obj")) == 'obj'
+    vertices, indices = read_mesh(str(tmp_path / "part.bin"))
+    assert len(vertices) == 4 and len(indices) == 6
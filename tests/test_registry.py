@@ -0,0 +1,54 @@
+import pytest
+from registry import GENERATION_MASK, Registry, handle_generation, handle_slot, make_handle
+from vector import Transform, TransformStore
+
+
+def test_handles_round_trip():
+    handle = make_handle(5, 3)
+    assert (handle_slot(handle), handle_generation(handle)) == (5, 3)
+
+
+def test_removed_handles_are_stale():
+    registry = Registry()
+    a, b, c = (registry.add(name) for name in "abc")
+    assert registry.remove(a) == "a"
+    assert registry.get(a) is None and a not in registry
+    with pytest.raises(KeyError):
+        registry.remove(a)
+
+    # the freed slot is reused under a new generation, the old handle stays stale
+    d = registry.add("d")
+    assert handle_slot(d) == handle_slot(a) and d != a
+    assert registry.get(d) == "d" and registry.get(a) is None
+    assert (registry.get(b), registry.get(c)) == ("b", "c")
+    assert registry.get(None) is None and registry.get(make_handle(99, 0)) is None
+
+
+def test_swap_and_pop_matches_transform_store():
+    registry, store = Registry(), TransformStore()
+    items = {}
+    for name in "abcde":
+        transform = Transform()
+        store.add(transform)
+        items[registry.add(transform)] = transform
+
+    handles = list(items)
+    for handle in (handles[1], handles[4], handles[0]):
+        transform = registry.remove(handle)
+        store.remove(transform)
+        # dense positions of the two stay aligned
+        assert registry.items == store.transforms
+        for live in registry.handles:
+            assert registry.items[registry.position(live)].row == registry.position(live)
+    assert len(registry) == 2 and list(registry) == [items[handles[2]], items[handles[3]]]
+
+
+def test_generation_wraps():
+    registry = Registry()
+    first = registry.add("x")
+    handle = first
+    for _ in range(GENERATION_MASK + 1):
+        registry.remove(handle)
+        handle = registry.add("x")
+    # after a full cycle of generations the slot's handle repeats
+    assert handle == first
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from gl import *
+from render_queue import DrawPacket, RenderQueue, PASS_MESH, PASS_HIGHLIGHT, PASS_WIREFRAME, PASS_POINTS
+
+VERTEX = """#version 330 core
+layout (location = 0) in vec3 position;
+uniform mat4 model;
+void main() { gl_Position = model * vec4(position, 1.0); }
+"""
+FRAGMENT = """#version 330 core
+out vec4 color;
+void main() { color = vec4(1.0); }
+"""
+
+
+@pytest.fixture(scope="module")
+def gl_objects():
+    """a hidden window's context with two programs and two vertex arrays, skipped where no context can be made
+    (set SDL_VIDEODRIVER=offscreen PYOPENGL_PLATFORM=egl to run them headless)"""
+    pg = pytest.importorskip("pygame")
+    from OpenGL.GL.shaders import compileProgram, compileShader
+    pg.display.init()
+    try:
+        pg.display.set_mode((8, 8), pg.OPENGL | pg.DOUBLEBUF | pg.HIDDEN)
+        programs = [compileProgram(compileShader(VERTEX, GL_VERTEX_SHADER), compileShader(FRAGMENT, GL_FRAGMENT_SHADER)) for _ in range(2)]
+        vaos = [glGenVertexArrays(1) for _ in range(2)]
+    except Exception as error:
+        pg.display.quit()
+        pytest.skip(f"no OpenGL context: {error}")
+    yield programs, vaos, [glGetUniformLocation(program, "model") for program in programs]
+    glDeleteVertexArrays(2, vaos)
+    for program in programs:
+        glDeleteProgram(program)
+    pg.display.quit()
+
+
+def packet(pass_=PASS_MESH, program=1, vao=1, mode=GL_TRIANGLES, location=0, owner=None, line=1, point=1, draw=None):
+    return DrawPacket(pass_, program, vao, mode, 0, location, np.identity(4, dtype=np.float32), owner, line=line, point=point, draw=draw)
+
+
+def test_key_orders_pass_program_state_vao():
+    packets = [
+        packet(PASS_POINTS, program=1, vao=1, mode=GL_POINTS, point=5),
+        packet(PASS_MESH, program=2, vao=1),
+        packet(PASS_WIREFRAME, program=1, vao=2, mode=GL_LINES, line=1),
+        packet(PASS_MESH, program=1, vao=3),
+        packet(PASS_MESH, program=1, vao=2),
+        packet(PASS_HIGHLIGHT, program=1, vao=1, mode=GL_LINES, line=3),
+        packet(PASS_HIGHLIGHT, program=1, vao=1, mode=GL_LINES, line=1),
+    ]
+    ordered = sorted(packets, key=DrawPacket.key)
+    assert [p.key() for p in ordered] == [
+        (PASS_MESH, 1, 1, 1, 2), (PASS_MESH, 1, 1, 1, 3), (PASS_MESH, 2, 1, 1, 1),
+        (PASS_HIGHLIGHT, 1, 1, 1, 1), (PASS_HIGHLIGHT, 1, 3, 1, 1),
+        (PASS_WIREFRAME, 1, 1, 1, 2), (PASS_POINTS, 1, 1, 5, 1),
+    ]
+
+
+def test_flush_removes_redundant_state(gl_objects):
+    (a, b), (vao_1, vao_2), (location_a, location_b) = gl_objects
+    owners = [object() for _ in range(3)]
+    queue = RenderQueue()
+    queue.begin_frame()
+    # submitted interleaved, drawn grouped by program then vao
+    for owner in owners:
+        queue.submit(packet(program=b, vao=vao_1, location=location_b, owner=owner))
+        queue.submit(packet(program=a, vao=vao_2, location=location_a, owner=owner))
+        queue.submit(packet(program=a, vao=vao_1, location=location_a, owner=owner))
+    queue.flush()
+
+    stats = queue.stats
+    assert stats["packets"] == stats["draws"] == 9
+    assert stats["programs"] == 2
+    assert stats["vaos"] == 3 # a: vao_1, vao_2, b: vao_1
+    assert stats["models"] == 9 # sorted by state, the owner changes between neighbours
+    assert not queue.packets
+    assert glGetError() == GL_NO_ERROR
+
+
+def test_flush_by_pass_and_custom_draws(gl_objects):
+    (a, b), (vao_1, vao_2), (location_a, _) = gl_objects
+    drawn = []
+    owner = object()
+    queue = RenderQueue()
+    queue.begin_frame()
+    queue.submit(packet(PASS_WIREFRAME, program=a, vao=vao_1, mode=GL_LINES, location=location_a, owner=owner, draw=lambda: drawn.append('wireframe')))
+    queue.submit(packet(PASS_MESH, program=a, vao=vao_2, location=location_a, owner=owner, draw=lambda: drawn.append('mesh 2')))
+    queue.submit(packet(PASS_MESH, program=a, vao=vao_1, location=location_a, owner=owner, draw=lambda: drawn.append('mesh 1')))
+
+    queue.flush(passes=(PASS_MESH,))
+    assert drawn == ['mesh 1', 'mesh 2']
+    assert [p.pass_ for p in queue.packets] == [PASS_WIREFRAME]
+    # custom draws bind their own objects, the tracked state is forgotten after each
+    assert queue.stats["models"] == queue.stats["programs"] == 2
+
+    queue.flush()
+    assert drawn == ['mesh 1', 'mesh 2', 'wireframe']
+    assert queue.stats["packets"] == 3
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from bounds import Bounds
+from scene import SceneGraph
+from vector import Transform, TransformStore
+
+
+class Node:
+    """the parts of a Mesh the scene graph reads"""
+
+    def __init__(self, store:TransformStore, positions=((-1, -1, -1), (1, 1, 1))):
+        self.transform = Transform()
+        self.transform.scale.update(1.0, 1.0, 1.0)
+        store.add(self.transform)
+        self.bounds = Bounds(np.array(positions, dtype=np.float32))
+        self.node = None
+
+
+@pytest.fixture
+def scene():
+    store = TransformStore()
+    graph = SceneGraph(store)
+    root, child, grandchild, other = (Node(store) for _ in range(4))
+    graph.add(root)
+    graph.add(child, root)
+    graph.add(grandchild, child)
+    graph.add(other)
+    graph.update()
+    return store, graph, (root, child, grandchild, other)
+
+
+def test_world_is_local_times_parent(scene):
+    store, graph, (root, child, grandchild, other) = scene
+    root.transform.position.update(1.0, 2.0, 3.0)
+    root.transform.rotation.update(0.0, 90.0, 0.0)
+    child.transform.position.update(0.0, 0.0, -2.0)
+    grandchild.transform.scale.update(2.0, 2.0, 2.0)
+    graph.update()
+
+    local = {mesh: store.model_matrices(mesh.transform.row)[0] for mesh in (root, child, grandchild)}
+    np.testing.assert_allclose(graph.world_matrix(root), local[root], atol=1e-6)
+    np.testing.assert_allclose(graph.world_matrix(child), local[child] @ local[root], atol=1e-5)
+    np.testing.assert_allclose(graph.world_matrix(grandchild), local[grandchild] @ local[child] @ local[root], atol=1e-5)
+
+
+def test_dirty_parent_updates_descendants_only(scene):
+    store, graph, (root, child, grandchild, other) = scene
+    version = graph.version
+    child.transform.position.move(dx=1.0)
+    changed = graph.update()
+
+    updated = {graph.nodes[i].mesh for i in np.flatnonzero(changed)}
+    assert updated == {child, grandchild}
+    assert graph.version == version + 1
+    assert not store.dirty.any()
+
+    # nothing moved, nothing recomputed
+    assert not graph.update().any()
+    assert graph.version == version + 1
+
+
+def test_subtree_bounds_follow_children(scene):
+    store, graph, (root, child, grandchild, other) = scene
+    grandchild.transform.position.update(10.0, 0.0, 0.0)
+    graph.update()
+    root_index = root.node.index
+    assert graph.subtree_max[root_index, 0] == pytest.approx(11.0)
+    assert graph.world_max[root_index, 0] == pytest.approx(1.0)
+
+    hits = graph.query(lambda mins, maxs: (maxs[:, 0] >= 9.5) & (mins[:, 0] <= 9.5))
+    assert hits == [grandchild]
+
+
+def test_refresh_bounds_without_rebuild(scene):
+    store, graph, (root, child, grandchild, other) = scene
+    other.bounds = Bounds(np.array([(-3, -3, -3), (3, 3, 3)], dtype=np.float32))
+    graph.refresh_bounds(other)
+    assert not graph.structure_changed
+
+    changed = graph.update()
+    assert [graph.nodes[i].mesh for i in np.flatnonzero(changed)] == [other]
+    np.testing.assert_allclose(graph.world_max[other.node.index], (3, 3, 3))
+
+
+def test_reparent_and_remove(scene):
+    store, graph, (root, child, grandchild, other) = scene
+    with pytest.raises(ValueError):
+        graph.set_parent(root, grandchild)
+
+    other.transform.position.update(5.0, 0.0, 0.0)
+    graph.set_parent(child, other)
+    graph.update()
+    assert child.node.parent is other.node
+    assert graph.world_matrix(grandchild)[3, 0] == pytest.approx(5.0)
+
+    # children of a removed node move up to its parent
+    graph.remove(child)
+    graph.update()
+    assert child.node is None
+    assert grandchild.node.parent is other.node
+    assert len(graph.nodes) == 3
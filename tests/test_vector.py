@@ -0,0 +1,88 @@
+import numpy as np
+import pyrr
+from vector import Transform, TransformStore
+
+
+def pyrr_model(transform:Transform) -> np.ndarray:
+    # the reference Mesh.create_model_matrix falls back to without a store
+    model = pyrr.matrix44.create_identity(dtype=np.float32)
+    model = pyrr.matrix44.multiply(m1=model, m2=pyrr.matrix44.create_from_scale(scale=transform.scale.vector(), dtype=np.float32))
+    model = pyrr.matrix44.multiply(m1=model, m2=pyrr.matrix44.create_from_eulers(eulers=transform.rotation.to_radians(), dtype=np.float32))
+    model = pyrr.matrix44.multiply(m1=model, m2=pyrr.matrix44.create_from_translation(vec=transform.position.vector(), dtype=np.float32))
+    return model
+
+
+def random_transforms(count:int, seed:int=0) -> list[Transform]:
+    rng = np.random.default_rng(seed)
+    transforms = []
+    for _ in range(count):
+        transform = Transform()
+        transform.position.update(*rng.uniform(-5, 5, 3))
+        transform.rotation.update(*rng.uniform(-180, 180, 3))
+        transform.scale.update(*rng.uniform(0.1, 3, 3))
+        transforms.append(transform)
+    return transforms
+
+
+def test_model_matrices_match_pyrr():
+    transforms = random_transforms(50)
+    expected = np.array([pyrr_model(transform) for transform in transforms])
+    store = TransformStore(capacity=4) # grows while adding
+    for transform in transforms:
+        store.add(transform)
+
+    np.testing.assert_allclose(store.model_matrices(), expected, atol=1e-5)
+    np.testing.assert_allclose(store.model_matrices([3, 7]), expected[[3, 7]], atol=1e-5)
+    np.testing.assert_allclose(store.model_matrices(5), expected[5:6], atol=1e-5)
+
+
+def test_bulk_edits_match_pyrr():
+    transforms = random_transforms(10, seed=1)
+    store = TransformStore()
+    for transform in transforms:
+        store.add(transform)
+    store.translate([1, 2], (0.5, -1.0, 2.0))
+    store.rotate(slice(0, 5), (10.0, 20.0, 30.0))
+    store.rescale([9], 2.0)
+
+    expected = np.array([pyrr_model(transform) for transform in transforms])
+    np.testing.assert_allclose(store.model_matrices(), expected, atol=1e-5)
+
+
+def test_dirty_flags():
+    store = TransformStore()
+    a, b, c = Transform(), Transform(), Transform()
+    for transform in (a, b, c):
+        store.add(transform)
+    assert store.dirty.all()
+
+    store.clear_dirty()
+    assert not store.dirty.any()
+    b.position.move(dx=1.0)
+    assert store.dirty.tolist() == [False, True, False]
+    assert b.dirty and not a.dirty
+
+    store.clear_dirty()
+    store.set([0, 2], scale=(2.0, 2.0, 2.0))
+    assert store.dirty.tolist() == [True, False, True]
+
+
+def test_remove_swaps_last_row_in():
+    store = TransformStore()
+    a, b, c = random_transforms(3, seed=2)
+    for transform in (a, b, c):
+        store.add(transform)
+    values = c.position.vector().copy()
+
+    store.remove(a)
+    assert store.count == 2
+    assert (c.store, c.row) == (store, 0)
+    np.testing.assert_array_equal(store.positions[0], values)
+    assert a.store is None and a.row is None
+
+    # the moved transform still writes through to its new row
+    c.position.update(1.0, 2.0, 3.0)
+    np.testing.assert_array_equal(store.positions[0], (1.0, 2.0, 3.0))
+    # the removed one keeps its values and no longer touches the store
+    a.position.update(9.0, 9.0, 9.0)
+    assert not (store.positions == 9.0).any()
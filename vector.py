@@ -2,66 +2,100 @@ import math
 import numpy as np
 
 class Vector:
-    """ Base class for creating Transformation Obejects """
+    """ Base class for creating Transformation Obejects, a thin view over a (3,) float32 row """
+    __slots__ = ("_data", "_dirty", "_bounce")
+
     def __init__(self, x:float=1.0, y:float=1.0, z:float=1.0):
-        self.x = x
-        self.y = y
-        self.z = z
+        # standalone until a TransformStore binds the vector to one of its rows
+        self._data = np.array([x, y, z], dtype=np.float32)
+        self._dirty = np.zeros(1, dtype=bool)
+        self._bounce = None # (up, d_total) state of bounce(), created on first use
+
+    @property
+    def x(self) -> float:
+        return float(self._data[0])
+
+    @x.setter
+    def x(self, value:float):
+        self._data[0] = value
+        self._dirty[0] = True
+
+    @property
+    def y(self) -> float:
+        return float(self._data[1])
+
+    @y.setter
+    def y(self, value:float):
+        self._data[1] = value
+        self._dirty[0] = True
+
+    @property
+    def z(self) -> float:
+        return float(self._data[2])
+
+    @z.setter
+    def z(self, value:float):
+        self._data[2] = value
+        self._dirty[0] = True
 
     def update(self, x:float=0.0, y:float=0.0, z:float=0.0):
         """ Reset Vector to new  (x, y, z)"""
-        self.x = x
-        self.y = y
-        self.z = z
+        self._data[:] = (x, y, z)
+        self._dirty[0] = True
     
     def move(self,dx:float=0.0, dy:float=0.0, dz:float=0.0):
         """ Move Axes by given deltas (dx, dy, dz) """
-        self.x += dx
-        self.y += dy
-        self.z += dz
+        self._data += (dx, dy, dz)
+        self._dirty[0] = True
 
     def bounce(self, dx:float=0.0, dy:float=0.0, dz:float=0.0, min=-0.5, max=0.5):
         """Move an Object Axes between min and max by given deltas (dx, dy, dz)"""
-        if not hasattr(self, "up"):
-            self.up = [True, True, True]
-            self.d_total = [0, 0, 0]
+        if self._bounce is None:
+            self._bounce = ([True, True, True], [0, 0, 0])
+        up, d_total = self._bounce
 
-        if self.up[0]:
-            if self.d_total[0] < max:
-                self.d_total[0] += dx
+        if up[0]:
+            if d_total[0] < max:
+                d_total[0] += dx
                 self.move(dx=dx)
         else:
-            if self.d_total[0] > min:
-                self.d_total[0] -= dx
+            if d_total[0] > min:
+                d_total[0] -= dx
                 self.move(dx=-dx)
 
-        if self.up[1]:
-            if self.d_total[1] < max:
-                self.d_total[1] += dy
+        if up[1]:
+            if d_total[1] < max:
+                d_total[1] += dy
                 self.move(dy=dy)
         else:
-            if self.d_total[1] > min:
-                self.d_total[1] -= dy
+            if d_total[1] > min:
+                d_total[1] -= dy
                 self.move(dy=-dy)
             
-        if self.up[2]:
-            if self.d_total[2] < max:
-                self.d_total[2] += dz
+        if up[2]:
+            if d_total[2] < max:
+                d_total[2] += dz
                 self.move(dz=dz)
         else:
-            if self.d_total[2] > min:
-                self.d_total[2] -= dz
+            if d_total[2] > min:
+                d_total[2] -= dz
                 self.move(dz=-dz)
  
-        for total, i in zip(self.d_total, range(3)):
+        for total, i in zip(d_total, range(3)):
             if total >= max:
-                self.up[i] = False
+                up[i] = False
             if total <= min:
-                self.up[i] = True
+                up[i] = True
 
     def vector(self):
         """return numpy array"""
-        return np.array([self.x, self.y, self.z], dtype=np.float32)
+        return self._data.copy()
+
+    def _bind(self, data:np.ndarray, dirty:np.ndarray):
+        """move the vector into a store row, data is a (3,) view and dirty a (1,) view"""
+        data[:] = self._data
+        self._data = data
+        self._dirty = dirty
     
     def __clamp(self, value,  min_l, max_l):
         """ clamp value withing specified range"""
@@ -71,23 +105,28 @@ class Vector:
 
 class Scale(Vector):
     """Defines the size of an object relative to the 3D space"""
+    __slots__ = ()
+
     def __init__(self, x:float=1.0, y:float=1.0, z:float=1.0):
         super().__init__(x, y, z)
 
 
 class Euler(Vector):
     """Defines the orientation of an object in 3D space"""
+    __slots__ = ()
 
     def __init__(self, x:float=0.0, y:float=0.0, z:float=0.0):
         super().__init__(x, y, z)
     
 
     def to_radians(self):
-        return np.radians([self.x, self.y, self.z], dtype=np.float32)
+        return np.radians(self._data, dtype=np.float32)
     
 
 class Position(Vector):
     """Defines the position of an object relative to the 3D space"""
+    __slots__ = ()
+
     def __init__(self, x:float=0.0, y:float=0.0, z:float=0.0):
         super().__init__(x, y, z)
 
@@ -95,11 +134,158 @@ class Position(Vector):
     
 class Transform:
     """Defines an Object Transformation (Position, Rotation, Scale) in 3D Space"""
+    __slots__ = ("store", "row", "position", "rotation", "scale")
+
     def __init__(self):
+        self.store:TransformStore = None # set when the transform is added to a store
+        self.row:int = None
         self.position:Position = Position(0.0, 0.0, 0.0)
         self.rotation:Euler = Euler(0.0, 0.0, 0.0)
         self.scale:Scale = Scale(0.2, 0.2, 0.2)
 
+    @property
+    def dirty(self) -> bool:
+        """True if position, rotation or scale changed since the store last cleared it"""
+        return bool(self.position._dirty[0])
+
+
+class TransformStore:
+    """Holds positions, Euler rotations (degrees) and scales of many Transforms in contiguous (N, 3) float32 arrays,
+    each Transform's vectors are views into its row so bulk edits are single numpy operations"""
+
+    def __init__(self, capacity:int=64):
+        self.count = 0
+        self.transforms:list[Transform] = [] # row -> Transform
+        self._allocate(capacity)
+
+    @property
+    def positions(self) -> np.ndarray:
+        return self._positions[:self.count]
+
+    @property
+    def rotations(self) -> np.ndarray:
+        return self._rotations[:self.count]
+
+    @property
+    def scales(self) -> np.ndarray:
+        return self._scales[:self.count]
+
+    @property
+    def dirty(self) -> np.ndarray:
+        return self._dirty[:self.count]
+
+    def add(self, transform:Transform) -> int:
+        """move a Transform into the store, returns its row"""
+        if transform.store is not None:
+            transform.store.remove(transform)
+        if self.count == len(self._positions):
+            self._allocate(2 * len(self._positions))
+
+        row = self.count
+        self.count += 1
+        self.transforms.append(transform)
+        transform.store = self
+        self._bind(transform, row)
+        self._dirty[row] = True
+        return row
+
+    def remove(self, transform:Transform):
+        """remove a Transform with swap-and-pop, the last row moves into the freed row"""
+        row, last = transform.row, self.count - 1
+        if row != last:
+            moved = self.transforms[last]
+            self._positions[row] = self._positions[last]
+            self._rotations[row] = self._rotations[last]
+            self._scales[row] = self._scales[last]
+            self._dirty[row] = True
+            self.transforms[row] = moved
+            self._bind(moved, row)
+        self.transforms.pop()
+        self.count -= 1
+
+        # detach the removed transform, it keeps its current values
+        for vector in (transform.position, transform.rotation, transform.scale):
+            vector._data = vector._data.copy()
+            vector._dirty = np.ones(1, dtype=bool)
+        transform.store, transform.row = None, None
+
+    def translate(self, rows, delta):
+        """move positions of rows by delta ((3,) or (len(rows), 3))"""
+        self._positions[rows] += delta
+        self._dirty[rows] = True
+
+    def rotate(self, rows, delta):
+        """add delta degrees to the Euler rotations of rows"""
+        self._rotations[rows] += delta
+        self._dirty[rows] = True
+
+    def rescale(self, rows, factor):
+        """multiply scales of rows by factor"""
+        self._scales[rows] *= factor
+        self._dirty[rows] = True
+
+    def set(self, rows, position=None, rotation=None, scale=None):
+        """overwrite any of position, rotation, scale of rows"""
+        if position is not None:
+            self._positions[rows] = position
+        if rotation is not None:
+            self._rotations[rows] = rotation
+        if scale is not None:
+            self._scales[rows] = scale
+        self._dirty[rows] = True
+
+    def clear_dirty(self, rows=slice(None)):
+        self.dirty[rows] = False
+
+    def model_matrices(self, rows=slice(None)) -> np.ndarray:
+        """create model matrices (n, 4, 4) with T * R * S for rows, matches Mesh.create_model_matrix"""
+        scales = self.scales[rows].reshape(-1, 3)
+        # pyrr euler order: x - roll, y - pitch, z - yaw
+        roll, pitch, yaw = np.radians(self.rotations[rows].reshape(-1, 3)).T
+        sP, cP = np.sin(pitch), np.cos(pitch)
+        sR, cR = np.sin(roll), np.cos(roll)
+        sY, cY = np.sin(yaw), np.cos(yaw)
+
+        models = np.zeros((len(scales), 4, 4), dtype=np.float32)
+        models[:, 0, 0] = cY * cP
+        models[:, 0, 1] = -cY * sP * cR + sY * sR
+        models[:, 0, 2] = cY * sP * sR + sY * cR
+        models[:, 1, 0] = sP
+        models[:, 1, 1] = cP * cR
+        models[:, 1, 2] = -cP * sR
+        models[:, 2, 0] = -sY * cP
+        models[:, 2, 1] = sY * sP * cR + cY * sR
+        models[:, 2, 2] = -sY * sP * sR + cY * cR
+
+        # row vector convention: scale the rotation rows, translation in the last row
+        models[:, :3, :3] *= scales[:, :, None]
+        models[:, 3, :3] = self.positions[rows].reshape(-1, 3)
+        models[:, 3, 3] = 1
+        return models
+
+    def _allocate(self, capacity:int):
+        """(re)allocate storage with capacity rows and rebind every transform to the new arrays"""
+        positions = np.zeros((capacity, 3), dtype=np.float32)
+        rotations = np.zeros((capacity, 3), dtype=np.float32)
+        scales = np.ones((capacity, 3), dtype=np.float32)
+        dirty = np.zeros(capacity, dtype=bool)
+        if self.count:
+            positions[:self.count] = self._positions[:self.count]
+            rotations[:self.count] = self._rotations[:self.count]
+            scales[:self.count] = self._scales[:self.count]
+            dirty[:self.count] = self._dirty[:self.count]
+
+        self._positions, self._rotations, self._scales, self._dirty = positions, rotations, scales, dirty
+        for row, transform in enumerate(self.transforms):
+            self._bind(transform, row)
+
+    def _bind(self, transform:Transform, row:int):
+        transform.row = row
+        dirty = self._dirty[row:row + 1]
+        transform.position._bind(self._positions[row], dirty)
+        transform.rotation._bind(self._rotations[row], dirty)
+        transform.scale._bind(self._scales[row], dirty)
+
 
 
 class OrbitalTransfrom:
@@ -0,0 +1,141 @@
+import numpy as np
+
+# screen space vertex lookup for hover and snapping, GL free.
+# projected vertices are bucketed in a uniform grid of pixel cells (a counting sort, fully vectorized),
+# a KD-tree over millions of points cannot be built fast enough from numpy every time the camera moves
+
+
+class ScreenGrid:
+    """Uniform grid over 2D pixel positions, cells are stored row by row in one sorted array (CSR) so
+    the cells of a rectangle are one contiguous slice per grid row"""
+
+    def __init__(self, points:np.ndarray, ids:np.ndarray, width:int, height:int, cell:int=8):
+        self.cell = cell
+        self.cols = max(int(np.ceil(width / cell)), 1)
+        self.rows = max(int(np.ceil(height / cell)), 1)
+
+        cx = np.clip((points[:, 0] // cell).astype(np.int64), 0, self.cols - 1)
+        cy = np.clip((points[:, 1] // cell).astype(np.int64), 0, self.rows - 1)
+        keys = cy * self.cols + cx
+        order = np.argsort(keys, kind='stable')
+        self.points = np.ascontiguousarray(points[order], dtype=np.float32)
+        self.ids = ids[order]
+        self.starts = np.zeros(self.rows * self.cols + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=self.rows * self.cols), out=self.starts[1:])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, x:float, y:float, k:int=1) -> tuple[np.ndarray, np.ndarray]:
+        """the k points closest to (x, y), returns (ids, pixel distances) nearest first.
+        the searched square grows until the k-th distance is closer than anything outside it"""
+        k = min(k, len(self))
+        if k == 0:
+            return self.ids[:0], np.zeros(0, dtype=np.float32)
+
+        reach = 1
+        while True:
+            idx = self._square(x, y, reach)
+            dist = np.hypot(self.points[idx, 0] - x, self.points[idx, 1] - y)
+            covers_all = reach >= max(self.cols, self.rows)
+            if len(idx) >= k:
+                best = np.argpartition(dist, k - 1)[:k]
+                best = best[np.argsort(dist[best])]
+                # distance from (x, y) to the border of the searched square
+                cx, cy = int(x // self.cell), int(y // self.cell)
+                border = min(x - (cx - reach) * self.cell, (cx + reach + 1) * self.cell - x,
+                             y - (cy - reach) * self.cell, (cy + reach + 1) * self.cell - y)
+                if dist[best[-1]] <= border or covers_all:
+                    return self.ids[idx[best]], dist[best]
+            elif covers_all:
+                return self.ids[idx], dist
+            reach *= 2
+
+    def within(self, x:float, y:float, radius:float) -> tuple[np.ndarray, np.ndarray]:
+        """points within radius pixels of (x, y), returns (ids, pixel distances) nearest first"""
+        idx = self._square(x, y, int(np.ceil(radius / self.cell)))
+        dist = np.hypot(self.points[idx, 0] - x, self.points[idx, 1] - y)
+        inside = dist <= radius
+        idx, dist = idx[inside], dist[inside]
+        order = np.argsort(dist)
+        return self.ids[idx[order]], dist[order]
+
+    def _square(self, x:float, y:float, reach:int) -> np.ndarray:
+        """indices of the points in the cells within reach cells of (x, y)"""
+        cx, cy = int(x // self.cell), int(y // self.cell)
+        x0, x1 = max(cx - reach, 0), min(cx + reach, self.cols - 1)
+        y0, y1 = max(cy - reach, 0), min(cy + reach, self.rows - 1)
+        if x0 > x1 or y0 > y1:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.arange(y0, y1 + 1) * self.cols
+        begin, end = self.starts[rows + x0], self.starts[rows + x1 + 1]
+        counts = end - begin
+        return np.repeat(begin - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+
+class VertexQuery:
+    """Nearest / radius vertex lookups in window pixels over a set of meshes.
+
+    The grid of a mesh is rebuilt lazily on the first query after its model matrix, the camera, the
+    viewport or its vertices (Mesh.vertex_version) changed, only vertices in front of the camera and inside the window are indexed"""
+
+    def __init__(self, cell:int=8, chunk:int=1 << 21):
+        self.cell = cell
+        self.chunk = chunk
+        self.grids:dict[int, tuple[bytes, ScreenGrid]] = {} # mesh id -> (state key, grid)
+        self.rebuilds = 0
+
+    def nearest(self, meshes:list, model_matrices:list, view:np.ndarray, projection:np.ndarray, size:tuple, x:float, y:float, k:int=1) -> list[tuple]:
+        """k closest vertices over all meshes, returns [(mesh, vertex index, pixel distance)] nearest first"""
+        found = []
+        for mesh, model in zip(meshes, model_matrices):
+            ids, dist = self.grid(mesh, model, view, projection, size).nearest(x, y, k)
+            found.extend((mesh, int(i), float(d)) for i, d in zip(ids, dist))
+        found.sort(key=lambda hit: hit[2])
+        return found[:k]
+
+    def within(self, meshes:list, model_matrices:list, view:np.ndarray, projection:np.ndarray, size:tuple, x:float, y:float, radius:float) -> dict[int, np.ndarray]:
+        """vertices within radius pixels, returns {mesh id: vertex indices (uint32)}"""
+        found = {}
+        for mesh, model in zip(meshes, model_matrices):
+            ids, _ = self.grid(mesh, model, view, projection, size).within(x, y, radius)
+            if len(ids):
+                found[mesh.id] = ids
+        return found
+
+    def grid(self, mesh, model:np.ndarray, view:np.ndarray, projection:np.ndarray, size:tuple) -> ScreenGrid:
+        key = b''.join((model.tobytes(), view.tobytes(), projection.tobytes(), np.array((*size, len(mesh.vertices), mesh.vertex_version)).tobytes()))
+        cached = self.grids.get(mesh.id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        points, ids = self.project(mesh.vertices, model @ view @ projection, size)
+        grid = ScreenGrid(points, ids, size[0], size[1], self.cell)
+        self.grids[mesh.id] = (key, grid)
+        self.rebuilds += 1
+        return grid
+
+    def project(self, vertices:np.ndarray, mvp:np.ndarray, size:tuple) -> tuple[np.ndarray, np.ndarray]:
+        """window positions (y down) and indices of the vertices visible in the viewport"""
+        width, height = size
+        mvp = mvp.astype(np.float32)
+        points, ids = [], []
+        for start in range(0, len(vertices), self.chunk):
+            clip = np.asarray(vertices[start:start + self.chunk, 0:3], dtype=np.float32) @ mvp[:3]
+            clip += mvp[3]
+            w = clip[:, 3]
+            visible = (w > 0) & (np.abs(clip[:, 0]) <= w) & (np.abs(clip[:, 1]) <= w) & (np.abs(clip[:, 2]) <= w)
+            hits = np.flatnonzero(visible)
+            ndc = clip[hits, 0:2] / w[hits, None]
+            pixel = np.empty((len(hits), 2), dtype=np.float32)
+            pixel[:, 0] = (ndc[:, 0] + 1) * 0.5 * width
+            pixel[:, 1] = (1 - ndc[:, 1]) * 0.5 * height
+            points.append(pixel)
+            ids.append((hits + start).astype(np.uint32))
+        if not points:
+            return np.zeros((0, 2), dtype=np.float32), np.zeros(0, dtype=np.uint32)
+        return np.concatenate(points), np.concatenate(ids)
+
+    def forget(self, mesh):
+        """drop the cached grid of a mesh (removed or vertices edited)"""
+        self.grids.pop(mesh.id, None)